@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, ReportRequest
+from .models import Order, OrderItem, OrderEvent, ReportRequest
 
 
 @admin.register(Order)
@@ -44,3 +44,17 @@ class ReportRequesttemAdmin(admin.ModelAdmin):
     )
     list_filter = ('report_date', 'status_report')
     search_fields = ('report_date', 'status_report')
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'event_type',
+        'order_id',
+        'restaurant_id',
+        'created_at',
+        'published_at',
+    )
+    list_filter = ('event_type',)
+    search_fields = ('order_id',)
@@ -0,0 +1,330 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (Count, DateField, DecimalField, DurationField, ExpressionWrapper, F, FloatField, Q, Sum,
+                              Value, Window)
+from django.db.models.functions import (Cast, Coalesce, ExtractHour, ExtractIsoWeekDay, NullIf, Rank, Trunc,
+                                        TruncDate)
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from apps.orders.events import RELAY_LOCK_KEY, RELAY_LOCK_TIMEOUT, _relay_batches, get_subscribers
+from apps.orders.models import Order, OrderItem, OrderHourlyStats, ProductSalesDaily, WaitressDailyStats
+
+
+UPSERT_BATCH_SIZE = 500
+
+
+class Rollup:
+    """
+    Tabla pre-agregada mantenida con deltas. rows(snapshot) retorna las filas (llave, valores) con las
+    que contribuye una orden activa; rebuild(orders_filter) genera las filas recalculadas desde el historial.
+    """
+
+    def __init__(self, model, key_fields, conflict_fields, value_fields, rows, rebuild):
+        self.model = model
+        self.key_fields = key_fields
+        self.conflict_fields = conflict_fields
+        self.value_fields = value_fields
+        self.rows = rows
+        self.rebuild = rebuild
+
+
+def _order_date(snapshot):
+    return timezone.localtime(parse_datetime(snapshot['created_at'])).date()
+
+
+def _product_sales_rows(snapshot):
+    day = _order_date(snapshot)
+    for item in snapshot['items']:
+        yield ((snapshot['restaurant'], item['product_item'], day),
+               (item['quantity'], Decimal(item['subtotal'] or 0)))
+
+
+def _rebuild_product_sales(orders_filter):
+    items = (OrderItem.objects.filter(**{f'order__{key}': value for key, value in orders_filter.items()})
+             .annotate(day=TruncDate('order__created_at'))
+             .values('order__restaurant_id', 'product_item_id', 'day')
+             .annotate(total_quantity=Sum('quantity'), total_revenue=Coalesce(Sum('subtotal'), Value(Decimal(0))))
+             .order_by())
+    for row in items.iterator(chunk_size=UPSERT_BATCH_SIZE):
+        yield ProductSalesDaily(restaurant_id=row['order__restaurant_id'], product_item_id=row['product_item_id'],
+                                date=row['day'], quantity=row['total_quantity'], revenue=row['total_revenue'])
+
+
+def _hourly_rows(snapshot):
+    created_at = timezone.localtime(parse_datetime(snapshot['created_at']))
+    yield ((snapshot['restaurant'], created_at.date(), created_at.hour, created_at.isoweekday()),
+           (1, Decimal(snapshot['total'] or 0)))
+
+
+def _rebuild_hourly(orders_filter):
+    orders = (Order.objects.filter(**orders_filter)
+              .annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'),
+                        weekday=ExtractIsoWeekDay('created_at'))
+              .values('restaurant_id', 'day', 'hour', 'weekday')
+              .annotate(total_orders=Count('id'), total_revenue=Coalesce(Sum('total'), Value(Decimal(0))))
+              .order_by())
+    for row in orders.iterator(chunk_size=UPSERT_BATCH_SIZE):
+        yield OrderHourlyStats(restaurant_id=row['restaurant_id'], date=row['day'], hour=row['hour'],
+                               weekday=row['weekday'], orders=row['total_orders'], revenue=row['total_revenue'])
+
+
+def _waitress_rows(snapshot):
+    if snapshot['waitress'] is None:
+        return
+    created_at = parse_datetime(snapshot['created_at'])
+    closed_at = snapshot.get('closed_at')
+    close_time_us = 0
+    if closed_at:
+        close_time_us = (parse_datetime(closed_at) - created_at) // timedelta(microseconds=1)
+    yield ((snapshot['restaurant'], snapshot['waitress'], timezone.localtime(created_at).date()),
+           (1, Decimal(snapshot['total'] or 0), 1 if closed_at else 0, close_time_us))
+
+
+def _rebuild_waitress(orders_filter):
+    closed = Q(closed_at__isnull=False)
+    orders = (Order.objects.filter(waitress__isnull=False, **orders_filter)
+              .annotate(day=TruncDate('created_at'))
+              .values('restaurant_id', 'waitress_id', 'day')
+              .annotate(total_orders=Count('id'),
+                        total_revenue=Coalesce(Sum('total'), Value(Decimal(0))),
+                        total_closed=Count('id', filter=closed),
+                        total_close_time=Sum(ExpressionWrapper(F('closed_at') - F('created_at'),
+                                                               output_field=DurationField()), filter=closed))
+              .order_by())
+    for row in orders.iterator(chunk_size=UPSERT_BATCH_SIZE):
+        close_time = row['total_close_time'] or timedelta(0)
+        yield WaitressDailyStats(restaurant_id=row['restaurant_id'], waitress_id=row['waitress_id'], date=row['day'],
+                                 orders=row['total_orders'], revenue=row['total_revenue'],
+                                 closed_orders=row['total_closed'],
+                                 close_time_us=close_time // timedelta(microseconds=1))
+
+
+ROLLUPS = (
+    Rollup(ProductSalesDaily, ('restaurant_id', 'product_item_id', 'date'), ('product_item_id', 'date'),
+           ('quantity', 'revenue'), _product_sales_rows, _rebuild_product_sales),
+    Rollup(OrderHourlyStats, ('restaurant_id', 'date', 'hour', 'weekday'), ('restaurant_id', 'date', 'hour'),
+           ('orders', 'revenue'), _hourly_rows, _rebuild_hourly),
+    Rollup(WaitressDailyStats, ('restaurant_id', 'waitress_id', 'date'), ('waitress_id', 'restaurant_id', 'date'),
+           ('orders', 'revenue', 'closed_orders', 'close_time_us'), _waitress_rows, _rebuild_waitress),
+)
+
+
+def _counts(snapshot):
+    return snapshot is not None and snapshot['status']
+
+
+def apply_order_rollups(events, skip=None):
+    """
+    Suscriptor de eventos de órdenes: resta la contribución del estado anterior y suma la del nuevo en cada
+    rollup, con un upsert aditivo por lote. El relay lo llama dentro de la transacción que marca el lote como
+    publicado, así que aunque la entrega sea al menos una vez, cada evento se aplica exactamente una vez.
+    skip(snapshot) permite omitir snapshots que ya están contados (los del alcance de rebuild_rollups).
+    """
+    for rollup in ROLLUPS:
+        deltas = defaultdict(lambda: [0] * len(rollup.value_fields))
+        for event in events:
+            payload = event['payload']
+            for sign, snapshot in ((-1, payload['before']), (1, payload['after'])):
+                if not _counts(snapshot) or (skip is not None and skip(snapshot)):
+                    continue
+                for key, values in rollup.rows(snapshot):
+                    totals = deltas[key]
+                    for index, value in enumerate(values):
+                        totals[index] += sign * value
+        upsert_additive(rollup, [key + tuple(values) for key, values in deltas.items() if any(values)])
+
+
+def upsert_additive(rollup, rows):
+    """
+    INSERT ... ON CONFLICT DO UPDATE SET valor = valor + EXCLUDED.valor (Postgres y SQLite).
+    """
+    if not rows:
+        return
+    meta = rollup.model._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    columns = [quote(meta.get_field(field).column) for field in rollup.key_fields + rollup.value_fields]
+    conflict = ", ".join(quote(meta.get_field(field).column) for field in rollup.conflict_fields)
+    updates = ", ".join(
+        f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns[len(rollup.key_fields):]
+    )
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}",
+                [value for row in batch for value in row],
+            )
+
+
+def _repeatable_read():
+    """
+    Primera sentencia de la transacción: en Postgres la pasa a REPEATABLE READ para que todas sus lecturas
+    vean la misma foto. SQLite ya lee una sola foto por transacción. Dentro de una transacción ya iniciada
+    (por ejemplo en los tests) no hace nada.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+
+def rebuild_rollups(since=None, until=None, restaurant_id=None):
+    """
+    Recalcula los rollups desde el historial de órdenes (backfill o reparación). Toma el lock del relay y,
+    en una sola transacción con una foto fija de la base de datos, reescribe los rollups del alcance pedido
+    y luego entrega los eventos pendientes de esa misma foto. Esos eventos ya están contados en el recálculo,
+    así que a los rollups solo se les aplica la parte fuera del alcance; los eventos que hagan commit después
+    no están en la foto y los entrega el relay. Así ningún cambio queda contado dos veces.
+    Retorna las filas escritas por modelo, o None si el relay está corriendo.
+    """
+    if not cache.add(RELAY_LOCK_KEY, 1, timeout=RELAY_LOCK_TIMEOUT):
+        return None
+    try:
+        since = parse_date(since) if isinstance(since, str) else since
+        until = parse_date(until) if isinstance(until, str) else until
+        orders_filter = {'status': True}
+        rollup_filter = {}
+        if since:
+            orders_filter['created_at__date__gte'] = since
+            rollup_filter['date__gte'] = since
+        if until:
+            orders_filter['created_at__date__lte'] = until
+            rollup_filter['date__lte'] = until
+        if restaurant_id:
+            orders_filter['restaurant_id'] = restaurant_id
+            rollup_filter['restaurant_id'] = restaurant_id
+
+        def rebuilt(snapshot):
+            day = _order_date(snapshot)
+            return ((not restaurant_id or snapshot['restaurant'] == restaurant_id)
+                    and (not since or day >= since) and (not until or day <= until))
+
+        subscribers = [
+            partial(apply_order_rollups, skip=rebuilt) if subscriber is apply_order_rollups else subscriber
+            for subscriber in get_subscribers()
+        ]
+        written = {}
+        outermost = not transaction.get_connection().in_atomic_block
+        with transaction.atomic():
+            if outermost:
+                _repeatable_read()
+            for rollup in ROLLUPS:
+                rollup.model.objects.filter(**rollup_filter).delete()
+                count = 0
+                batch = []
+                for obj in rollup.rebuild(orders_filter):
+                    batch.append(obj)
+                    if len(batch) == UPSERT_BATCH_SIZE:
+                        rollup.model.objects.bulk_create(batch)
+                        count += len(batch)
+                        batch = []
+                rollup.model.objects.bulk_create(batch)
+                written[rollup.model.__name__] = count + len(batch)
+            _relay_batches(getattr(settings, 'ORDER_EVENT_BATCH_SIZE', 500), subscribers)
+        return written
+    finally:
+        cache.delete(RELAY_LOCK_KEY)
+
+
+def product_sales_ranking(restaurant_id, start_date, end_date, period='day', order_by='quantity', limit=10):
+    """
+    Productos más vendidos por período (day, week o month) desde el rollup diario, con su posición
+    según order_by (quantity o revenue). Retorna hasta `limit` productos por período.
+    """
+    rows = (ProductSalesDaily.objects
+            .filter(restaurant_id=restaurant_id, date__range=(start_date, end_date))
+            .annotate(period=Trunc('date', period, output_field=DateField()))
+            .values('period', 'product_item_id', 'product_item__name')
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+            .filter(total_quantity__gt=0)
+            .annotate(rank=Window(
+                Rank(), partition_by=[F('period')],
+                order_by=[F(f'total_{order_by}').desc(), F('product_item_id').asc()],
+            ))
+            .filter(rank__lte=limit)
+            .order_by('period', 'rank'))
+    return [
+        {
+            'period': row['period'].isoformat(),
+            'rank': row['rank'],
+            'product_item': row['product_item_id'],
+            'name': row['product_item__name'],
+            'quantity': row['total_quantity'],
+            'revenue': '{:.2f}'.format(row['total_revenue']),
+        }
+        for row in rows
+    ]
+
+
+def hourly_heatmap(restaurant_id, start_date, end_date):
+    """
+    Órdenes e ingresos del rango agrupados por día de la semana ISO (1 = lunes) y hora, desde el rollup
+    horario. Solo retorna las celdas con órdenes.
+    """
+    rows = (OrderHourlyStats.objects
+            .filter(restaurant_id=restaurant_id, date__range=(start_date, end_date))
+            .values('weekday', 'hour')
+            .annotate(total_orders=Sum('orders'), total_revenue=Sum('revenue'))
+            .filter(total_orders__gt=0)
+            .order_by('weekday', 'hour'))
+    return [
+        {
+            'weekday': row['weekday'],
+            'hour': row['hour'],
+            'orders': row['total_orders'],
+            'revenue': '{:.2f}'.format(row['total_revenue']),
+        }
+        for row in rows
+    ]
+
+
+WAITRESS_ORDERINGS = {
+    'orders': F('total_orders').desc(),
+    'revenue': F('total_revenue').desc(),
+    'avg_ticket': F('avg_ticket').desc(),
+    'avg_close_time': F('avg_close_time_us').asc(nulls_last=True),
+}
+
+
+def waitress_performance(restaurant_id, start_date, end_date, order_by='revenue'):
+    """
+    Queryset de values() con el desempeño de cada mesera del restaurante en el rango, desde el rollup diario:
+    órdenes, ingresos, ticket promedio, órdenes cerradas y tiempo promedio de apertura a cierre, con su
+    posición (rank) según order_by. Se pagina en la base de datos.
+    """
+    ordering = WAITRESS_ORDERINGS[order_by]
+    return (WaitressDailyStats.objects
+            .filter(restaurant_id=restaurant_id, date__range=(start_date, end_date))
+            .values('waitress_id', 'waitress__username')
+            .annotate(total_orders=Sum('orders'), total_revenue=Sum('revenue'),
+                      total_closed=Sum('closed_orders'), total_close_time_us=Sum('close_time_us'))
+            .filter(total_orders__gt=0)
+            .annotate(avg_ticket=ExpressionWrapper(F('total_revenue') / F('total_orders'),
+                                                   output_field=DecimalField(max_digits=14, decimal_places=2)),
+                      avg_close_time_us=Cast(F('total_close_time_us'), FloatField()) / NullIf(F('total_closed'), 0))
+            .annotate(rank=Window(Rank(), order_by=[ordering]))
+            .order_by(ordering, 'waitress_id'))
+
+
+def waitress_performance_data(rows):
+    return [
+        {
+            'rank': row['rank'],
+            'waitress': row['waitress_id'],
+            'username': row['waitress__username'],
+            'orders': row['total_orders'],
+            'revenue': '{:.2f}'.format(row['total_revenue']),
+            'avg_ticket': '{:.2f}'.format(row['avg_ticket']),
+            'closed_orders': row['total_closed'],
+            'avg_close_seconds': (None if row['avg_close_time_us'] is None
+                                  else round(row['avg_close_time_us'] / 1000000, 1)),
+        }
+        for row in rows
+    ]
@@ -1,13 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
-from ..models import OrderItem, Order, ReportRequest
+from django.db import transaction
+from django.utils import timezone
+from apps.restaurants.models import ProductItem
+from ..models import OrderItem, Order, OrderEvent, ReportRequest
+from ..events import order_snapshot, record_order_event
+from gestionPedidos.serializers import ValuesSerializer
+
+
+class ProductItemField(serializers.PrimaryKeyRelatedField):
+    """
+    Resuelve el producto desde los que OrderItemListSerializer cargó para toda la lista, sin una consulta por item.
+    """
+
+    def to_internal_value(self, data):
+        products = getattr(self.parent.parent, 'products', None)
+        if products is None:
+            return super().to_internal_value(data)
+        try:
+            return products[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = {str(item.get('product_item')) for item in data if isinstance(item, dict)}
+            self.products = ProductItem.objects.in_bulk([int(pk) for pk in ids if pk.isdigit()])
+        return super().to_internal_value(data)
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product_item = ProductItemField(queryset=ProductItem.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['product_item', 'quantity']
+        list_serializer_class = OrderItemListSerializer
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -32,29 +67,30 @@ class OrderSerializer(serializers.ModelSerializer):
         if user.role != 'WAITRESS':
             raise serializers.ValidationError({"detail": "Only WAITRESS can create orders."})
 
-        if not user.restaurant:
+        if not user.restaurant_id:
             raise serializers.ValidationError({
                 "restaurant": "No restaurant is assigned to your account."
             })
 
-        validated_data['restaurant'] = user.restaurant
+        validated_data['restaurant_id'] = user.restaurant_id
         validated_data['waitress'] = user
 
         items_data = validated_data.pop('items')
 
         for item in items_data:
             product = item.get('product_item')
-            if product.restaurant != user.restaurant:
+            if product.restaurant_id != user.restaurant_id:
                 raise serializers.ValidationError({
                     "items": "All items must belong to your assigned restaurant."
                 })
 
-        order = Order.objects.create(**validated_data)
-
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
-
-        order.update_total()
+        with transaction.atomic():
+            order = Order(**validated_data)
+            items = [OrderItem.build(order, **item_data) for item_data in items_data]
+            order.total = sum((item.subtotal for item in items), Decimal(0))
+            order.save()
+            OrderItem.objects.bulk_create(items)
+            record_order_event(OrderEvent.CREATED, order, items=items)
 
         return order
     
@@ -69,6 +105,50 @@ class ListOrderSerializer(serializers.ModelSerializer):
             'id', 'client', 'waitress', 'status_order', 'total', 'created_at', 'items'
         ]
 
+
+class ListOrderValuesSerializer(ValuesSerializer):
+    """
+    Versión de solo lectura de ListOrderSerializer para listados.
+    Los items de toda la página se cargan con una sola consulta, y solo si se piden.
+    """
+    fields = ('id', 'client', 'waitress', 'status_order', 'total', 'created_at', 'items')
+    sources = {'client': 'client_id', 'waitress': 'waitress_id'}
+    decimal_fields = {'total': 2}
+    datetime_fields = ('created_at',)
+
+    @classmethod
+    def columns(cls, fields=None):
+        fields = fields or cls.fields
+        columns = [cls.sources.get(field, field) for field in fields if field != 'items']
+        if 'items' in fields and 'id' not in columns:
+            columns.append('id')
+        return columns
+
+    def to_representation(self, rows):
+        if 'items' not in self.selected_fields:
+            return super().to_representation(rows)
+        rows = list(rows)
+        items = {row['id']: [] for row in rows}
+        if items:
+            queryset = (OrderItem.objects.filter(order_id__in=list(items))
+                        .order_by('order_id', 'id')
+                        .values_list('order_id', 'product_item_id', 'quantity'))
+            for order_id, product_item_id, quantity in queryset:
+                items[order_id].append({'product_item': product_item_id, 'quantity': quantity})
+        for row in rows:
+            row['items'] = items[row['id']]
+        return super().to_representation(rows)
+
+
+class OrderChangeValuesSerializer(ListOrderValuesSerializer):
+    """
+    Filas del feed de cambios de órdenes, incluyendo las eliminadas (status=False).
+    """
+    fields = ('id', 'restaurant', 'client', 'waitress', 'status_order', 'total', 'status',
+              'created_at', 'updated_at', 'items')
+    sources = {'restaurant': 'restaurant_id', 'client': 'client_id', 'waitress': 'waitress_id'}
+    datetime_fields = ('created_at', 'updated_at')
+
     
 class UpdateOrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
@@ -83,17 +163,29 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['total', 'restaurant', 'waitress']
 
     def update(self, instance, validated_data):
+        """
+        instance debe venir bloqueada con Order.lock_order dentro de la transacción de la vista.
+        """
         items_data = validated_data.pop('items', None)
-        
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        if items_data is not None:
-            instance.items.all().delete()
-            for item_data in items_data:
-                OrderItem.objects.create(order=instance, **item_data)
-        instance.update_total()
+
+        with transaction.atomic():
+            items = list(instance.items.order_by('id'))
+            before = order_snapshot(instance, items)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if items_data is not None:
+                instance.items.all().delete()
+                items = OrderItem.objects.bulk_create([OrderItem.build(instance, **item_data)
+                                                       for item_data in items_data])
+                instance.update_total()
+
+            if instance.status_order != before['status_order']:
+                event_type = OrderEvent.STATUS_CHANGED
+            else:
+                event_type = OrderEvent.UPDATED
+            record_order_event(event_type, instance, before=before, items=items)
         return instance
     
 
@@ -109,4 +201,28 @@ class ReportGenerationSerializer(serializers.Serializer):
 
 
 class ReportDownloadSerializer(serializers.Serializer):
-    task_id = serializers.CharField()
\ No newline at end of file
+    task_id = serializers.CharField()
+
+class AnalyticsRangeSerializer(serializers.Serializer):
+    """
+    Rango de fechas de los endpoints de analítica; por defecto los últimos 30 días.
+    """
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('end_date', timezone.localdate())
+        attrs.setdefault('start_date', attrs['end_date'] - timedelta(days=30))
+        if attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError({"start_date": "start_date must be before end_date."})
+        return attrs
+
+
+class ProductSalesQuerySerializer(AnalyticsRangeSerializer):
+    period = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    order_by = serializers.ChoiceField(choices=['quantity', 'revenue'], default='quantity')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class WaitressPerformanceQuerySerializer(AnalyticsRangeSerializer):
+    order_by = serializers.ChoiceField(choices=['revenue', 'orders', 'avg_ticket', 'avg_close_time'], default='revenue')
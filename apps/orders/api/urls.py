@@ -3,15 +3,28 @@ from django.views.decorators.cache import cache_page
 from apps.orders.api.views import (OrderCreateAPIView,
                                    OrderListByRestaurantAPIView,
                                    OrderDetailAPIView,
+                                   OrderExportAPIView,
+                                   OrderChangeFeedAPIView,
                                    ReportGenerateAPIView,
                                    ReportDownloadAPIView,
-                                   ReportRequestListAPIView)
+                                   ReportRequestListAPIView,
+                                   ProductSalesAnalyticsAPIView,
+                                   OrderHeatmapAnalyticsAPIView,
+                                   WaitressPerformanceAnalyticsAPIView,
+                                   OrderDashboardAPIView)
 
 urlpatterns = [
     path('create', OrderCreateAPIView.as_view(), name='order-create'),
     path('list/<int:restaurant_id>', cache_page(60, cache='default')(OrderListByRestaurantAPIView.as_view()), name='order-list'),
     path('<int:restaurant_id>', OrderDetailAPIView.as_view(), name='order-edit'),
+    path('export/<int:restaurant_id>', OrderExportAPIView.as_view(), name='order-export'),
+    path('changes/', OrderChangeFeedAPIView.as_view(), name='order-changes'),
     path('reports/generate/', ReportGenerateAPIView.as_view(), name='report-generate'),
     path('reports/download/', ReportDownloadAPIView.as_view(), name='report-download'),
     path('reports/requests/', ReportRequestListAPIView.as_view(), name='report-request-list'),
+    path('analytics/products/<int:restaurant_id>', ProductSalesAnalyticsAPIView.as_view(), name='analytics-products'),
+    path('analytics/heatmap/<int:restaurant_id>', OrderHeatmapAnalyticsAPIView.as_view(), name='analytics-heatmap'),
+    path('analytics/waitresses/<int:restaurant_id>', WaitressPerformanceAnalyticsAPIView.as_view(),
+         name='analytics-waitresses'),
+    path('analytics/today/<int:restaurant_id>', OrderDashboardAPIView.as_view(), name='analytics-today'),
 ]   
\ No newline at end of file
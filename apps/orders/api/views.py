@@ -4,20 +4,31 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from gestionPedidos.utils import CustomPagination
+from gestionPedidos.renderers import FAST_RENDERER_CLASSES
+from gestionPedidos.utils import CustomPagination, ChangeFeedPagination
 from .serializers import (OrderSerializer,
                           UpdateOrderSerializer,
-                          ListOrderSerializer,
+                          ListOrderValuesSerializer,
+                          OrderChangeValuesSerializer,
                           ReportRequestSerializer,
                           ReportGenerationSerializer,
-                          ReportDownloadSerializer)
-from apps.orders.models import Order
-from apps.restaurants.models import Restaurant
+                          ReportDownloadSerializer,
+                          AnalyticsRangeSerializer,
+                          ProductSalesQuerySerializer,
+                          WaitressPerformanceQuerySerializer)
+from apps.orders.models import Order, OrderEvent
+from apps.users.authorization import get_auth_context
 from apps.orders.models import ReportRequest
 from ..tasks import generate_sales_report
-from datetime import timedelta
+from ..export import accepts_gzip, export_queryset, stream_export
+from ..events import order_snapshot, record_order_event
+from ..analytics import product_sales_ranking, hourly_heatmap, waitress_performance, waitress_performance_data
+from ..dashboard import today_dashboard
+from datetime import datetime, time, timedelta
+from django.db import transaction
 from django.utils import timezone
-from django.http import FileResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 import os
 from apps.orders.api.filters import OrderFilter
 from celery.result import AsyncResult
@@ -49,6 +60,7 @@ class OrderListByRestaurantAPIView(APIView):
     Endpoint para listar órdenes de un restaurante con filtros por fechas.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     @swagger_auto_schema(
         tags=["Orders"],
@@ -70,22 +82,38 @@ class OrderListByRestaurantAPIView(APIView):
                 'end_date', openapi.IN_QUERY,
                 description="Fecha de fin (YYYY-MM-DD)",
                 type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'count', openapi.IN_QUERY,
+                description="Modo de conteo: exact (por defecto), estimate o none",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'fields', openapi.IN_QUERY,
+                description="Campos a incluir, separados por coma (por ejemplo id,name)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'exclude', openapi.IN_QUERY,
+                description="Campos a excluir, separados por coma",
+                type=openapi.TYPE_STRING
             )
         ]
     )
     def get(self, request, restaurant_id, *args, **kwargs):
         user = request.user
+        auth_context = get_auth_context(user)
 
         if user.role == 'ADMIN':
             pass
         elif user.role == 'OWNER':
-            if not Restaurant.objects.filter(id=restaurant_id, owner=user).exists():
+            if not auth_context.owns(restaurant_id):
                 return Response(
                     {"error": "You are not the owner of this restaurant"},
                     status=status.HTTP_403_FORBIDDEN
                 )
         elif user.role == 'WAITRESS':
-            if not user.restaurant or user.restaurant.id != restaurant_id:
+            if not auth_context.can_access_restaurant(restaurant_id):
                 return Response(
                     {"error": "You are not assigned to this restaurant"},
                     status=status.HTTP_403_FORBIDDEN
@@ -110,16 +138,142 @@ class OrderListByRestaurantAPIView(APIView):
             queryset = queryset.filter(created_at__date__range=[start_date, end_date])
 
         paginator = CustomPagination()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = ListOrderSerializer(paginated_queryset, many=True)
+        fields = ListOrderValuesSerializer.select_fields(request)
+        paginated_queryset = paginator.paginate_queryset(ListOrderValuesSerializer.values(queryset, fields), request)
+        serializer = ListOrderValuesSerializer(paginated_queryset, fields=fields)
 
         return paginator.get_paginated_response(serializer.data)
 
 
+class OrderExportAPIView(APIView):
+    """
+    Exporta en streaming (NDJSON o CSV, opcionalmente con gzip) las órdenes o items de un restaurante en un rango de fechas.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Orders"],
+        operation_summary="Exportar órdenes de un restaurante",
+        operation_description=(
+            "Exporta todas las órdenes (kind=orders) o items (kind=items) del restaurante en el rango de fechas, "
+            "sin paginación. La respuesta se genera en streaming y se comprime con gzip si el cliente envía "
+            "'Accept-Encoding: gzip'. Por defecto se exportan los últimos 30 días."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'restaurant_id', openapi.IN_PATH,
+                description="ID del restaurante",
+                type=openapi.TYPE_INTEGER,
+                required=True
+            ),
+            openapi.Parameter(
+                'start_date', openapi.IN_QUERY,
+                description="Fecha de inicio (YYYY-MM-DD)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'end_date', openapi.IN_QUERY,
+                description="Fecha de fin (YYYY-MM-DD), inclusive",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'kind', openapi.IN_QUERY,
+                description="orders (por defecto) o items",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'file_format', openapi.IN_QUERY,
+                description="ndjson (por defecto) o csv",
+                type=openapi.TYPE_STRING
+            )
+        ],
+        responses={200: openapi.Response(description="Export file streamed.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        if not get_auth_context(request.user).can_access_restaurant(restaurant_id):
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        kind = request.GET.get('kind', 'orders')
+        file_format = request.GET.get('file_format', 'ndjson')
+        if kind not in ('orders', 'items') or file_format not in ('ndjson', 'csv'):
+            return Response(
+                {"error": "kind must be orders or items and file_format must be ndjson or csv."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filterset = OrderFilter(request.GET, queryset=Order.objects.none())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        end_date = filterset.form.cleaned_data.get('end_date') or timezone.now().date()
+        start_date = filterset.form.cleaned_data.get('start_date') or end_date - timedelta(days=30)
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+        header, queryset = export_queryset(kind, restaurant_id, start, end)
+        use_gzip = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        response = StreamingHttpResponse(
+            stream_export(header, queryset, file_format, gzip=use_gzip),
+            content_type='text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        )
+        filename = f"{kind}_{restaurant_id}_{start_date}_{end_date}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class OrderChangeFeedAPIView(APIView):
+    """
+    Feed incremental de órdenes modificadas (incluidas las eliminadas) desde un cursor.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        tags=["Orders"],
+        operation_summary="Feed de cambios de órdenes",
+        operation_description=(
+            "Retorna las órdenes creadas, modificadas o eliminadas después del cursor, ordenadas por "
+            "(updated_at, id). Cada usuario solo ve las órdenes de los restaurantes a los que tiene acceso."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description="Cursor 'next_cursor' de la respuesta anterior; vacío para empezar desde el inicio",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description="Número máximo de filas (por defecto 500, máximo 5000)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: openapi.Response(description="Changed rows and next cursor.")}
+    )
+    def get(self, request, *args, **kwargs):
+        auth_context = get_auth_context(request.user)
+        queryset = Order.objects.all()
+        if auth_context.role == 'OWNER':
+            queryset = queryset.filter(restaurant_id__in=auth_context.owned_restaurant_ids)
+        elif auth_context.role == 'WAITRESS':
+            queryset = queryset.filter(restaurant_id=auth_context.restaurant_id)
+        elif not auth_context.is_admin:
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return ChangeFeedPagination().paginate(queryset, request, OrderChangeValuesSerializer)
+
+
 class OrderDetailAPIView(APIView):
     """
     - PUT: Permite actualizar la orden y sus items.
     - DELETE: Realiza una eliminación lógica (cambia status a False).
+    Ambos métodos bloquean la fila de la orden (Order.lock_order) durante toda la transacción.
     """
     permission_classes = [IsAuthenticated]
 
@@ -134,20 +288,22 @@ class OrderDetailAPIView(APIView):
         request_body=OrderSerializer,
         responses={200: OrderSerializer()}
      )
+    @transaction.atomic
     def put(self, request, restaurant_id, *args, **kwargs):
         try:
-            order = Order.objects.get(pk=restaurant_id)
+            order = Order.lock_order(restaurant_id)
         except Order.DoesNotExist:
             return Response({"detail": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        auth_context = get_auth_context(request.user)
         if request.user.role == 'WAITRESS':
-            if not request.user.restaurant or order.restaurant.id != request.user.restaurant.id:
+            if not auth_context.can_access_restaurant(order.restaurant_id):
                 return Response(
                     {"detail": "You do not have permission to update orders from a different restaurant."},
                     status=status.HTTP_403_FORBIDDEN
                 )
         elif request.user.role == 'OWNER':
-            if order.restaurant.owner != request.user:
+            if not auth_context.owns(order.restaurant_id):
                 return Response(
                     {"detail": "You do not have permission to update orders for restaurants you do not own."},
                     status=status.HTTP_403_FORBIDDEN
@@ -173,31 +329,34 @@ class OrderDetailAPIView(APIView):
             403: openapi.Response(description="Permission denied.")
         }
     )
+    @transaction.atomic
     def delete(self, request, restaurant_id, *args, **kwargs):
         try:
-            order = Order.objects.get(pk=restaurant_id)
+            order = Order.lock_order(restaurant_id)
         except Order.DoesNotExist:
             return Response({"detail": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
         
+        auth_context = get_auth_context(request.user)
         if request.user.role == 'WAITRESS':
-            if not request.user.restaurant or order.restaurant.id != request.user.restaurant.id:
+            if not auth_context.can_access_restaurant(order.restaurant_id):
                 return Response(
                     {"detail": "You do not have permission to delete orders from a different restaurant."},
                     status=status.HTTP_403_FORBIDDEN
                 )
         elif request.user.role == 'OWNER':
-            if order.restaurant.owner != request.user:
+            if not auth_context.owns(order.restaurant_id):
                 return Response(
                     {"detail": "You do not have permission to delete orders for restaurants you do not own."},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
+        items = list(order.items.order_by('id'))
+        before = order_snapshot(order, items)
         order.status = False
-        order.save(update_fields=['status'])
-        for item in order.items.all():
-            item.status = False
-            item.save(update_fields=['status'])
-        
+        order.save(update_fields=['status', 'updated_at'])
+        order.items.update(status=False, updated_at=timezone.now())
+        record_order_event(OrderEvent.DELETED, order, before=before, items=items)
+
         return Response({"detail": "Order deleted."}, status=status.HTTP_204_NO_CONTENT)
     
 
@@ -300,4 +459,167 @@ class ReportRequestListAPIView(APIView):
         paginated_queryset = paginator.paginate_queryset(report_requests, request)
         serializer = ReportRequestSerializer(paginated_queryset, many=True)
 
-        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
+        return paginator.get_paginated_response(serializer.data)
+
+class ProductSalesAnalyticsAPIView(APIView):
+    """
+    Productos más vendidos de un restaurante por día, semana o mes, desde el rollup diario de ventas.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Analytics"],
+        operation_summary="Productos más vendidos",
+        operation_description=(
+            "Retorna, para cada período (day, week o month) del rango, los productos más vendidos con su "
+            "cantidad, ingresos y posición según 'order_by'. Solo para ADMIN o el OWNER del restaurante."
+        ),
+        manual_parameters=[
+            openapi.Parameter('restaurant_id', openapi.IN_PATH, description="ID del restaurante",
+                              type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Fecha de inicio (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Fecha de fin (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('period', openapi.IN_QUERY, description="day (por defecto), week o month",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('order_by', openapi.IN_QUERY, description="quantity (por defecto) o revenue",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Productos por período (por defecto 10, máximo 100)",
+                              type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Response(description="Ranked product sales per period.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        if not get_auth_context(request.user).can_manage_restaurant(restaurant_id):
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = ProductSalesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        return Response({
+            'restaurant': restaurant_id,
+            'start_date': params['start_date'],
+            'end_date': params['end_date'],
+            'period': params['period'],
+            'results': product_sales_ranking(restaurant_id, **params),
+        })
+
+
+class OrderHeatmapAnalyticsAPIView(APIView):
+    """
+    Heatmap de órdenes e ingresos por día de la semana y hora de un restaurante, desde el rollup horario.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Analytics"],
+        operation_summary="Heatmap de órdenes por día y hora",
+        operation_description=(
+            "Retorna las órdenes y los ingresos del rango agrupados por día de la semana ISO (1 = lunes, 7 = domingo) "
+            "y hora (0-23). Solo incluye las celdas con órdenes. Solo para ADMIN o el OWNER del restaurante."
+        ),
+        manual_parameters=[
+            openapi.Parameter('restaurant_id', openapi.IN_PATH, description="ID del restaurante",
+                              type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Fecha de inicio (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Fecha de fin (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses={200: openapi.Response(description="Orders and revenue per weekday and hour.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        if not get_auth_context(request.user).can_manage_restaurant(restaurant_id):
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = AnalyticsRangeSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        return Response({
+            'restaurant': restaurant_id,
+            'start_date': params['start_date'],
+            'end_date': params['end_date'],
+            'results': hourly_heatmap(restaurant_id, params['start_date'], params['end_date']),
+        })
+
+
+class WaitressPerformanceAnalyticsAPIView(APIView):
+    """
+    Ranking de desempeño de las meseras de un restaurante, desde el rollup diario por mesera.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Analytics"],
+        operation_summary="Desempeño de meseras",
+        operation_description=(
+            "Retorna, para cada mesera del restaurante, las órdenes atendidas, ingresos, ticket promedio, órdenes "
+            "cerradas y tiempo promedio de apertura a cierre (segundos) en el rango, ordenadas y numeradas según "
+            "'order_by'. Paginado. Solo para ADMIN o el OWNER del restaurante."
+        ),
+        manual_parameters=[
+            openapi.Parameter('restaurant_id', openapi.IN_PATH, description="ID del restaurante",
+                              type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Fecha de inicio (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Fecha de fin (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('order_by', openapi.IN_QUERY,
+                              description="revenue (por defecto), orders, avg_ticket o avg_close_time",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses={200: openapi.Response(description="Ranked waitress performance.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        if not get_auth_context(request.user).can_manage_restaurant(restaurant_id):
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = WaitressPerformanceQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        paginator = CustomPagination()
+        rows = paginator.paginate_queryset(waitress_performance(restaurant_id, **params), request)
+        return paginator.get_paginated_response(waitress_performance_data(rows))
+
+
+class OrderDashboardAPIView(APIView):
+    """
+    Dashboard en vivo del día de un restaurante (órdenes, ingresos y órdenes abiertas por estado),
+    leído de los contadores en Redis sin consultar las órdenes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Analytics"],
+        operation_summary="Dashboard de hoy",
+        operation_description=(
+            "Retorna las órdenes activas creadas hoy, sus ingresos, las órdenes abiertas (estados distintos de "
+            "closed, delivered y paid) y el conteo por status_order. Los contadores se actualizan en cada cambio "
+            "de orden y se reconcilian con la base de datos cada 5 minutos. Solo para ADMIN o el OWNER del restaurante."
+        ),
+        manual_parameters=[
+            openapi.Parameter('restaurant_id', openapi.IN_PATH, description="ID del restaurante",
+                              type=openapi.TYPE_INTEGER, required=True),
+        ],
+        responses={200: openapi.Response(description="Today's order counters.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        if not get_auth_context(request.user).can_manage_restaurant(restaurant_id):
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(today_dashboard(restaurant_id))
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.dateparse import parse_datetime
+from apps.orders.models import Order
+from apps.users.models import Client
+
+
+CLIENT_COUNTERS_CHUNK_SIZE = 1000
+
+
+def _client_contribution(snapshot):
+    if snapshot is None or not snapshot['status'] or snapshot['client'] is None:
+        return None
+    return snapshot['client'], Decimal(snapshot['total'] or 0), parse_datetime(snapshot['created_at'])
+
+
+def _last_order_subquery(client_ref):
+    return Subquery(
+        Order.objects.filter(client_id=client_ref, status=True)
+        .order_by().values('client_id').annotate(last=Max('created_at')).values('last')[:1]
+    )
+
+
+def update_client_counters(before, after):
+    """
+    Aplica a los contadores del cliente (order_count, total_spent, last_order_at) la diferencia entre dos
+    snapshots de una orden, con UPDATE ... SET col = col + delta. Debe llamarse dentro de la transacción
+    que modifica la orden. Si el cliente pierde una orden, last_order_at se recalcula en el mismo UPDATE.
+    """
+    old = _client_contribution(before)
+    new = _client_contribution(after)
+    if old == new:
+        return
+
+    deltas = {}
+    if old:
+        deltas[old[0]] = [-1, -old[1]]
+    if new:
+        delta = deltas.setdefault(new[0], [0, Decimal(0)])
+        delta[0] += 1
+        delta[1] += new[1]
+
+    # Filas en orden de id: dos movimientos cruzados (A→B y B→A) bloquean en el mismo orden y no se interbloquean.
+    for client_id, (count, total) in sorted(deltas.items()):
+        updates = {}
+        if count:
+            updates['order_count'] = F('order_count') + count
+        if total:
+            updates['total_spent'] = F('total_spent') + total
+        if count < 0:
+            updates['last_order_at'] = _last_order_subquery(client_id)
+        elif new and client_id == new[0]:
+            created_at = Value(new[2])
+            updates['last_order_at'] = Greatest(Coalesce(F('last_order_at'), created_at), created_at)
+        Client.objects.filter(pk=client_id).update(**updates)
+
+
+def rebuild_client_counters(chunk_size=CLIENT_COUNTERS_CHUNK_SIZE):
+    """
+    Recalcula los contadores de todos los clientes desde sus órdenes activas, por rangos de id de
+    chunk_size clientes (un UPDATE con subconsultas por rango). Retorna la cantidad de clientes actualizados.
+    """
+    orders = Order.objects.filter(client_id=OuterRef('pk'), status=True).order_by().values('client_id')
+    order_count = Subquery(orders.annotate(value=Count('id')).values('value')[:1])
+    total_spent = Subquery(orders.annotate(value=Sum('total')).values('value')[:1])
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(Client.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return updated
+        updated += Client.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            order_count=Coalesce(order_count, 0),
+            total_spent=Coalesce(total_spent, Value(Decimal(0)), output_field=DecimalField(max_digits=14,
+                                                                                         decimal_places=2)),
+            last_order_at=_last_order_subquery(OuterRef('pk')),
+        )
+        last_id = ids[-1]
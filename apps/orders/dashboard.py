@@ -0,0 +1,182 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache, caches
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.orders.models import Order
+
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_TTL = 60 * 60 * 24 * 2
+ORDERS_FIELD = 'orders'
+REVENUE_FIELD = 'revenue_cents'
+STATUS_PREFIX = 'status:'
+
+
+def dashboard_key(restaurant_id, day):
+    return f"order_dashboard:{restaurant_id}:{day.isoformat()}"
+
+
+def _redis():
+    """
+    Conexión de Redis de la caché por defecto, o None si la caché no es Redis (desarrollo y tests).
+    """
+    try:
+        from django_redis.cache import RedisCache
+        from django_redis import get_redis_connection
+    except ImportError:
+        return None
+    if not isinstance(caches['default'], RedisCache):
+        return None
+    return get_redis_connection('default')
+
+
+def _cents(value):
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def _dashboard_counters(snapshot):
+    if snapshot is None or not snapshot['status']:
+        return None
+    day = timezone.localtime(parse_datetime(snapshot['created_at'])).date()
+    return (snapshot['restaurant'], day), {
+        ORDERS_FIELD: 1,
+        REVENUE_FIELD: _cents(snapshot['total']),
+        STATUS_PREFIX + snapshot['status_order']: 1,
+    }
+
+
+def dashboard_deltas(before, after):
+    """
+    Diferencia entre los contadores con los que contribuyen dos snapshots de una orden,
+    agrupada por (restaurante, día de creación). Omite los campos sin cambio.
+    """
+    deltas = defaultdict(Counter)
+    for snapshot, sign in ((before, -1), (after, 1)):
+        counters = _dashboard_counters(snapshot)
+        if counters is None:
+            continue
+        key, values = counters
+        for field, value in values.items():
+            deltas[key][field] += sign * value
+    return {key: {field: value for field, value in fields.items() if value}
+            for key, fields in deltas.items() if any(fields.values())}
+
+
+def apply_dashboard_deltas(before, after):
+    """
+    Aplica a los contadores del dashboard el cambio de una orden: HINCRBY sobre el hash del restaurante y
+    día en una transacción MULTI de Redis. Se ejecuta con on_commit; si Redis falla solo se registra el
+    error, y la reconciliación periódica corrige los contadores.
+    """
+    deltas = dashboard_deltas(before, after)
+    if not deltas:
+        return
+    try:
+        redis = _redis()
+        if redis is None:
+            for (restaurant_id, day), fields in deltas.items():
+                key = dashboard_key(restaurant_id, day)
+                counters = Counter(cache.get(key) or {})
+                counters.update(fields)
+                cache.set(key, dict(counters), DASHBOARD_TTL)
+            return
+        pipeline = redis.pipeline(transaction=True)
+        for (restaurant_id, day), fields in deltas.items():
+            key = cache.make_key(dashboard_key(restaurant_id, day))
+            for field, value in fields.items():
+                pipeline.hincrby(key, field, value)
+            pipeline.expire(key, DASHBOARD_TTL)
+        pipeline.execute()
+    except Exception:
+        logger.exception("Could not update the order dashboard counters")
+
+
+def _read_counters(restaurant_id, day):
+    redis = _redis()
+    if redis is None:
+        return cache.get(dashboard_key(restaurant_id, day))
+    values = redis.hgetall(cache.make_key(dashboard_key(restaurant_id, day)))
+    return {field.decode(): int(value) for field, value in values.items()} or None
+
+
+def _write_counters(counters_by_key):
+    redis = _redis()
+    if redis is None:
+        cache.set_many(counters_by_key, DASHBOARD_TTL)
+        return
+    pipeline = redis.pipeline(transaction=True)
+    for key, counters in counters_by_key.items():
+        key = cache.make_key(key)
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=counters)
+        pipeline.expire(key, DASHBOARD_TTL)
+    pipeline.execute()
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _database_counters(day, restaurant_id=None):
+    start, end = _day_bounds(day)
+    orders = Order.objects.filter(status=True, created_at__gte=start, created_at__lt=end)
+    if restaurant_id is not None:
+        orders = orders.filter(restaurant_id=restaurant_id)
+    rows = (orders.values('restaurant_id', 'status_order')
+            .annotate(orders=Count('id'), revenue=Sum('total'))
+            .order_by())
+    counters = defaultdict(lambda: {ORDERS_FIELD: 0, REVENUE_FIELD: 0})
+    for row in rows:
+        restaurant_counters = counters[row['restaurant_id']]
+        restaurant_counters[ORDERS_FIELD] += row['orders']
+        restaurant_counters[REVENUE_FIELD] += _cents(row['revenue'])
+        restaurant_counters[STATUS_PREFIX + row['status_order']] = row['orders']
+    return counters
+
+
+def reconcile_dashboard(day=None, restaurant_ids=None):
+    """
+    Reemplaza los contadores del día con los valores de la base de datos: una consulta agrupada por
+    restaurante y status_order. Los restaurantes de restaurant_ids sin órdenes quedan en cero. Un
+    incremento que llegue entre la consulta y la escritura se pierde hasta la siguiente reconciliación.
+    Retorna la cantidad de restaurantes escritos.
+    """
+    day = day or timezone.localdate()
+    counters = _database_counters(day)
+    for restaurant_id in restaurant_ids or ():
+        counters.setdefault(restaurant_id, {ORDERS_FIELD: 0, REVENUE_FIELD: 0})
+    _write_counters({dashboard_key(restaurant_id, day): values for restaurant_id, values in counters.items()})
+    return len(counters)
+
+
+def today_dashboard(restaurant_id):
+    """
+    Contadores de hoy de un restaurante: una lectura (HGETALL) en Redis. Si no existen (expiraron o
+    Redis se reinició) se calculan una vez desde la base de datos y se guardan.
+    """
+    day = timezone.localdate()
+    counters = _read_counters(restaurant_id, day)
+    if counters is None:
+        counters = _database_counters(day, restaurant_id)[restaurant_id]
+        _write_counters({dashboard_key(restaurant_id, day): counters})
+
+    by_status = {
+        field[len(STATUS_PREFIX):]: value
+        for field, value in sorted(counters.items())
+        if field.startswith(STATUS_PREFIX) and value
+    }
+    return {
+        'restaurant': restaurant_id,
+        'date': day,
+        'orders': counters.get(ORDERS_FIELD, 0),
+        'revenue': '{:.2f}'.format(Decimal(counters.get(REVENUE_FIELD, 0)) / 100),
+        'open_orders': sum(value for status_order, value in by_status.items()
+                           if status_order not in Order.CLOSED_STATUSES),
+        'by_status': by_status,
+    }
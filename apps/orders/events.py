@@ -0,0 +1,180 @@
+import logging
+from functools import partial
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from gestionPedidos.renderers import json_dumps
+from gestionPedidos.serializers import format_datetime
+from apps.orders.counters import update_client_counters
+from apps.orders.dashboard import apply_dashboard_deltas
+from apps.orders.models import OrderEvent, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+RELAY_SCHEDULED_KEY = 'order_events:relay_scheduled'
+RELAY_SCHEDULED_TIMEOUT = 30
+RELAY_LOCK_KEY = 'order_events:relay_lock'
+RELAY_LOCK_TIMEOUT = 60 * 5
+
+_subscribers = None
+
+
+def _money(value):
+    return None if value is None else '{:f}'.format(Decimal(value).quantize(Decimal('0.01')))
+
+
+def order_snapshot(order, items=None):
+    """
+    Estado de la orden y sus items tal como se guarda en el payload de los eventos. items permite pasar
+    los items (OrderItem, en orden de id) cuando ya están en memoria, para no volver a consultarlos.
+    """
+    if items is None:
+        items = (OrderItem.objects.filter(order_id=order.pk)
+                 .order_by('id')
+                 .values_list('product_item_id', 'quantity', 'price_unit', 'subtotal'))
+    else:
+        items = [(item.product_item_id, item.quantity, item.price_unit, item.subtotal) for item in items]
+    return {
+        'id': order.pk,
+        'restaurant': order.restaurant_id,
+        'client': order.client_id,
+        'waitress': order.waitress_id,
+        'status_order': order.status_order,
+        'status': order.status,
+        'total': _money(order.total),
+        'created_at': format_datetime(order.created_at),
+        'updated_at': format_datetime(order.updated_at),
+        'closed_at': format_datetime(order.closed_at) if order.closed_at else None,
+        'items': [
+            {'product_item': product_item_id, 'quantity': quantity,
+             'price_unit': _money(price_unit), 'subtotal': _money(subtotal)}
+            for product_item_id, quantity, price_unit, subtotal in items
+        ],
+    }
+
+
+def record_order_event(event_type, order, before=None, items=None):
+    """
+    Agrega un evento al outbox y actualiza los contadores del cliente. Debe llamarse dentro de la
+    transacción que modifica la orden, de modo que el evento y los contadores existen si y solo si
+    el cambio hizo commit. Los contadores del dashboard en Redis se actualizan después del commit.
+    """
+    after = order_snapshot(order, items)
+    event = OrderEvent.objects.create(
+        event_type=event_type,
+        order_id=order.pk,
+        restaurant_id=order.restaurant_id,
+        payload={'before': before, 'after': after},
+    )
+    update_client_counters(before, after)
+    transaction.on_commit(partial(apply_dashboard_deltas, before, after))
+    transaction.on_commit(schedule_relay)
+    return event
+
+
+def schedule_relay():
+    """
+    Encola el relay una sola vez por ventana; los eventos que lleguen mientras tanto los entrega
+    la misma ejecución o la tarea periódica de beat. La publicación no reintenta: si el broker no
+    responde, el commit no queda esperando y los eventos los entrega beat.
+    """
+    from apps.orders.tasks import relay_order_events
+
+    if not cache.add(RELAY_SCHEDULED_KEY, 1, timeout=RELAY_SCHEDULED_TIMEOUT):
+        return
+    try:
+        relay_order_events.apply_async(retry=False)
+    except Exception:
+        cache.delete(RELAY_SCHEDULED_KEY)
+        logger.exception("Could not enqueue the order event relay; the periodic relay will deliver the events.")
+
+
+def get_subscribers():
+    global _subscribers
+    if _subscribers is None:
+        _subscribers = [import_string(path) for path in getattr(settings, 'ORDER_EVENT_SUBSCRIBERS', [])]
+    return _subscribers
+
+
+def event_data(event):
+    return {
+        'id': event.id,
+        'event_type': event.event_type,
+        'order_id': event.order_id,
+        'restaurant_id': event.restaurant_id,
+        'payload': event.payload,
+        'created_at': format_datetime(event.created_at),
+    }
+
+
+def relay_pending_events(batch_size=None):
+    """
+    Entrega los eventos pendientes en lotes. Cada lote se bloquea con SELECT ... FOR UPDATE SKIP LOCKED,
+    se pasa a todos los suscriptores y se marca como publicado en la misma transacción; si un suscriptor
+    falla, el lote se reintenta en la siguiente ejecución (entrega al menos una vez).
+    El id se asigna al insertar y no al hacer commit, así que un evento puede entregarse antes que otro
+    de id menor cuya transacción seguía abierta: no hay orden global. Los eventos de una misma orden sí
+    llegan en orden, porque cada cambio bloquea su fila (Order.lock_order) hasta el commit.
+    Retorna la cantidad de eventos entregados.
+    """
+    batch_size = batch_size or getattr(settings, 'ORDER_EVENT_BATCH_SIZE', 500)
+    cache.delete(RELAY_SCHEDULED_KEY)
+    if not cache.add(RELAY_LOCK_KEY, 1, timeout=RELAY_LOCK_TIMEOUT):
+        return 0
+    try:
+        return _relay_batches(batch_size)
+    finally:
+        cache.delete(RELAY_LOCK_KEY)
+
+
+def _relay_batches(batch_size, subscribers=None):
+    subscribers = get_subscribers() if subscribers is None else subscribers
+    delivered = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                OrderEvent.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            data = [event_data(event) for event in events]
+            for subscriber in subscribers:
+                subscriber(data)
+            OrderEvent.objects.filter(id__in=[event.id for event in events]).update(published_at=timezone.now())
+        delivered += len(events)
+        if len(events) < batch_size:
+            break
+    return delivered
+
+
+def publish_to_stream(events):
+    """
+    Suscriptor que publica los eventos en un stream de Redis (ORDER_EVENT_STREAM) para consumidores externos.
+    No hace nada si la caché por defecto no es Redis.
+    """
+    try:
+        from django_redis.cache import RedisCache
+        from django_redis import get_redis_connection
+    except ImportError:
+        return
+    if not isinstance(caches['default'], RedisCache):
+        return
+
+    stream = getattr(settings, 'ORDER_EVENT_STREAM', 'orders:events')
+    maxlen = getattr(settings, 'ORDER_EVENT_STREAM_MAXLEN', 100000)
+    pipeline = get_redis_connection('default').pipeline(transaction=False)
+    for event in events:
+        pipeline.xadd(stream, {
+            'id': event['id'],
+            'event_type': event['event_type'],
+            'order_id': event['order_id'],
+            'restaurant_id': event['restaurant_id'],
+            'payload': json_dumps(event['payload']),
+        }, maxlen=maxlen, approximate=True)
+    pipeline.execute()
@@ -0,0 +1,128 @@
+import csv
+import zlib
+from decimal import Decimal
+from datetime import datetime
+from gestionPedidos.renderers import json_dumps
+from gestionPedidos.serializers import format_datetime
+from apps.orders.models import Order, OrderItem
+
+
+ORDER_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('client', 'client_id'),
+    ('waitress', 'waitress_id'),
+    ('status_order', 'status_order'),
+    ('total', 'total'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+ITEM_EXPORT_COLUMNS = (
+    ('order', 'order_id'),
+    ('order_created_at', 'order__created_at'),
+    ('order_status', 'order__status_order'),
+    ('product_item', 'product_item_id'),
+    ('quantity', 'quantity'),
+    ('price_unit', 'price_unit'),
+    ('subtotal', 'subtotal'),
+)
+
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+def export_queryset(kind, restaurant_id, start, end):
+    """
+    values_list() ordenado para exportar órdenes o items de un restaurante en [start, end).
+    """
+    if kind == 'items':
+        columns = ITEM_EXPORT_COLUMNS
+        queryset = OrderItem.objects.filter(
+            order__restaurant_id=restaurant_id, order__status=True,
+            order__created_at__gte=start, order__created_at__lt=end
+        ).order_by('order_id', 'id')
+    else:
+        columns = ORDER_EXPORT_COLUMNS
+        queryset = Order.objects.filter(
+            restaurant_id=restaurant_id, status=True, created_at__gte=start, created_at__lt=end
+        ).order_by('created_at', 'id')
+    return [name for name, _ in columns], queryset.values_list(*[source for _, source in columns])
+
+
+def _format_value(value):
+    if isinstance(value, Decimal):
+        return '{:f}'.format(value)
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    return value
+
+
+def _ndjson_lines(header, rows):
+    for row in rows:
+        yield json_dumps(dict(zip(header, map(_format_value, row)))) + b'\n'
+
+
+class _LineBuffer:
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_LineBuffer(), delimiter=';')
+    yield writer.writerow(header).encode('utf-8')
+    for row in rows:
+        yield writer.writerow([_format_value(value) for value in row]).encode('utf-8')
+
+
+def _buffered(lines):
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_BYTES:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Indica si el header Accept-Encoding admite gzip según sus q-values: 'gzip;q=0' lo rechaza y,
+    si gzip no aparece, decide el comodín '*'.
+    """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0))) > 0
+
+
+def stream_export(header, queryset, file_format, gzip=False):
+    """
+    Genera el archivo en bloques de ~64 KB leyendo con un cursor del lado del servidor,
+    de modo que la memoria usada es constante sin importar la cantidad de filas.
+    """
+    rows = queryset.iterator(chunk_size=EXPORT_CHUNK_ROWS)
+    lines = _csv_lines(header, rows) if file_format == 'csv' else _ndjson_lines(header, rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if gzip else chunks
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.orders.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los rollups de analítica de órdenes desde el historial, para cargarlos por primera vez o "
+        "repararlos. Entrega también los eventos pendientes del outbox sin contarlos dos veces."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Fecha inicial (YYYY-MM-DD) de las órdenes a recalcular.")
+        parser.add_argument('--until', help="Fecha final (YYYY-MM-DD) de las órdenes a recalcular.")
+        parser.add_argument('--restaurant', type=int, help="Solo este restaurante.")
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(since=options['since'], until=options['until'],
+                                  restaurant_id=options['restaurant'])
+        if written is None:
+            raise CommandError("The order event relay is running; try again when it finishes.")
+        for model_name, count in written.items():
+            self.stdout.write(f"{model_name}: {count} rows")
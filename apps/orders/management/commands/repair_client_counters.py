@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.orders.counters import CLIENT_COUNTERS_CHUNK_SIZE, rebuild_client_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de órdenes de los clientes (order_count, total_spent, last_order_at) "
+        "desde sus órdenes activas, por bloques de clientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CLIENT_COUNTERS_CHUNK_SIZE,
+                            help="Clientes actualizados por consulta.")
+
+    def handle(self, *args, **options):
+        updated = rebuild_client_counters(chunk_size=options['chunk_size'])
+        self.stdout.write(f"{updated} clients updated")
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-19 05:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_remove_reportrequest_restaurant'),
+        ('restaurants', '0002_initial'),
+        ('users', '0002_alter_user_role'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'created_at'], name='order_restaurant_created_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_closed_at(apps, schema_editor):
+    # La hora real de cierre no se guardaba; updated_at es la mejor aproximación disponible.
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(status_order__in=('closed', 'delivered', 'paid')).update(closed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_orderhourlystats'),
+        ('restaurants', '0003_productitem_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_closed_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='WaitressDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('closed_orders', models.BigIntegerField(default=0)),
+                ('close_time_us', models.BigIntegerField(default=0)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitress_stats', to='restaurants.restaurant')),
+                ('waitress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', 'date'], name='waitressstats_restaurant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('waitress', 'restaurant', 'date'), name='waitressstats_waitress_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_client_counters(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Client = apps.get_model('users', 'Client')
+    orders = Order.objects.filter(client_id=models.OuterRef('pk'), status=True).order_by().values('client_id')
+    Client.objects.update(
+        order_count=Coalesce(models.Subquery(orders.annotate(value=models.Count('id')).values('value')[:1]), 0),
+        total_spent=Coalesce(models.Subquery(orders.annotate(value=models.Sum('total')).values('value')[:1]),
+                             models.Value(Decimal(0)),
+                             output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+        last_order_at=models.Subquery(orders.annotate(value=models.Max('created_at')).values('value')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_closed_at_waitressdailystats'),
+        ('users', '0004_client_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_client_counters, migrations.RunPython.noop),
+    ]
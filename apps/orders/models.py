@@ -1,4 +1,8 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from ..users.models import Client, User
 from ..restaurants.models import Restaurant, ProductItem
 
@@ -7,6 +11,8 @@ class Order(models.Model):
     """
     Modelo que representa una orden/pedido realizado en un restaurante.
     """
+    CLOSED_STATUSES = ('closed', 'delivered', 'paid')
+
     restaurant = models.ForeignKey(Restaurant, related_name='orders', on_delete=models.CASCADE)
     client = models.ForeignKey(Client, related_name='orders', on_delete=models.SET_NULL, null=True, blank=True)
     waitress = models.ForeignKey(User, related_name='orders', on_delete=models.SET_NULL, null=True, blank=True)
@@ -15,17 +21,54 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['restaurant', 'created_at'], name='order_restaurant_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.restaurant.name}"
 
+    def save(self, *args, **kwargs):
+        """
+        Registra closed_at cuando status_order pasa a un estado de CLOSED_STATUSES y lo limpia si se reabre.
+        """
+        if self.status_order in self.CLOSED_STATUSES:
+            if self.closed_at is None:
+                self.closed_at = timezone.now()
+        else:
+            self.closed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status_order' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'closed_at'}
+        super().save(*args, **kwargs)
+
     def update_total(self):
         """
-        Recalcula el total de la orden sumando los subtotales de sus items.
+        Recalcula el total de la orden con un solo UPDATE que suma los subtotales de sus items en la base de
+        datos. Quien reemplaza items de una orden existente debe tener antes su fila bloqueada (lock_order)
+        para que dos ediciones concurrentes no se pisen.
+        """
+        items_total = (OrderItem.objects.filter(order_id=OuterRef('pk'))
+                       .order_by().values('order_id').annotate(value=Sum('subtotal')).values('value')[:1])
+        self.updated_at = timezone.now()
+        Order.objects.filter(pk=self.pk).update(
+            total=Coalesce(Subquery(items_total), Value(Decimal(0)),
+                           output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+            updated_at=self.updated_at,
+        )
+        self.refresh_from_db(fields=['total'])
+
+    @classmethod
+    def lock_order(cls, pk):
+        """
+        Relee la orden con SELECT ... FOR UPDATE. Debe llamarse dentro de transaction.atomic(); bloquea solo
+        esa fila, así las ediciones de una misma orden se serializan y las de otras órdenes siguen en paralelo.
         """
-        total = sum(item.subtotal for item in self.items.all() if item.subtotal is not None)
-        self.total = total
-        self.save(update_fields=['total'])
+        return cls.objects.select_for_update().get(pk=pk)
 
 
 class OrderItem(models.Model):
@@ -41,17 +84,140 @@ class OrderItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def build(cls, order, product_item, quantity=1):
+        """
+        Item sin guardar con precio y subtotal calculados, para crearlo junto con otros en un bulk_create.
+        """
+        return cls(order=order, product_item=product_item, quantity=quantity,
+                   price_unit=product_item.price, subtotal=quantity * product_item.price)
+
     def save(self, *args, **kwargs):
+        """
+        Un item nuevo suma su subtotal al total de la orden con UPDATE total = total + subtotal, que es atómico
+        aunque otros items se agreguen a la vez. Modificar un item existente recalcula el total completo.
+        """
         if self.price_unit is None:
             self.price_unit = self.product_item.price
         self.subtotal = self.quantity * self.price_unit
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
         super().save(*args, **kwargs)
-        self.order.update_total()
+        if adding:
+            Order.objects.filter(pk=self.order_id).update(total=F('total') + self.subtotal,
+                                                          updated_at=timezone.now())
+        elif update_fields is None or {'quantity', 'price_unit', 'subtotal'} & set(update_fields):
+            self.order.update_total()
 
     def __str__(self):
         return f"{self.quantity} x {self.product_item.name} - Subtotal: {self.subtotal}"
     
 
+class OrderEvent(models.Model):
+    """
+    Outbox de eventos de órdenes. Se escribe en la misma transacción que el cambio de la orden
+    y el relay de Celery lo entrega a los suscriptores marcando published_at.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    STATUS_CHANGED = 'status_changed'
+    DELETED = 'deleted'
+    EVENT_TYPES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (STATUS_CHANGED, 'Status changed'),
+        (DELETED, 'Deleted'),
+    )
+
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    order_id = models.BigIntegerField()
+    restaurant_id = models.BigIntegerField()
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'], name='orderevent_pending_idx',
+                condition=models.Q(published_at__isnull=True)
+            ),
+            models.Index(fields=['published_at'], name='orderevent_published_idx'),
+        ]
+
+    def __str__(self):
+        return f"OrderEvent {self.id} - {self.event_type} order {self.order_id}"
+
+
+class ProductSalesDaily(models.Model):
+    """
+    Rollup de ventas por producto y día (fecha de creación de la orden), mantenido por el suscriptor
+    de eventos de órdenes (apps.orders.analytics). Solo cuenta órdenes activas (status=True).
+    """
+    restaurant = models.ForeignKey(Restaurant, related_name='product_sales', on_delete=models.CASCADE)
+    product_item = models.ForeignKey(ProductItem, related_name='daily_sales', on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_item', 'date'], name='productsales_product_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'date'], name='productsales_restaurant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_item_id} {self.date}: {self.quantity}"
+
+
+class OrderHourlyStats(models.Model):
+    """
+    Rollup de órdenes y ventas por restaurante y hora (fecha y hora de creación de la orden), con el día
+    de la semana ISO (1 = lunes) para el heatmap. Lo mantiene apps.orders.analytics.
+    """
+    restaurant = models.ForeignKey(Restaurant, related_name='hourly_stats', on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    weekday = models.PositiveSmallIntegerField()
+    orders = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'date', 'hour'], name='hourlystats_restaurant_hour_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.date} {self.hour}h: {self.orders}"
+
+
+class WaitressDailyStats(models.Model):
+    """
+    Rollup diario por mesera y restaurante: órdenes atendidas, ingresos, órdenes cerradas y la suma de sus
+    tiempos de apertura a cierre (en microsegundos). Lo mantiene apps.orders.analytics.
+    """
+    restaurant = models.ForeignKey(Restaurant, related_name='waitress_stats', on_delete=models.CASCADE)
+    waitress = models.ForeignKey(User, related_name='daily_stats', on_delete=models.CASCADE)
+    date = models.DateField()
+    orders = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closed_orders = models.BigIntegerField(default=0)
+    close_time_us = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['waitress', 'restaurant', 'date'], name='waitressstats_waitress_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'date'], name='waitressstats_restaurant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.waitress_id} {self.restaurant_id} {self.date}: {self.orders}"
+
+
 class ReportRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -1,13 +1,17 @@
 import csv
 import os
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from celery import shared_task
 from django.conf import settings
 from django.db import connection
-from apps.orders.models import ReportRequest
+from django.utils import timezone
+from apps.orders.models import ReportRequest, OrderEvent
+from apps.orders.dashboard import reconcile_dashboard
+from apps.orders.events import relay_pending_events
+from apps.restaurants.models import Restaurant
 
 
-@shared_task
+@shared_task(acks_late=True)
 def generate_sales_report(month, year, report_request_id):
     """
     Genera un reporte CSV de ventas para todos los restaurantes, filtrado por mes y año.
@@ -58,4 +62,34 @@ def generate_sales_report(month, year, report_request_id):
     except ReportRequest.DoesNotExist:
         pass
 
-    return {"file_path": filepath, "status_report": "completed", "report_date": f"{year}-{str(month).zfill(2)}-01"}
\ No newline at end of file
+    return {"file_path": filepath, "status_report": "completed", "report_date": f"{year}-{str(month).zfill(2)}-01"}
+
+
+@shared_task
+def relay_order_events(batch_size=None):
+    """
+    Entrega los eventos pendientes del outbox de órdenes. Se encola tras cada commit y
+    también corre periódicamente desde beat para recoger lo que haya quedado pendiente.
+    """
+    return {"delivered": relay_pending_events(batch_size)}
+
+
+@shared_task(acks_late=True)
+def purge_order_events():
+    """
+    Elimina los eventos ya publicados más antiguos que ORDER_EVENT_RETENTION_DAYS.
+    """
+    days = getattr(settings, "ORDER_EVENT_RETENTION_DAYS", 7)
+    deleted, _ = OrderEvent.objects.filter(
+        published_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return {"deleted": deleted}
+
+
+@shared_task
+def reconcile_order_dashboard():
+    """
+    Recalcula desde la base de datos los contadores del dashboard de hoy de todos los restaurantes.
+    """
+    restaurant_ids = Restaurant.objects.filter(status=True).values_list('id', flat=True)
+    return {"restaurants": reconcile_dashboard(restaurant_ids=restaurant_ids)}
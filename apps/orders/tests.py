@@ -1,3 +1,268 @@
-from django.test import TestCase
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from gestionPedidos.renderers import FastJSONRenderer
+from gestionPedidos.testing import TEST_CACHES, QueryBudgetTestCase, build_fixtures
+from apps.orders.analytics import ROLLUPS, rebuild_rollups
+from apps.orders.counters import rebuild_client_counters
+from apps.orders.dashboard import reconcile_dashboard, today_dashboard
+from apps.orders.events import relay_pending_events
+from apps.orders.models import OrderItem, ReportRequest
+from apps.users.models import Client
 
-# Create your tests here.
+
+class OrderEndpointQueryBudgetTests(QueryBudgetTestCase):
+    url_module = 'apps.orders.api.urls'
+
+    def test_create_order(self):
+        items = [{'product_item': product.id, 'quantity': 2} for product in self.products[:3]]
+        self.assertQueryBudget('post', '/api/order/create', 10, 0, user=self.waitress, status_code=201,
+                               data={'client': self.clients[0].id, 'items': items}, format='json')
+
+    def test_list_orders(self):
+        self.assertQueryBudget('get', f'/api/order/list/{self.restaurant.id}', 6, 0, user=self.owner)
+
+    def test_list_orders_render_like_drf(self):
+        response = self.assertQueryBudget('get', f'/api/order/list/{self.restaurant.id}?limit=50', 6, 0,
+                                          user=self.owner)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_update_order(self):
+        items = [{'product_item': product.id, 'quantity': 1} for product in self.products[:3]]
+        response = self.assertQueryBudget('put', f'/api/order/{self.orders[0].id}', 17, 0, user=self.waitress,
+                                          data={'status_order': 'closed', 'items': items}, format='json')
+        self.assertIs(type(response.accepted_renderer), JSONRenderer)
+
+    def test_delete_order(self):
+        self.assertQueryBudget('delete', f'/api/order/{self.orders[0].id}', 10, 0, user=self.owner, status_code=204)
+
+    def test_export_orders(self):
+        self.assertQueryBudget('get', f'/api/order/export/{self.restaurant.id}?kind=items', 3, 0, user=self.owner)
+
+    def test_export_negotiates_gzip(self):
+        url = f'/api/order/export/{self.restaurant.id}'
+        for accept_encoding, gzipped in (('gzip, deflate', True), ('gzip;q=0, deflate', False),
+                                         ('br, *;q=0.5', True), ('notgzip', False)):
+            response = self.assertQueryBudget('get', url, 3, 0, user=self.owner,
+                                              HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertEqual(response.get('Content-Encoding') == 'gzip', gzipped, accept_encoding)
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_order_changes(self):
+        self.assertQueryBudget('get', '/api/order/changes/', 3, 0, user=self.owner)
+
+    def test_generate_report(self):
+        with mock.patch('apps.orders.api.views.generate_sales_report.delay') as delay:
+            delay.return_value.id = 'budget-report-task'
+            self.assertQueryBudget('post', '/api/order/reports/generate/', 3, 0, user=self.admin,
+                                   data={'month': timezone.now().month, 'year': timezone.now().year}, format='json')
+
+    def test_download_report(self):
+        task_id = ReportRequest.objects.filter(user=self.admin).values_list('task_id', flat=True).first()
+        with mock.patch('apps.orders.api.views.AsyncResult') as async_result:
+            async_result.return_value.ready.return_value = False
+            self.assertQueryBudget('post', '/api/order/reports/download/', 2, 0, user=self.admin, status_code=202,
+                                   data={'task_id': task_id}, format='json')
+
+    def test_list_report_requests(self):
+        self.assertQueryBudget('get', '/api/order/reports/requests/', 3, 0, user=self.admin)
+
+    def test_product_sales_analytics(self):
+        rebuild_rollups()
+        response = self.assertQueryBudget('get', f'/api/order/analytics/products/{self.restaurant.id}?period=month',
+                                          3, 0, user=self.owner)
+        self.assertEqual(response.data['results'][0]['rank'], 1)
+
+    def test_order_heatmap(self):
+        rebuild_rollups()
+        response = self.assertQueryBudget('get', f'/api/order/analytics/heatmap/{self.restaurant.id}', 3, 0,
+                                          user=self.owner)
+        self.assertEqual(sum(cell['orders'] for cell in response.data['results']), len(self.orders))
+
+    def test_waitress_performance(self):
+        rebuild_rollups()
+        response = self.assertQueryBudget('get', f'/api/order/analytics/waitresses/{self.restaurant.id}', 4, 0,
+                                          user=self.owner)
+        self.assertEqual(response.data['results'][0]['orders'], len(self.orders))
+
+    def test_today_dashboard(self):
+        reconcile_dashboard()
+        response = self.assertQueryBudget('get', f'/api/order/analytics/today/{self.restaurant.id}', 2, 0,
+                                          user=self.owner)
+        self.assertEqual(response.data['orders'], len(self.orders))
+
+
+class OrderRollupTests(QueryBudgetTestCase):
+
+    def _rollup_rows(self):
+        return {
+            rollup.model.__name__: sorted(
+                rollup.model.objects.values_list(*rollup.key_fields + rollup.value_fields)
+            )
+            for rollup in ROLLUPS
+        }
+
+    def test_incremental_rollups_match_rebuild(self):
+        rebuild_rollups()
+        self.authenticate(self.waitress)
+        items = [{'product_item': product.id, 'quantity': 3} for product in self.products[:2]]
+        created = self.client.post('/api/order/create', {'client': self.clients[0].id, 'items': items}, format='json')
+        self.client.put(f"/api/order/{created.data['id']}", {'status_order': 'closed', 'items': items[:1]},
+                        format='json')
+        self.client.put(f'/api/order/{self.orders[0].id}', {'status_order': 'closed', 'items': items}, format='json')
+        self.client.delete(f'/api/order/{self.orders[1].id}')
+        self.assertEqual(relay_pending_events(), 4)
+
+        incremental = self._rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self._rollup_rows())
+
+
+    def test_rebuild_does_not_count_pending_events_twice(self):
+        rebuild_rollups()
+        self.authenticate(self.waitress)
+        items = [{'product_item': product.id, 'quantity': 3} for product in self.products[:2]]
+        rebuild_product_sales = ROLLUPS[0].rebuild
+
+        def commit_order_then_rebuild(orders_filter):
+            # Una orden que hace commit después de entregar el outbox y antes de leer las órdenes.
+            self.client.post('/api/order/create', {'client': self.clients[0].id, 'items': items}, format='json')
+            return rebuild_product_sales(orders_filter)
+
+        with mock.patch.object(ROLLUPS[0], 'rebuild', side_effect=commit_order_then_rebuild):
+            rebuild_rollups(restaurant_id=self.restaurant.id)
+        self.assertEqual(relay_pending_events(), 0)
+
+        incremental = self._rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self._rollup_rows())
+
+    def test_rebuild_applies_pending_events_outside_its_scope(self):
+        rebuild_rollups()
+        self.authenticate(self.waitress)
+        items = [{'product_item': product.id, 'quantity': 2} for product in self.products[:2]]
+        self.client.post('/api/order/create', {'client': self.clients[0].id, 'items': items}, format='json')
+
+        rebuild_rollups(restaurant_id=self.second_restaurant.id)
+        self.assertEqual(relay_pending_events(), 0)
+        incremental = self._rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self._rollup_rows())
+
+
+class ClientCounterTests(QueryBudgetTestCase):
+
+    def _counters(self):
+        return list(Client.objects.order_by('id').values_list('id', 'order_count', 'total_spent', 'last_order_at'))
+
+    def test_counters_match_repair(self):
+        rebuild_client_counters()
+        self.authenticate(self.waitress)
+        items = [{'product_item': product.id, 'quantity': 2} for product in self.products[:2]]
+        created = self.client.post('/api/order/create', {'client': self.clients[0].id, 'items': items}, format='json')
+        self.client.put(f"/api/order/{created.data['id']}", {'items': items[:1]}, format='json')
+        self.client.put(f'/api/order/{self.orders[0].id}', {'client': self.clients[1].id, 'items': items},
+                        format='json')
+        self.authenticate(self.owner)
+        self.client.delete(f'/api/order/{self.orders[1].id}')
+
+        incremental = self._counters()
+        Client.objects.update(order_count=0, total_spent=0, last_order_at=None)
+        rebuild_client_counters(chunk_size=2)
+        self.assertEqual(incremental, self._counters())
+        self.assertEqual(Client.objects.get(pk=self.clients[0].id).order_count,
+                         self.clients[0].orders.filter(status=True).count())
+
+
+class OrderDashboardTests(QueryBudgetTestCase):
+
+    def test_incremental_counters_match_reconcile(self):
+        reconcile_dashboard()
+        self.authenticate(self.waitress)
+        items = [{'product_item': product.id, 'quantity': 2} for product in self.products[:2]]
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/order/create', {'client': self.clients[0].id, 'items': items},
+                                       format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/order/{created.data['id']}", {'status_order': 'closed', 'items': items[:1]},
+                            format='json')
+        self.authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/order/{self.orders[0].id}')
+
+        incremental = today_dashboard(self.restaurant.id)
+        self.assertEqual(incremental['orders'], len(self.orders))
+        self.assertEqual(incremental['by_status']['closed'], 1)
+        reconcile_dashboard()
+        self.assertEqual(incremental, today_dashboard(self.restaurant.id))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Row locks need PostgreSQL.")
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentOrderTotalTests(TransactionTestCase):
+    THREADS = 16
+
+    def setUp(self):
+        build_fixtures(self)
+        self.order = self.orders[0]
+        self.order.update_total()
+        rebuild_client_counters()
+
+    def _run_concurrently(self, target):
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                target(index)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def _assert_total_matches_items(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, sum(self.order.items.values_list('subtotal', flat=True), Decimal(0)))
+
+    def test_concurrent_item_inserts(self):
+        def add_item(index):
+            with transaction.atomic():
+                OrderItem.objects.create(order_id=self.order.pk, product_item=self.products[index],
+                                         quantity=index + 1)
+
+        self._run_concurrently(add_item)
+        self._assert_total_matches_items()
+
+    def test_concurrent_edits(self):
+        token = str(RefreshToken.for_user(self.waitress).access_token)
+
+        def edit(index):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            items = [{'product_item': product.id, 'quantity': index + 1} for product in self.products[index:index + 3]]
+            response = client.put(f'/api/order/{self.order.pk}', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+
+        self._run_concurrently(edit)
+        self._assert_total_matches_items()
+        self.assertEqual(self.order.items.count(), 3)
+
+        counters = list(Client.objects.order_by('id').values_list('id', 'order_count', 'total_spent'))
+        rebuild_client_counters()
+        self.assertEqual(counters, list(Client.objects.order_by('id').values_list('id', 'order_count', 'total_spent')))
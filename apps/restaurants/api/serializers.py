@@ -1,7 +1,9 @@
+from decimal import Decimal
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from apps.restaurants.models import Restaurant, ProductItem
+from gestionPedidos.serializers import ValuesSerializer
 from ...users.models import User
 
 
@@ -36,8 +38,59 @@ class ProductItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'restaurant', 'name', 'description', 'price']
 
 
+class ProductItemValuesSerializer(ValuesSerializer):
+    """
+    Versión de solo lectura de ProductItemSerializer para listados.
+    """
+    fields = ('id', 'restaurant', 'name', 'description', 'price')
+    sources = {'restaurant': 'restaurant_id'}
+    decimal_fields = {'price': 2}
+
+
+class ProductItemChangeValuesSerializer(ValuesSerializer):
+    """
+    Filas del feed de cambios de productos, incluyendo los eliminados (status=False).
+    """
+    fields = ('id', 'restaurant', 'name', 'description', 'price', 'status', 'created_at', 'updated_at')
+    sources = {'restaurant': 'restaurant_id'}
+    decimal_fields = {'price': 2}
+    datetime_fields = ('created_at', 'updated_at')
+
+
 class EditProductItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProductItem
-        fields = ['name', 'description', 'price']
\ No newline at end of file
+        fields = ['name', 'description', 'price']
+
+class MenuItemImportSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False, allow_null=True)
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=Decimal("0"))
+    status = serializers.BooleanField(required=False, default=True)
+
+
+class MenuImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+
+class ProductItemBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=Decimal("0"), required=False)
+    status = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if 'price' not in data and 'status' not in data:
+            raise serializers.ValidationError("Either price or status must be provided.")
+        return data
+
+
+class ProductItemBulkUpdateSerializer(serializers.Serializer):
+    items = ProductItemBulkUpdateItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each product can only appear once.")
+        return value
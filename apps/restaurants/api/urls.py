@@ -5,14 +5,22 @@ from .views import (ListAllRestaurantView,
                     RestaurantView,
                     ProductItemListCreateView,
                     ProductItemUpdateDeleteView,
-                    MenuRestaurantView)
+                    MenuRestaurantView,
+                    MenuExportView,
+                    MenuImportView,
+                    ProductItemBulkUpdateView,
+                    ProductItemChangeFeedView)
 
 
 urlpatterns = [
     path('', cache_page(60 * 5, cache='default')(RestaurantView.as_view()), name='list_resturantowner'),
     path('all', cache_page(60 * 5, cache='default')(ListAllRestaurantView.as_view()), name='list_resturant'),
     path('<int:pk>', UpdateRestaurantView.as_view(), name='udpate_resturant'),
-    path('product-items/', cache_page(60 * 2, cache='default')(ProductItemListCreateView.as_view()), name='productitem-list-create'),
+    path('product-items/', ProductItemListCreateView.as_view(), name='productitem-list-create'),
     path('product-items/<int:pk>', ProductItemUpdateDeleteView.as_view(), name='productitem-update-delete'),
-    path('menu/<int:restaurant_id>', cache_page(60 * 10, cache='default')(MenuRestaurantView.as_view()), name='menu-restaurant'),
+    path('product-items/changes/', ProductItemChangeFeedView.as_view(), name='productitem-changes'),
+    path('product-items/bulk-update', ProductItemBulkUpdateView.as_view(), name='productitem-bulk-update'),
+    path('menu/<int:restaurant_id>', MenuRestaurantView.as_view(), name='menu-restaurant'),
+    path('menu/<int:restaurant_id>/export', MenuExportView.as_view(), name='menu-export'),
+    path('menu/<int:restaurant_id>/import', MenuImportView.as_view(), name='menu-import'),
 ]
\ No newline at end of file
@@ -1,17 +1,81 @@
+import csv
+import io
+import json
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from gestionPedidos.utils import CustomPagination
+from gestionPedidos.renderers import FAST_RENDERER_CLASSES
+from gestionPedidos.utils import CustomPagination, ChangeFeedPagination
 from apps.restaurants.api.filters import RestaurantFilter, ProductItemFilter
 from .serializers import (RestaurantSerializer,
                           ProductItemSerializer,
+                          ProductItemValuesSerializer,
+                          ProductItemChangeValuesSerializer,
                           EditRestaurantSerializer,
                           ListRestaurantSerializer,
-                          EditProductItemSerializer)
+                          EditProductItemSerializer,
+                          MenuItemImportSerializer,
+                          MenuImportSerializer,
+                          ProductItemBulkUpdateSerializer)
 from ..models import Restaurant, ProductItem
+from ..cache import MENU_CACHE_TIMEOUT, menu_cache_key, product_list_cache_key, invalidate_menus
+from apps.users.authorization import get_auth_context
+
+
+MENU_COLUMNS = ['id', 'name', 'description', 'price', 'status']
+
+
+def _check_menu_permission(user, restaurant_id):
+    """
+    Retorna una Response de error si el usuario no puede administrar el menú del restaurante.
+    """
+    if user.role not in ('ADMIN', 'OWNER'):
+        return Response({"detail": "Only ADMIN or OWNER can manage menus."}, status=status.HTTP_403_FORBIDDEN)
+    if user.role == 'OWNER' and not get_auth_context(user).owns(restaurant_id):
+        return Response({"detail": "You can only manage the menu of your own restaurant."},
+                        status=status.HTTP_403_FORBIDDEN)
+    if user.role == 'ADMIN' and not Restaurant.objects.filter(id=restaurant_id).exists():
+        return Response({"detail": "Restaurant not found."}, status=status.HTTP_404_NOT_FOUND)
+    return None
+
+
+def _read_menu_file(file):
+    """
+    Lee un archivo de menú CSV (separado por ';') o JSON y retorna la lista de filas.
+    """
+    if file.name.lower().endswith('.json'):
+        data = json.load(file)
+        return data.get('items', []) if isinstance(data, dict) else data
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig'), delimiter=';')
+    return [{key: value for key, value in row.items() if value not in (None, '')} for row in reader]
+
+
+def _validate_menu_rows(rows):
+    """
+    Valida las filas del menú. Las filas con 'id' se validan como parciales: solo actualizan las
+    columnas presentes en el archivo. Retorna (actualizaciones, nuevas, errores); errores sigue el
+    orden de las filas y es None si todas son válidas.
+    """
+    if not isinstance(rows, list):
+        return [], [], ["Expected a list of items."]
+    is_update = [isinstance(row, dict) and row.get('id') is not None for row in rows]
+    updates = MenuItemImportSerializer(data=[row for row, update in zip(rows, is_update) if update],
+                                       many=True, partial=True)
+    creates = MenuItemImportSerializer(data=[row for row, update in zip(rows, is_update) if not update], many=True)
+    updates_valid, creates_valid = updates.is_valid(), creates.is_valid()
+    if updates_valid and creates_valid:
+        return updates.validated_data, creates.validated_data, None
+    update_errors = iter(updates.errors if not updates_valid else [{}] * len(updates.initial_data))
+    create_errors = iter(creates.errors if not creates_valid else [{}] * len(creates.initial_data))
+    errors = [next(update_errors) if update else next(create_errors) for update in is_update]
+    return [], [], errors
 
 
 class RestaurantView(APIView):
@@ -105,7 +169,7 @@ class UpdateRestaurantView(APIView):
         except Restaurant.DoesNotExist:
             return Response({"detail": "Restaurant not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        if request.user.role != 'ADMIN' and restaurant.owner != request.user:
+        if not get_auth_context(request.user).can_manage_restaurant(restaurant.id):
             return Response(
                 {"detail": "You do not have permission to update this restaurant."},
                 status=status.HTTP_403_FORBIDDEN
@@ -149,14 +213,32 @@ class ProductItemListCreateView(APIView):
     POST: Crea un nuevo producto. Solo ADMIN o OWNER pueden crear.
     """
     permission_classes = []  
+    renderer_classes = FAST_RENDERER_CLASSES
 
     @swagger_auto_schema(
         tags=['Restaurant'],
         operation_summary="Listar productos",
         operation_description="Obtiene la lista de todos los productos activos.",
+        manual_parameters=[
+            openapi.Parameter(
+                'fields', openapi.IN_QUERY,
+                description="Campos a incluir, separados por coma (por ejemplo id,name)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'exclude', openapi.IN_QUERY,
+                description="Campos a excluir, separados por coma",
+                type=openapi.TYPE_STRING
+            )
+        ],
         responses={200: ProductItemSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
+        cache_key = product_list_cache_key(request.GET.urlencode())
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
         queryset = ProductItem.objects.filter(status=True)
         filterset = ProductItemFilter(request.GET, queryset=queryset)
         if not filterset.is_valid():
@@ -164,9 +246,12 @@ class ProductItemListCreateView(APIView):
         queryset = filterset.qs 
 
         paginator = CustomPagination()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = ProductItemSerializer(paginated_queryset, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        fields = ProductItemValuesSerializer.select_fields(request)
+        paginated_queryset = paginator.paginate_queryset(ProductItemValuesSerializer.values(queryset, fields), request)
+        serializer = ProductItemValuesSerializer(paginated_queryset, fields=fields)
+        response = paginator.get_paginated_response(serializer.data)
+        cache.set(cache_key, response.data, MENU_CACHE_TIMEOUT)
+        return response
 
     @swagger_auto_schema(
         tags=['Restaurant'],
@@ -185,12 +270,13 @@ class ProductItemListCreateView(APIView):
         if serializer.is_valid():
             if request.user.role == 'OWNER':
                 restaurant = serializer.validated_data.get('restaurant')
-                if restaurant.owner != request.user:
+                if not get_auth_context(request.user).owns(restaurant.id):
                     return Response(
                         {"detail": "As an OWNER, you can only create products for your own restaurant."},
                         status=status.HTTP_403_FORBIDDEN
                     )
-            serializer.save()
+            product = serializer.save()
+            invalidate_menus([product.restaurant_id])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -216,7 +302,7 @@ class ProductItemUpdateDeleteView(APIView):
             return Response({"detail": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
         
         if request.user.role == 'OWNER':
-            if product.restaurant.owner != request.user:
+            if not get_auth_context(request.user).owns(product.restaurant_id):
                 return Response(
                     {"detail": "You can only update products from your own restaurant."},
                     status=status.HTTP_403_FORBIDDEN
@@ -230,6 +316,7 @@ class ProductItemUpdateDeleteView(APIView):
         serializer = EditProductItemSerializer(product, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            invalidate_menus([product.restaurant_id])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -251,7 +338,7 @@ class ProductItemUpdateDeleteView(APIView):
             return Response({"detail": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
         
         if request.user.role == 'OWNER':
-            if product.restaurant.owner != request.user:
+            if not get_auth_context(request.user).owns(product.restaurant_id):
                 return Response(
                     {"detail": "As an OWNER, you can only delete products from your own restaurant."},
                     status=status.HTTP_403_FORBIDDEN
@@ -267,14 +354,59 @@ class ProductItemUpdateDeleteView(APIView):
         
         product.status = False
         product.save()
+        invalidate_menus([product.restaurant_id])
         return Response({"detail": "Product Item deleted."}, status=status.HTTP_200_OK)
 
 
+class ProductItemChangeFeedView(APIView):
+    """
+    Feed incremental de productos modificados (incluidos los eliminados) desde un cursor.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        tags=['Restaurant'],
+        operation_summary="Feed de cambios de productos",
+        operation_description=(
+            "Retorna los productos creados, modificados o eliminados después del cursor, ordenados por "
+            "(updated_at, id). Cada usuario solo ve los productos de los restaurantes a los que tiene acceso."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description="Cursor 'next_cursor' de la respuesta anterior; vacío para empezar desde el inicio",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description="Número máximo de filas (por defecto 500, máximo 5000)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: openapi.Response(description="Changed rows and next cursor.")}
+    )
+    def get(self, request, *args, **kwargs):
+        auth_context = get_auth_context(request.user)
+        queryset = ProductItem.objects.all()
+        if auth_context.role == 'OWNER':
+            queryset = queryset.filter(restaurant_id__in=auth_context.owned_restaurant_ids)
+        elif auth_context.role == 'WAITRESS':
+            queryset = queryset.filter(restaurant_id=auth_context.restaurant_id)
+        elif not auth_context.is_admin:
+            return Response(
+                {"error": "You do not have permission to access this resource"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return ChangeFeedPagination().paginate(queryset, request, ProductItemChangeValuesSerializer)
+
+
 class MenuRestaurantView(APIView):
     """
     Lista todos los productos activos (menú) de un restaurante.
     """
     permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     @swagger_auto_schema(
         tags=['Restaurant'],
@@ -291,17 +423,196 @@ class MenuRestaurantView(APIView):
                 'limit', openapi.IN_QUERY,
                 description="Número de elementos por página (por defecto 10)",
                 type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'fields', openapi.IN_QUERY,
+                description="Campos a incluir, separados por coma (por ejemplo id,name)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'exclude', openapi.IN_QUERY,
+                description="Campos a excluir, separados por coma",
+                type=openapi.TYPE_STRING
             )
         ],
         responses={200: ProductItemSerializer(many=True)}
     )
     def get(self, request, restaurant_id, *args, **kwargs):
+        cache_key = menu_cache_key(restaurant_id, request.GET.urlencode())
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
         products = ProductItem.objects.filter(restaurant__id=restaurant_id, status=True)
         filterset = ProductItemFilter(request.GET, queryset=products)
         if not filterset.is_valid():
             return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
         queryset = filterset.qs 
         paginator = CustomPagination()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = ProductItemSerializer(paginated_queryset, many=True)
-        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
+        fields = ProductItemValuesSerializer.select_fields(request)
+        paginated_queryset = paginator.paginate_queryset(ProductItemValuesSerializer.values(queryset, fields), request)
+        serializer = ProductItemValuesSerializer(paginated_queryset, fields=fields)
+        response = paginator.get_paginated_response(serializer.data)
+        cache.set(cache_key, response.data, MENU_CACHE_TIMEOUT)
+        return response
+
+
+class MenuExportView(APIView):
+    """
+    Exporta el menú completo de un restaurante (incluyendo productos inactivos) en CSV o JSON.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=['Restaurant'],
+        operation_summary="Exportar menú del restaurante",
+        operation_description="Exporta todos los productos del restaurante. Solo ADMIN o el OWNER del restaurante.",
+        manual_parameters=[
+            openapi.Parameter(
+                'file_format', openapi.IN_QUERY,
+                description="Formato del archivo: csv (por defecto) o json",
+                type=openapi.TYPE_STRING
+            )
+        ],
+        responses={200: openapi.Response(description="Menu file downloaded.")}
+    )
+    def get(self, request, restaurant_id, *args, **kwargs):
+        error = _check_menu_permission(request.user, restaurant_id)
+        if error:
+            return error
+
+        file_format = request.GET.get('file_format', 'csv')
+        if file_format not in ('csv', 'json'):
+            return Response({"error": "file_format must be csv or json."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ProductItem.objects.filter(restaurant_id=restaurant_id).order_by('id').values_list(*MENU_COLUMNS)
+        if file_format == 'json':
+            items = [dict(zip(MENU_COLUMNS, row)) for row in rows]
+            for item in items:
+                item['price'] = str(item['price'])
+            response = HttpResponse(json.dumps({"items": items}, ensure_ascii=False), content_type='application/json')
+        else:
+            response = HttpResponse(content_type='text/csv')
+            writer = csv.writer(response, delimiter=';')
+            writer.writerow(MENU_COLUMNS)
+            writer.writerows(rows)
+        response['Content-Disposition'] = f'attachment; filename="menu_{restaurant_id}.{file_format}"'
+        return response
+
+
+class MenuImportView(APIView):
+    """
+    Importa el menú de un restaurante desde un archivo CSV o JSON.
+    Las filas con 'id' actualizan productos existentes y las demás crean productos nuevos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=['Restaurant'],
+        operation_summary="Importar menú del restaurante",
+        operation_description=(
+            "Importa productos desde un archivo .csv (separado por ';') o .json con las columnas "
+            "id (opcional), name, description, price y status. Todo el archivo se aplica en una sola transacción."
+        ),
+        request_body=MenuImportSerializer,
+        responses={200: openapi.Response(description="Menu imported.")}
+    )
+    def post(self, request, restaurant_id, *args, **kwargs):
+        error = _check_menu_permission(request.user, restaurant_id)
+        if error:
+            return error
+
+        serializer = MenuImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = _read_menu_file(serializer.validated_data['file'])
+        except (ValueError, UnicodeDecodeError, csv.Error):
+            return Response({"error": "The file could not be read."}, status=status.HTTP_400_BAD_REQUEST)
+
+        updates, creates, errors = _validate_menu_rows(rows)
+        if errors:
+            return Response({"items": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        to_update = {item['id']: item for item in updates}
+        existing = ProductItem.objects.in_bulk(to_update.keys()) if to_update else {}
+        unknown = [pk for pk, product in existing.items() if product.restaurant_id != restaurant_id]
+        unknown += [pk for pk in to_update if pk not in existing]
+        if unknown:
+            return Response({"error": f"Products not found in this restaurant: {sorted(unknown)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        update_fields = {'updated_at'}
+        for pk, product in existing.items():
+            for field, value in to_update[pk].items():
+                if field != 'id':
+                    setattr(product, field, value)
+                    update_fields.add(field)
+            product.updated_at = now
+        new_products = [
+            ProductItem(restaurant_id=restaurant_id, name=item['name'], description=item['description'],
+                        price=item['price'], status=item['status'])
+            for item in creates
+        ]
+
+        with transaction.atomic():
+            ProductItem.objects.bulk_update(existing.values(), sorted(update_fields), batch_size=500)
+            ProductItem.objects.bulk_create(new_products, batch_size=500)
+        invalidate_menus([restaurant_id])
+
+        return Response({
+            "created": len(new_products),
+            "updated": len(existing),
+            "detail": "Menu imported."
+        }, status=status.HTTP_200_OK)
+
+
+class ProductItemBulkUpdateView(APIView):
+    """
+    Actualiza el precio y/o el estado de varios productos en una sola solicitud.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=['Restaurant'],
+        operation_summary="Actualización masiva de productos",
+        operation_description=(
+            "Actualiza 'price' y/o 'status' de varios productos. Solo ADMIN o el OWNER de los restaurantes "
+            "de todos los productos. Los cambios se aplican en una sola transacción."
+        ),
+        request_body=ProductItemBulkUpdateSerializer,
+        responses={200: openapi.Response(description="Products updated.")}
+    )
+    def patch(self, request, *args, **kwargs):
+        if request.user.role not in ('ADMIN', 'OWNER'):
+            return Response({"detail": "Only ADMIN or OWNER can update products."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ProductItemBulkUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes = {item['id']: item for item in serializer.validated_data['items']}
+
+        products = ProductItem.objects.only('id', 'restaurant_id', 'price', 'status').in_bulk(changes.keys())
+        missing = [pk for pk in changes if pk not in products]
+        if missing:
+            return Response({"error": f"Products not found: {sorted(missing)}"}, status=status.HTTP_404_NOT_FOUND)
+
+        restaurant_ids = {product.restaurant_id for product in products.values()}
+        if request.user.role == 'OWNER':
+            if not restaurant_ids <= get_auth_context(request.user).owned_restaurant_ids:
+                return Response(
+                    {"detail": "You can only update products from your own restaurant."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        now = timezone.now()
+        for pk, product in products.items():
+            product.price = changes[pk].get('price', product.price)
+            product.status = changes[pk].get('status', product.status)
+            product.updated_at = now
+        with transaction.atomic():
+            ProductItem.objects.bulk_update(products.values(), ['price', 'status', 'updated_at'], batch_size=500)
+        invalidate_menus(restaurant_ids)
+
+        return Response({"updated": len(products), "detail": "Products updated."}, status=status.HTTP_200_OK)
\ No newline at end of file
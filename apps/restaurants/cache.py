@@ -0,0 +1,40 @@
+import hashlib
+import time
+from django.core.cache import cache
+
+
+MENU_CACHE_TIMEOUT = 60 * 10
+PRODUCT_LIST_VERSION_KEY = 'product_list_version'
+
+
+def _menu_version_key(restaurant_id):
+    return f"menu_version:{restaurant_id}"
+
+
+def menu_cache_key(restaurant_id, query_string):
+    """
+    Llave del menú cacheado. Incluye la versión del menú del restaurante, de modo que
+    invalidar consiste en cambiar la versión y las respuestas anteriores quedan huérfanas.
+    """
+    version = cache.get_or_set(_menu_version_key(restaurant_id), time.time_ns, None)
+    query_hash = hashlib.md5(query_string.encode()).hexdigest()
+    return f"menu:{restaurant_id}:{version}:{query_hash}"
+
+
+def product_list_cache_key(query_string):
+    """
+    Llave del listado de productos cacheado; igual que el menú, se invalida cambiando su versión.
+    """
+    version = cache.get_or_set(PRODUCT_LIST_VERSION_KEY, time.time_ns, None)
+    query_hash = hashlib.md5(query_string.encode()).hexdigest()
+    return f"product_list:{version}:{query_hash}"
+
+
+def invalidate_menus(restaurant_ids):
+    """
+    Invalida el menú cacheado de varios restaurantes y el listado de productos en una sola operación.
+    """
+    version = time.time_ns()
+    versions = {_menu_version_key(restaurant_id): version for restaurant_id in set(restaurant_ids)}
+    versions[PRODUCT_LIST_VERSION_KEY] = version
+    cache.set_many(versions, None)
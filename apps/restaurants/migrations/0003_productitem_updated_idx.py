@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productitem',
+            index=models.Index(fields=['updated_at', 'id'], name='productitem_updated_idx'),
+        ),
+    ]
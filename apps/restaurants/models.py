@@ -2,6 +2,27 @@ from django.db import models
 from django.conf import settings
 
 
+class RestaurantQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        update() no emite post_save; si cambia el owner invalida aquí el contexto de autorización de los
+        owners anteriores y nuevos. delete() ya emite post_delete por fila.
+        """
+        if 'owner' not in kwargs and 'owner_id' not in kwargs:
+            return super().update(**kwargs)
+        from apps.users.authorization import invalidate_auth_context
+        rows = list(self.values_list('pk', 'owner_id'))
+        updated = super().update(**kwargs)
+        owner_ids = {owner_id for _, owner_id in rows}
+        owner_ids.update(
+            self.model._base_manager.filter(pk__in=[pk for pk, _ in rows]).values_list('owner_id', flat=True)
+        )
+        invalidate_auth_context(*owner_ids)
+        return updated
+
+    update.alters_data = True
+
+
 class Restaurant(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='restaurants', on_delete=models.CASCADE)
     name = models.CharField(max_length=255, unique=True)
@@ -11,6 +32,8 @@ class Restaurant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RestaurantQuerySet.as_manager()
+
     def __str__(self):
         return self.name
     
@@ -24,5 +47,10 @@ class ProductItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='productitem_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - ${self.price} ({self.restaurant.name})"
@@ -1,3 +1,120 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from gestionPedidos.testing import QueryBudgetTestCase
+from apps.restaurants.api.serializers import ProductItemSerializer, ProductItemValuesSerializer
+from apps.restaurants.models import ProductItem, Restaurant
+from apps.users.authorization import get_auth_context
+from apps.users.models import User
 
-# Create your tests here.
+
+class RestaurantEndpointQueryBudgetTests(QueryBudgetTestCase):
+    url_module = 'apps.restaurants.api.urls'
+
+    def test_list_own_restaurants(self):
+        self.assertQueryBudget('get', '/api/restaurant/', 3, 0, user=self.owner)
+
+    def test_create_restaurant(self):
+        self.assertQueryBudget('post', '/api/restaurant/', 4, 0, user=self.admin, status_code=201,
+                               data={'owner': self.owner.id, 'name': 'New Restaurant'}, format='json')
+
+    def test_list_all_restaurants(self):
+        self.assertQueryBudget('get', '/api/restaurant/all', 2, 0)
+
+    def test_update_restaurant(self):
+        self.assertQueryBudget('put', f'/api/restaurant/{self.restaurant.id}', 5, 0, user=self.owner,
+                               data={'phone': '555'}, format='json')
+
+    def test_delete_restaurant(self):
+        self.assertQueryBudget('delete', f'/api/restaurant/{self.restaurant.id}', 4, 0, user=self.admin)
+
+    def test_list_products(self):
+        self.assertQueryBudget('get', '/api/restaurant/product-items/', 2, 0)
+
+    def test_create_product(self):
+        data = {'restaurant': self.restaurant.id, 'name': 'New', 'description': 'New product', 'price': '9.50'}
+        self.assertQueryBudget('post', '/api/restaurant/product-items/', 4, 0, user=self.owner, status_code=201,
+                               data=data, format='json')
+
+    def test_update_product(self):
+        self.assertQueryBudget('put', f'/api/restaurant/product-items/{self.products[0].id}', 4, 0,
+                               user=self.owner, data={'price': '3.00'}, format='json')
+
+    def test_delete_product(self):
+        self.assertQueryBudget('delete', f'/api/restaurant/product-items/{self.products[0].id}', 4, 0,
+                               user=self.owner)
+
+    def test_product_changes(self):
+        self.assertQueryBudget('get', '/api/restaurant/product-items/changes/', 3, 0, user=self.admin)
+
+    def test_product_changes_scoped_to_owner(self):
+        ProductItem.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        response = self.assertQueryBudget('get', '/api/restaurant/product-items/changes/?limit=5000', 3, 0,
+                                          user=self.owner)
+        restaurants = {row['restaurant'] for row in response.data['results']}
+        self.assertEqual(restaurants, {self.restaurant.id, self.second_restaurant.id})
+
+    def test_bulk_update_products(self):
+        items = [{'id': product.id, 'price': '4.00'} for product in self.products[:10]]
+        self.assertQueryBudget('patch', '/api/restaurant/product-items/bulk-update', 6, 0, user=self.owner,
+                               data={'items': items}, format='json')
+
+    def test_menu(self):
+        self.assertQueryBudget('get', f'/api/restaurant/menu/{self.restaurant.id}', 2, 0)
+
+    def test_export_menu(self):
+        self.assertQueryBudget('get', f'/api/restaurant/menu/{self.restaurant.id}/export?file_format=json', 3, 0,
+                               user=self.owner)
+
+    def test_import_menu(self):
+        items = [{'id': product.id, 'name': product.name, 'price': '7.00'} for product in self.products[:10]]
+        items += [{'name': f'Imported {index}', 'price': '2.00'} for index in range(10)]
+        file = SimpleUploadedFile('menu.json', json.dumps({'items': items}).encode(), content_type='application/json')
+        self.assertQueryBudget('post', f'/api/restaurant/menu/{self.restaurant.id}/import', 7, 0, user=self.owner,
+                               data={'file': file}, format='multipart')
+
+    def test_import_menu_keeps_missing_columns(self):
+        product = self.products[0]
+        ProductItem.objects.filter(pk=product.pk).update(status=False)
+        items = [{'id': product.id, 'price': '7.00'}]
+        file = SimpleUploadedFile('menu.json', json.dumps({'items': items}).encode(), content_type='application/json')
+        self.authenticate(self.owner)
+        response = self.client.post(f'/api/restaurant/menu/{self.restaurant.id}/import', {'file': file},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.description, str(product.price), product.status),
+                         ('Product 0', 'Budget product', '7.00', False))
+
+    def test_product_list_invalidated_on_update(self):
+        url = f'/api/restaurant/product-items/?restaurant={self.restaurant.id}&name=Product 0'
+        self.assertQueryBudget('get', url, 2, 0)
+        self.assertQueryBudget('get', url, 0, 0)
+        self.assertQueryBudget('put', f'/api/restaurant/product-items/{self.products[0].id}', 4, 0,
+                               user=self.owner, data={'price': '3.00'}, format='json')
+        response = self.assertQueryBudget('get', url, 2, 0)
+        self.assertEqual(response.data['results'][0]['price'], '3.00')
+
+    def test_owner_context_invalidated_by_queryset_writes(self):
+        get_auth_context(self.owner)
+        get_auth_context(self.other_owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.filter(pk=self.restaurant.id).update(owner=self.other_owner)
+            cache.set(f'auth_context:{self.owner.id}', [self.restaurant.id])
+        self.assertIsNone(cache.get(f'auth_context:{self.owner.id}'))
+        self.assertIsNone(cache.get(f'auth_context:{self.other_owner.id}'))
+        self.assertTrue(get_auth_context(User.objects.get(pk=self.other_owner.id)).owns(self.restaurant.id))
+
+        Restaurant.objects.filter(pk=self.restaurant.id).delete()
+        self.assertIsNone(cache.get(f'auth_context:{self.other_owner.id}'))
+        self.assertFalse(get_auth_context(User.objects.get(pk=self.other_owner.id)).owns(self.restaurant.id))
+
+    def test_values_serializer_matches_model_serializer(self):
+        for price in ('2.345', '2.355', '0.005', '10'):
+            product = ProductItem(id=1, restaurant=self.restaurant, name='X', description='', price=Decimal(price))
+            row = {'id': 1, 'restaurant_id': self.restaurant.id, 'name': 'X', 'description': '',
+                   'price': Decimal(price)}
+            self.assertEqual(ProductItemValuesSerializer([row]).data, [dict(ProductItemSerializer(product).data)])
@@ -1,4 +1,5 @@
 import django_filters
+from django_filters.constants import EMPTY_VALUES
 from apps.users.models import User, Client
 
 
@@ -13,11 +14,31 @@ class UserFilter(django_filters.FilterSet):
         fields = ['role', 'username', 'first_name', 'last_name']
 
 
+class StableOrderingFilter(django_filters.OrderingFilter):
+    """
+    OrderingFilter que desempata por id en la dirección del último campo, de modo que el orden es
+    estable entre páginas y coincide con los índices (campo, id).
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, '-id' if ordering[-1].startswith('-') else 'id')
+
+
 class ClientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
     email = django_filters.CharFilter(field_name="email", lookup_expr="icontains")
     phone = django_filters.CharFilter(field_name="phone", lookup_expr="icontains")
-    
+    min_orders = django_filters.NumberFilter(field_name="order_count", lookup_expr="gte")
+    max_orders = django_filters.NumberFilter(field_name="order_count", lookup_expr="lte")
+    min_spent = django_filters.NumberFilter(field_name="total_spent", lookup_expr="gte")
+    max_spent = django_filters.NumberFilter(field_name="total_spent", lookup_expr="lte")
+    last_order_after = django_filters.IsoDateTimeFilter(field_name="last_order_at", lookup_expr="gte")
+    last_order_before = django_filters.IsoDateTimeFilter(field_name="last_order_at", lookup_expr="lt")
+    ordering = StableOrderingFilter(fields=('order_count', 'total_spent', 'last_order_at'))
+
     class Meta:
         model = Client
         fields = ['name', 'email', 'phone']
\ No newline at end of file
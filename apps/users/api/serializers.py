@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from ..models import User, Client
 from apps.restaurants.models import Restaurant
 from django.contrib.auth.password_validation import validate_password
+from gestionPedidos.serializers import ValuesSerializer
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -52,7 +54,7 @@ class PasswordChangeSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         instance.set_password(validated_data['new_password'])
-        instance.save()
+        instance.save(update_fields=['password'])
         return instance
     
 
@@ -62,19 +64,56 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'email', 'role']
 
 
+class UserValuesSerializer(ValuesSerializer):
+    """
+    Versión de solo lectura de UserSerializer para listados.
+    """
+    fields = ('id', 'username', 'first_name', 'last_name', 'email', 'role')
+
+
 class ClientSerializer(serializers.ModelSerializer):
     phone = serializers.CharField(required=False, allow_blank=True)
 
     class Meta:
         model = Client
-        fields = ['id', 'name', 'email', 'phone']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'email', 'phone', 'order_count', 'total_spent', 'last_order_at']
+        read_only_fields = ['id', 'order_count', 'total_spent', 'last_order_at']
+        extra_kwargs = {
+            'email': {'validators': [UniqueValidator(queryset=Client.objects.all(),
+                                                     message="This email is already registered.")]},
+        }
 
-    def validate_email(self, value):
-        if Client.objects.filter(email=value).exists():
-            raise serializers.ValidationError("This email is already registered.")
-        return value
+    def update(self, instance, validated_data):
+        """
+        Guarda solo las columnas enviadas, para no sobrescribir los contadores de órdenes leídos al inicio.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
     
 
+class ClientValuesSerializer(ValuesSerializer):
+    """
+    Versión de solo lectura de ClientSerializer para listados.
+    """
+    fields = ('id', 'name', 'email', 'phone', 'order_count', 'total_spent', 'last_order_at')
+    decimal_fields = {'total_spent': 2}
+    datetime_fields = ('last_order_at',)
+
+
+class ClientChangeValuesSerializer(ValuesSerializer):
+    """
+    Filas del feed de cambios de clientes, incluyendo los eliminados (status=False).
+    """
+    fields = ('id', 'name', 'email', 'phone', 'status', 'created_at', 'updated_at')
+    datetime_fields = ('created_at', 'updated_at')
+
+
 class BulkClientUploadSerializer(serializers.Serializer):
-    file = serializers.FileField()
\ No newline at end of file
+    file = serializers.FileField()
+    update_existing = serializers.BooleanField(required=False, default=False)
+
+
+class BulkClientUploadSessionSerializer(serializers.Serializer):
+    update_existing = serializers.BooleanField(required=False, default=False)
@@ -9,8 +9,13 @@ from .views import (UserRegistrationView,
                     ClientCreateAPIView,
                     ClientListAPIView,
                     ClientDetailAPIView,
+                    ClientChangeFeedAPIView,
                     BulkClientUploadAPIView,
-                    BulkClientUploadStatusAPIView)
+                    BulkClientUploadStatusAPIView,
+                    BulkClientUploadSessionAPIView,
+                    BulkClientUploadChunkAPIView,
+                    BulkClientUploadCompleteAPIView,
+                    BulkClientUploadErrorsAPIView)
 
 
 urlpatterns = [
@@ -23,6 +28,11 @@ urlpatterns = [
     path('clients/', ClientCreateAPIView.as_view(), name='create_client'),
     path('clients/list/', cache_page(60 * 5, cache='default')(ClientListAPIView.as_view()), name='list_client'),
     path('clients/<int:pk>/', ClientDetailAPIView.as_view(), name='list_client'),
+    path('clients/changes/', ClientChangeFeedAPIView.as_view(), name='client-changes'),
     path('clients/bulk-upload/', BulkClientUploadAPIView.as_view(), name='client-bulk-upload'),
     path('clients/bulk-upload/status/', BulkClientUploadStatusAPIView.as_view(), name='bulk-client-upload-status'),
+    path('clients/bulk-upload/errors/', BulkClientUploadErrorsAPIView.as_view(), name='bulk-client-upload-errors'),
+    path('clients/bulk-upload/sessions/', BulkClientUploadSessionAPIView.as_view(), name='bulk-client-upload-session'),
+    path('clients/bulk-upload/sessions/<str:upload_id>/', BulkClientUploadChunkAPIView.as_view(), name='bulk-client-upload-chunk'),
+    path('clients/bulk-upload/sessions/<str:upload_id>/complete/', BulkClientUploadCompleteAPIView.as_view(), name='bulk-client-upload-complete'),
 ]
\ No newline at end of file
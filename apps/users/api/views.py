@@ -1,6 +1,4 @@
 import os
-import uuid
-import csv
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -10,14 +8,33 @@ from drf_yasg.utils import swagger_auto_schema
 from .serializers import (UserRegistrationSerializer,
                           PasswordChangeSerializer,
                           UserSerializer,
-                          ClientSerializer)
+                          UserValuesSerializer,
+                          ClientSerializer,
+                          ClientValuesSerializer,
+                          ClientChangeValuesSerializer)
 from drf_yasg import openapi
 from django.conf import settings
+from django.http import FileResponse
 from apps.users.models import User, Client
 from apps.users.api.filters import UserFilter, ClientFilter
-from gestionPedidos.utils import CustomPagination
-from .serializers import BulkClientUploadSerializer
+from gestionPedidos.renderers import FAST_RENDERER_CLASSES
+from gestionPedidos.utils import CustomPagination, ChangeFeedPagination
+from .serializers import BulkClientUploadSerializer, BulkClientUploadSessionSerializer
 from apps.users.tasks import process_bulk_clients
+from apps.users.uploads import (CSVStreamValidator,
+                                UploadValidationError,
+                                new_upload_id,
+                                upload_path,
+                                error_report_path,
+                                publish_import_progress,
+                                get_import_progress,
+                                stream_to_disk,
+                                create_upload_session,
+                                get_upload_session,
+                                save_upload_session,
+                                delete_upload_session,
+                                lock_upload_session,
+                                unlock_upload_session)
 from celery.result import AsyncResult
 
 
@@ -100,6 +117,7 @@ class UserListAPIView(APIView):
     Se aplica paginación manual; por defecto se muestran 10 elementos, pero se puede modificar con el query param 'limit'.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     @swagger_auto_schema(
         tags=['Users'],
@@ -137,6 +155,16 @@ class UserListAPIView(APIView):
                 'limit', openapi.IN_QUERY,
                 description="Número de elementos por página (por defecto 10)",
                 type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'fields', openapi.IN_QUERY,
+                description="Campos a incluir, separados por coma (por ejemplo id,name)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'exclude', openapi.IN_QUERY,
+                description="Campos a excluir, separados por coma",
+                type=openapi.TYPE_STRING
             )
         ],
         responses={200: UserSerializer(many=True)}
@@ -149,8 +177,9 @@ class UserListAPIView(APIView):
         queryset = filterset.qs
 
         paginator = CustomPagination()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = UserSerializer(paginated_queryset, many=True)
+        fields = UserValuesSerializer.select_fields(request)
+        paginated_queryset = paginator.paginate_queryset(UserValuesSerializer.values(queryset, fields), request)
+        serializer = UserValuesSerializer(paginated_queryset, fields=fields)
         return paginator.get_paginated_response(serializer.data)
     
 
@@ -240,10 +269,11 @@ class ClientCreateAPIView(APIView):
 
 class ClientListAPIView(APIView):
     """
-    Lista todos los clientes activos, permitiendo filtrar por nombre, email y teléfono.
-    Se aplica paginación manual; por defecto se muestran 10 elementos (se puede modificar con el query param 'limit').
+    Lista todos los clientes activos, permitiendo filtrar por nombre, email, teléfono y sus contadores de
+    órdenes, y ordenar por los contadores. Se aplica paginación manual; por defecto se muestran 10 elementos (se puede modificar con el query param 'limit').
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     @swagger_auto_schema(
         tags=["Clients"],
@@ -253,6 +283,10 @@ class ClientListAPIView(APIView):
             "- name: búsqueda parcial en el nombre\n"
             "- email: búsqueda parcial en el email\n"
             "- phone: búsqueda parcial en el teléfono\n"
+            "- min_orders / max_orders: rango de órdenes activas\n"
+            "- min_spent / max_spent: rango de total gastado\n"
+            "- last_order_after / last_order_before: rango de la fecha de la última orden\n"
+            "- ordering: order_count, total_spent o last_order_at (con '-' para descendente)\n"
             "Se puede paginar usando el query param 'limit'."
         ),
         manual_parameters=[
@@ -271,10 +305,60 @@ class ClientListAPIView(APIView):
                 description="Filtrar por teléfono (contiene)",
                 type=openapi.TYPE_STRING
             ),
+            openapi.Parameter(
+                'min_orders', openapi.IN_QUERY,
+                description="Mínimo de órdenes activas",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'max_orders', openapi.IN_QUERY,
+                description="Máximo de órdenes activas",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'min_spent', openapi.IN_QUERY,
+                description="Mínimo total gastado",
+                type=openapi.TYPE_NUMBER
+            ),
+            openapi.Parameter(
+                'max_spent', openapi.IN_QUERY,
+                description="Máximo total gastado",
+                type=openapi.TYPE_NUMBER
+            ),
+            openapi.Parameter(
+                'last_order_after', openapi.IN_QUERY,
+                description="Última orden desde esta fecha (ISO 8601)",
+                type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+            ),
+            openapi.Parameter(
+                'last_order_before', openapi.IN_QUERY,
+                description="Última orden antes de esta fecha (ISO 8601)",
+                type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+            ),
+            openapi.Parameter(
+                'ordering', openapi.IN_QUERY,
+                description="order_count, total_spent o last_order_at; con '-' para descendente",
+                type=openapi.TYPE_STRING
+            ),
             openapi.Parameter(
                 'limit', openapi.IN_QUERY,
                 description="Número de elementos por página (por defecto 10)",
                 type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'count', openapi.IN_QUERY,
+                description="Modo de conteo: exact (por defecto), estimate o none",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'fields', openapi.IN_QUERY,
+                description="Campos a incluir, separados por coma (por ejemplo id,name)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'exclude', openapi.IN_QUERY,
+                description="Campos a excluir, separados por coma",
+                type=openapi.TYPE_STRING
             )
         ],
         responses={200: ClientSerializer(many=True)}
@@ -287,19 +371,68 @@ class ClientListAPIView(APIView):
         queryset = filterset.qs
         
         paginator = CustomPagination()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = ClientSerializer(paginated_queryset, many=True)
+        fields = ClientValuesSerializer.select_fields(request)
+        paginated_queryset = paginator.paginate_queryset(ClientValuesSerializer.values(queryset, fields), request)
+        serializer = ClientValuesSerializer(paginated_queryset, fields=fields)
         return paginator.get_paginated_response(serializer.data)
     
 
+class ClientChangeFeedAPIView(APIView):
+    """
+    Feed incremental de clientes modificados (incluidos los eliminados) desde un cursor (solo ADMIN).
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Feed de cambios de clientes",
+        operation_description=(
+            "Retorna los clientes creados, modificados o eliminados después del cursor, ordenados por "
+            "(updated_at, id). Solo disponible para ADMIN."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description="Cursor 'next_cursor' de la respuesta anterior; vacío para empezar desde el inicio",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description="Número máximo de filas (por defecto 500, máximo 5000)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: openapi.Response(description="Changed rows and next cursor.")}
+    )
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'ADMIN':
+            return Response({"error": "You do not have permission to access this resource"},
+                            status=status.HTTP_403_FORBIDDEN)
+        return ChangeFeedPagination().paginate(Client.objects.all(), request, ClientChangeValuesSerializer)
+
+
 class ClientDetailAPIView(APIView):
     """
-    Permite actualizar o eliminar un cliente.
+    Permite consultar, actualizar o eliminar un cliente.
+    - GET: Retorna el cliente con sus contadores de órdenes.
     - PUT: Actualiza los datos del cliente.
     - DELETE: Realiza una eliminación, cambiando su campo 'status' a False.
     """
     permission_classes = [IsAuthenticated]
 
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Detalle de cliente",
+        operation_description="Retorna un cliente activo con su número de órdenes, total gastado y fecha de la última orden.",
+        responses={200: ClientSerializer()}
+    )
+    def get(self, request, pk, *args, **kwargs):
+        client = Client.objects.filter(pk=pk, status=True).first()
+        if not client:
+            return Response({"detail": "Client not found or inactive."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ClientSerializer(client).data, status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         tags=["Clients"],
         operation_summary="Actualizar cliente",
@@ -332,7 +465,7 @@ class ClientDetailAPIView(APIView):
             return Response({"detail": "Client not found or inactive."}, status=status.HTTP_404_NOT_FOUND)
         
         client.status = False
-        client.save()
+        client.save(update_fields=['status', 'updated_at'])
         return Response({"detail": "Client deleted."}, status=status.HTTP_204_NO_CONTENT)
     
 
@@ -340,8 +473,7 @@ class ClientDetailAPIView(APIView):
 class BulkClientUploadAPIView(APIView):
     """
     Endpoint para el cargue masivo de clientes.
-    Permite subir un archivo CSV con un máximo de 20 registros (excluyendo el encabezado).
-    La tarea se procesa de forma asíncrona mediante Celery.
+    Permite subir un archivo CSV sin límite de registros; se procesa por lotes de forma asíncrona mediante Celery.
     """
     permission_classes = [IsAuthenticated]
 
@@ -351,7 +483,7 @@ class BulkClientUploadAPIView(APIView):
         operation_description=(
             "Permite subir un archivo CSV para la creación masiva de clientes. "
             "El archivo debe tener un encabezado y las columnas: name, email, phone. "
-            "Solo se permiten hasta 20 registros. Si se sobrepasa, se retorna un error."
+            "Los registros se insertan por lotes. Con 'update_existing' los emails ya registrados se actualizan."
         ),
         request_body=BulkClientUploadSerializer,
         responses={200: openapi.Response(description="Bulk upload initiated.")}
@@ -362,36 +494,188 @@ class BulkClientUploadAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         file = serializer.validated_data['file']
-        file.seek(0)
-        decoded_file = file.read().decode('utf-8').splitlines()
-        reader = csv.reader(decoded_file, delimiter=';')
-        rows = list(reader)
-        if not rows:
-            return Response({"error": "The file is empty."}, status=status.HTTP_400_BAD_REQUEST)
-        data_rows = rows[1:] if len(rows) > 1 else []
-        if len(data_rows) > 20:
-            return Response({"error": "The file cannot contain more than 20 records."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        file.seek(0)
-        temp_filename = f"bulk_clients.csv"
-        upload_dir = os.path.join(settings.BASE_DIR, "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, temp_filename)
-        
-        with open(file_path, "wb") as f:
-            f.write(file.read())
-        
-        task = process_bulk_clients.delay(file_path, request.user.id)
+        upload_id = new_upload_id()
+        file_path = upload_path(upload_id)
+        queued = False
+        try:
+            validator = stream_to_disk(file.chunks(), file_path)
+            rows = validator.finish()
+            publish_import_progress(upload_id, {"state": "PENDING", "user_id": request.user.id, "total_rows": rows})
+            task = process_bulk_clients.apply_async(
+                args=(file_path, request.user.id, serializer.validated_data['update_existing'], rows),
+                task_id=upload_id
+            )
+            queued = True
+        except UploadValidationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            if not queued and os.path.exists(file_path):
+                os.remove(file_path)
         
         return Response({
             "task_id": task.id,
+            "rows": rows,
+            "detail": "Bulk upload initiated."
+        }, status=status.HTTP_200_OK)
+
+
+class BulkClientUploadSessionAPIView(APIView):
+    """
+    Inicia una carga reanudable por partes para archivos de clientes muy grandes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Iniciar carga reanudable",
+        operation_description=(
+            "Crea una sesión de carga por partes. Luego se envían los bytes del CSV con PUT a "
+            "'clients/bulk-upload/sessions/<upload_id>/' indicando el header 'Upload-Offset', "
+            "y se finaliza con POST a 'clients/bulk-upload/sessions/<upload_id>/complete/'."
+        ),
+        request_body=BulkClientUploadSessionSerializer,
+        responses={201: openapi.Response(description="Upload session created.")}
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = BulkClientUploadSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        session = create_upload_session(request.user.id, serializer.validated_data['update_existing'])
+        return Response({
+            "upload_id": session['upload_id'],
+            "offset": 0,
+            "chunk_size": settings.BULK_UPLOAD_CHUNK_SIZE
+        }, status=status.HTTP_201_CREATED)
+
+
+class BulkClientUploadChunkAPIView(APIView):
+    """
+    - GET: Retorna el offset actual de la sesión, para reanudar una carga interrumpida.
+    - PUT: Agrega un bloque de bytes al archivo en el offset indicado por el header 'Upload-Offset'.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _get_session(self, request, upload_id):
+        session = get_upload_session(upload_id)
+        if not session or session['user_id'] != request.user.id:
+            return None
+        return session
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Consultar offset de carga reanudable",
+        responses={200: openapi.Response(description="Current upload offset.")}
+    )
+    def get(self, request, upload_id, *args, **kwargs):
+        session = self._get_session(request, upload_id)
+        if not session:
+            return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+        validator = CSVStreamValidator(session['validator'])
+        return Response({"offset": session['offset'], "rows": validator.rows}, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Enviar parte de carga reanudable",
+        operation_description=(
+            "El cuerpo de la solicitud contiene los bytes crudos del bloque. "
+            "Si 'Upload-Offset' no coincide con el offset actual se retorna 409 con el offset esperado."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'Upload-Offset', openapi.IN_HEADER,
+                description="Posición en bytes donde inicia el bloque",
+                type=openapi.TYPE_INTEGER,
+                required=True
+            )
+        ],
+        responses={200: openapi.Response(description="Chunk stored.")}
+    )
+    def put(self, request, upload_id, *args, **kwargs):
+        session = self._get_session(request, upload_id)
+        if not session:
+            return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"error": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not lock_upload_session(upload_id):
+            return Response({"error": "Another chunk is being uploaded."}, status=status.HTTP_409_CONFLICT)
+        try:
+            session = get_upload_session(upload_id)
+            if not session:
+                return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+            if offset != session['offset']:
+                return Response({"error": "Offset mismatch.", "offset": session['offset']},
+                                status=status.HTTP_409_CONFLICT)
+
+            file_path = upload_path(upload_id)
+            chunk_size = 64 * 1024
+            chunks = iter(lambda: request.stream.read(chunk_size), b'') if request.stream else []
+            validator = CSVStreamValidator(session['validator'])
+            with open(file_path, "r+b") as destination:
+                destination.truncate(offset)
+            try:
+                stream_to_disk(chunks, file_path, validator, mode="ab")
+            except UploadValidationError as e:
+                with open(file_path, "r+b") as destination:
+                    destination.truncate(offset)
+                return Response({"error": str(e), "offset": offset}, status=status.HTTP_400_BAD_REQUEST)
+
+            session['offset'] = validator.size
+            session['validator'] = validator.state()
+            save_upload_session(session)
+        finally:
+            unlock_upload_session(upload_id)
+        return Response({"offset": session['offset'], "rows": validator.rows}, status=status.HTTP_200_OK)
+
+
+class BulkClientUploadCompleteAPIView(APIView):
+    """
+    Finaliza una carga reanudable y lanza el procesamiento asíncrono del archivo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Finalizar carga reanudable",
+        responses={200: openapi.Response(description="Bulk upload initiated.")}
+    )
+    def post(self, request, upload_id, *args, **kwargs):
+        session = get_upload_session(upload_id)
+        if not session or session['user_id'] != request.user.id:
+            return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if not lock_upload_session(upload_id):
+            return Response({"error": "A chunk is being uploaded."}, status=status.HTTP_409_CONFLICT)
+        try:
+            session = get_upload_session(upload_id)
+            if not session:
+                return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                rows = CSVStreamValidator(session['validator']).finish()
+            except UploadValidationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            publish_import_progress(upload_id, {"state": "PENDING", "user_id": request.user.id, "total_rows": rows})
+            task = process_bulk_clients.apply_async(
+                args=(upload_path(upload_id), request.user.id, session['update_existing'], rows),
+                task_id=upload_id
+            )
+            delete_upload_session(upload_id)
+        finally:
+            unlock_upload_session(upload_id)
+        return Response({
+            "task_id": task.id,
+            "rows": rows,
             "detail": "Bulk upload initiated."
         }, status=status.HTTP_200_OK)
     
 
 class BulkClientUploadStatusAPIView(APIView):
     """
-    Consulta el estado de la tarea de cargue masivo de clientes, incluyendo la cantidad de registros procesados y los errores (si existen).
+    Consulta el estado de la tarea de cargue masivo de clientes: filas leídas, insertadas, omitidas y velocidad.
+    Las filas rechazadas se descargan como CSV desde 'clients/bulk-upload/errors/'.
     """
     permission_classes = [IsAuthenticated]
 
@@ -400,7 +684,8 @@ class BulkClientUploadStatusAPIView(APIView):
         operation_summary="Consultar estado del cargue masivo",
         operation_description=(
             "Consulta el estado de la tarea de cargue masivo de clientes. Se debe enviar el 'task_id' asociado al cargue masivo. "
-            "Si la tarea ya finalizó, se retornará un objeto con la cantidad de registros procesados y cualquier error encontrado."
+            "Mientras la tarea avanza se retorna el progreso (rows_read, inserted, skipped, rows_per_second); "
+            "al finalizar, 'error_report' indica si hay un CSV de filas rechazadas para descargar."
         ),
         manual_parameters=[
             openapi.Parameter(
@@ -411,16 +696,63 @@ class BulkClientUploadStatusAPIView(APIView):
                 required=True
             )
         ],
-        responses={200: openapi.Response(description="Bulk upload status and errors.")}
+        responses={200: openapi.Response(description="Bulk upload progress.")}
     )
     def get(self, request, *args, **kwargs):
         task_id = request.GET.get("task_id")
         if not task_id:
             return Response({"error": "task_id is required."}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+        progress = get_import_progress(task_id)
+        if progress:
+            if progress.get('user_id') != request.user.id and request.user.role != 'ADMIN':
+                return Response({"detail": "Bulk upload not found."}, status=status.HTTP_404_NOT_FOUND)
+            finished = progress['state'] in ('SUCCESS', 'FAILURE')
+            return Response(progress, status=status.HTTP_200_OK if finished else status.HTTP_202_ACCEPTED)
+
         task_result = AsyncResult(task_id)
         if not task_result.ready():
             return Response({"status": task_result.state}, status=status.HTTP_202_ACCEPTED)
         
         result = task_result.result 
-        return Response(result, status=status.HTTP_200_OK)    
\ No newline at end of file
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class BulkClientUploadErrorsAPIView(APIView):
+    """
+    Descarga el CSV con las filas rechazadas de un cargue masivo de clientes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Clients"],
+        operation_summary="Descargar errores del cargue masivo",
+        operation_description="Descarga un CSV (line;email;error) con las filas rechazadas del cargue masivo indicado por 'task_id'.",
+        manual_parameters=[
+            openapi.Parameter(
+                'task_id',
+                openapi.IN_QUERY,
+                description="ID de la tarea de Celery asociada al cargue masivo",
+                type=openapi.TYPE_STRING,
+                required=True
+            )
+        ],
+        responses={200: openapi.Response(description="CSV file downloaded.")}
+    )
+    def get(self, request, *args, **kwargs):
+        task_id = request.GET.get("task_id")
+        if not task_id:
+            return Response({"error": "task_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        progress = get_import_progress(task_id)
+        if not progress or (progress.get('user_id') != request.user.id and request.user.role != 'ADMIN'):
+            return Response({"detail": "Bulk upload not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        file_path = error_report_path(task_id)
+        if not progress.get('error_report') or not os.path.exists(file_path):
+            return Response({"error": "Error report not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = FileResponse(open(file_path, 'rb'), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+        return response
+
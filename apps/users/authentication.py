@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class LocalUserCache:
+    """
+    Caché LRU en memoria del proceso, con TTL corto y tamaño máximo.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def _user_cache_settings():
+    return getattr(settings, "AUTH_USER_CACHE", {})
+
+
+local_user_cache = LocalUserCache(
+    max_size=_user_cache_settings().get('MAX_SIZE', 10000),
+    ttl=_user_cache_settings().get('LOCAL_TTL', 5),
+)
+
+
+# Solo lo que usan la autenticación y AuthContext; nunca el hash de la contraseña.
+CACHED_USER_FIELDS = ('id', 'role', 'restaurant_id', 'is_active')
+
+
+def _user_cache_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+def _delete_cached_user(user_id):
+    local_user_cache.delete(str(user_id))
+    cache.delete(_user_cache_key(user_id))
+
+
+def invalidate_cached_user(user_id):
+    """
+    Borra el usuario de las cachés ahora y otra vez al hacer commit: una solicitud concurrente que lea la
+    fila antes del commit volvería a guardar la versión anterior.
+    """
+    _delete_cached_user(user_id)
+    transaction.on_commit(partial(_delete_cached_user, user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que resuelve el usuario del claim firmado del token a través de una caché local
+    (LRU con TTL corto) y de la caché de Redis, consultando la base de datos solo cuando ambas fallan.
+    Se guardan solo CACHED_USER_FIELDS en un dict; los demás campos del usuario quedan diferidos.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = local_user_cache.get(str(user_id))
+        if values is None:
+            values = cache.get(_user_cache_key(user_id))
+            if values is None:
+                values = (self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                          .values(*CACHED_USER_FIELDS).first())
+                if values is None:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                cache.set(_user_cache_key(user_id), values, _user_cache_settings().get('REDIS_TTL', 60 * 5))
+            local_user_cache.set(str(user_id), values)
+
+        # Instancia con el resto de campos diferidos: se cargan si se leen, y save() solo escribe los cargados.
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        user = self.user_model.from_db('default', field_names, [values[name] for name in field_names])
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,74 @@
+from functools import partial
+from django.core.cache import cache
+from django.db import transaction
+from apps.restaurants.models import Restaurant
+
+
+AUTH_CONTEXT_TIMEOUT = 60 * 30
+
+
+class AuthContext:
+    """
+    Contexto de autorización de un usuario: rol, restaurantes de los que es owner y restaurante asignado.
+    Se calcula una vez, se guarda en la caché y se reutiliza en todas las vistas.
+    """
+
+    def __init__(self, user_id, role, restaurant_id, owned_restaurant_ids):
+        self.user_id = user_id
+        self.role = role
+        self.restaurant_id = restaurant_id
+        self.owned_restaurant_ids = frozenset(owned_restaurant_ids)
+
+    @property
+    def is_admin(self):
+        return self.role == 'ADMIN'
+
+    def owns(self, restaurant_id):
+        return self.role == 'OWNER' and restaurant_id in self.owned_restaurant_ids
+
+    def can_manage_restaurant(self, restaurant_id):
+        """
+        ADMIN o el OWNER del restaurante.
+        """
+        return self.is_admin or self.owns(restaurant_id)
+
+    def can_access_restaurant(self, restaurant_id):
+        """
+        ADMIN, el OWNER del restaurante o una WAITRESS asignada a él.
+        """
+        if self.role == 'WAITRESS':
+            return self.restaurant_id is not None and self.restaurant_id == restaurant_id
+        return self.can_manage_restaurant(restaurant_id)
+
+
+def _auth_context_key(user_id):
+    return f"auth_context:{user_id}"
+
+
+def get_auth_context(user):
+    """
+    Retorna el contexto de autorización del usuario. El rol y el restaurante asignado vienen de la fila
+    del usuario; los restaurantes propios se leen de la caché y solo se consultan cuando no están.
+    """
+    context = getattr(user, '_auth_context', None)
+    if context is not None:
+        return context
+
+    owned = cache.get(_auth_context_key(user.pk))
+    if owned is None:
+        owned = list(Restaurant.objects.filter(owner_id=user.pk).values_list('id', flat=True))
+        cache.set(_auth_context_key(user.pk), owned, AUTH_CONTEXT_TIMEOUT)
+
+    context = AuthContext(user.pk, user.role, user.restaurant_id, owned)
+    user._auth_context = context
+    return context
+
+
+def invalidate_auth_context(*user_ids):
+    """
+    Borra los contextos ahora y otra vez al hacer commit, para no conservar los que una solicitud
+    concurrente haya calculado con las filas anteriores al commit.
+    """
+    keys = [_auth_context_key(user_id) for user_id in user_ids if user_id is not None]
+    cache.delete_many(keys)
+    transaction.on_commit(partial(cache.delete_many, keys))
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_client_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['order_count', 'id'], name='client_order_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['total_spent', 'id'], name='client_total_spent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['last_order_at', 'id'], name='client_last_order_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:21
+
+import apps.users.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_client_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.users.models.CachedUserManager()),
+            ],
+        ),
+    ]
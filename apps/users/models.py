@@ -1,8 +1,27 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from ..restaurants.models import Restaurant
 
 
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        update() no emite post_save; invalida aquí la caché de autenticación de las filas afectadas.
+        """
+        from apps.users.authentication import invalidate_cached_user
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        for user_id in user_ids:
+            invalidate_cached_user(user_id)
+        return updated
+
+    update.alters_data = True
+
+
+class CachedUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     class Role(models.TextChoices):
         ADMIN = 'ADMIN', 'Admin'
@@ -36,6 +55,8 @@ class User(AbstractUser):
                                     related_name='employees')
     status = models.BooleanField(default=True)
 
+    objects = CachedUserManager()
+
     class Meta:
         ordering = ['username']
 
@@ -45,8 +66,19 @@ class Client(models.Model):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True)
     status = models.BooleanField(default=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+            models.Index(fields=['order_count', 'id'], name='client_order_count_idx'),
+            models.Index(fields=['total_spent', 'id'], name='client_total_spent_idx'),
+            models.Index(fields=['last_order_at', 'id'], name='client_last_order_idx'),
+        ]
+
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -0,0 +1,33 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from apps.restaurants.models import Restaurant
+from apps.users.models import User
+from apps.users.authentication import invalidate_cached_user
+from apps.users.authorization import invalidate_auth_context
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_previous_owner(sender, instance, update_fields=None, **kwargs):
+    instance._previous_owner_id = instance.owner_id
+    if instance.pk and (update_fields is None or 'owner' in update_fields):
+        instance._previous_owner_id = (
+            Restaurant.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Restaurant)
+def invalidate_owner_context_on_save(sender, instance, created, **kwargs):
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if created or previous_owner_id != instance.owner_id:
+        invalidate_auth_context(instance.owner_id, previous_owner_id)
+
+
+@receiver(post_delete, sender=Restaurant)
+def invalidate_owner_context_on_delete(sender, instance, **kwargs):
+    invalidate_auth_context(instance.owner_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
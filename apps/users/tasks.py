@@ -1,35 +1,171 @@
 import csv
 import os
+import time
 from celery import shared_task
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from apps.users.models import Client
+from apps.users.uploads import error_report_path, publish_import_progress, purge_expired_uploads
 
 
-@shared_task
-def process_bulk_clients(file_path, user_id):
-    processed = 0
+def _clean_client_row(row):
+    """
+    Normaliza una fila del CSV. Retorna (datos, error); solo uno de los dos tiene valor.
+    """
+    name = (row.get('name') or '').strip()
+    email = (row.get('email') or '').strip()
+    phone = (row.get('phone') or '').strip()
+    if not name or not email:
+        return None, "Missing name or email."
+    if len(name) > 255 or len(email) > 254 or len(phone) > 20:
+        return None, "Field too long."
+    return {"name": name, "email": email, "phone": phone}, None
+
+
+def _save_client_batch(batch, update_existing):
+    """
+    Inserta (o actualiza) un lote de (línea, datos) en una sola transacción.
+    Retorna (procesados, errores) donde cada error es (línea, email, mensaje); procesados cuenta solo
+    las filas realmente insertadas o actualizadas.
+    """
     errors = []
+    unique_rows = {}
+    for line, data in batch:
+        if data['email'] in unique_rows:
+            errors.append((line, data['email'], "Email is duplicated in the file."))
+            continue
+        unique_rows[data['email']] = (line, data)
+
+    if not update_existing:
+        existing = set(
+            Client.objects.filter(email__in=list(unique_rows)).values_list('email', flat=True)
+        )
+        for email in existing:
+            errors.append((unique_rows.pop(email)[0], email, "Email already exists."))
+
+    if not unique_rows:
+        return 0, errors
+
+    now = timezone.now()
+    clients = [
+        Client(name=data['name'], email=data['email'], phone=data['phone'],
+               status=True, created_at=now, updated_at=now)
+        for _, data in unique_rows.values()
+    ]
+    if update_existing:
+        with transaction.atomic():
+            Client.objects.bulk_create(
+                clients,
+                update_conflicts=True,
+                unique_fields=['email'],
+                update_fields=['name', 'phone', 'status', 'updated_at'],
+            )
+        return len(clients), errors
+
+    while clients:
+        try:
+            with transaction.atomic():
+                Client.objects.bulk_create(clients)
+            break
+        except IntegrityError:
+            # Otro proceso insertó alguno de los emails después de la verificación: se reportan y se reintenta.
+            emails = [client.email for client in clients]
+            existing = set(Client.objects.filter(email__in=emails).values_list('email', flat=True))
+            if not existing:
+                raise
+            for email in existing:
+                errors.append((unique_rows[email][0], email, "Email already exists."))
+            clients = [client for client in clients if client.email not in existing]
+    return len(clients), errors
+
+
+@shared_task(bind=True, acks_late=True)
+def process_bulk_clients(self, file_path, user_id, update_existing=False, total_rows=None):
+    """
+    Procesa un CSV de clientes en streaming, insertando por lotes con bulk_create.
+    Con update_existing=True los emails existentes se actualizan en lugar de rechazarse.
+    Publica el progreso en la caché y escribe las filas rechazadas en un CSV de errores.
+    El CSV de entrada solo se elimina si la importación termina; si falla se conserva para reintentarla
+    y la excepción se propaga para que Celery registre la tarea como fallida.
+    """
+    task_id = self.request.id
+    batch_size = getattr(settings, "BULK_CLIENTS_BATCH_SIZE", 5000)
+    interval = getattr(settings, "BULK_CLIENTS_PROGRESS_INTERVAL", 1)
+    started = time.monotonic()
+    last_published = 0
+    progress = {
+        "state": "PROGRESS",
+        "user_id": user_id,
+        "total_rows": total_rows,
+        "rows_read": 0,
+        "inserted": 0,
+        "skipped": 0,
+        "rows_per_second": 0,
+        "error_report": False,
+    }
+
+    def publish(state="PROGRESS"):
+        elapsed = time.monotonic() - started
+        progress["state"] = state
+        progress["elapsed"] = round(elapsed, 2)
+        progress["rows_per_second"] = int(progress["rows_read"] / elapsed) if elapsed else 0
+        publish_import_progress(task_id, progress)
+
+    errors_path = error_report_path(task_id)
     try:
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
+        with open(file_path, newline='', encoding='utf-8-sig') as csvfile, \
+                open(errors_path, "w", newline='', encoding='utf-8') as errors_file:
             reader = csv.DictReader(csvfile, delimiter=';')
-            rows = list(reader)
-            if len(rows) > 20:
-                return {"error": "The file contains more than 20 records."}
-            for row in rows:
-                name = row.get('name')
-                email = row.get('email')
-                phone = row.get('phone', '')
-                if not name or not email:
-                    errors.append(f"Missing name or email in row: {row}")
-                    continue
-
-                if Client.objects.filter(email=email).exists():
-                    errors.append(f"Email {email} already exists.")
-                    continue
-                Client.objects.create(name=name, email=email, phone=phone, status=True)
-                processed += 1
+            errors_writer = csv.writer(errors_file, delimiter=';')
+            errors_writer.writerow(["line", "email", "error"])
+
+            def write_errors(errors):
+                errors_writer.writerows(errors)
+                progress["skipped"] += len(errors)
+                progress["error_report"] = progress["error_report"] or bool(errors)
+
+            batch = []
+            for row in reader:
+                progress["rows_read"] += 1
+                data, error = _clean_client_row(row)
+                if error:
+                    write_errors([(reader.line_num, (row.get('email') or '').strip(), error)])
+                else:
+                    batch.append((reader.line_num, data))
+                if len(batch) >= batch_size:
+                    saved, batch_errors = _save_client_batch(batch, update_existing)
+                    progress["inserted"] += saved
+                    write_errors(batch_errors)
+                    batch = []
+                now = time.monotonic()
+                if now - last_published >= interval:
+                    publish()
+                    last_published = now
+            if batch:
+                saved, batch_errors = _save_client_batch(batch, update_existing)
+                progress["inserted"] += saved
+                write_errors(batch_errors)
     except Exception as e:
-        return {"error": str(e)}
+        progress["error"] = str(e)
+        publish("FAILURE")
+        raise
     finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    return {"processed": processed, "errors": errors}
\ No newline at end of file
+        if not progress["error_report"] and os.path.exists(errors_path):
+            os.remove(errors_path)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    publish("SUCCESS")
+    return {
+        "processed": progress["inserted"],
+        "skipped": progress["skipped"],
+        "error_report": progress["error_report"],
+    }
+
+
+@shared_task
+def purge_bulk_uploads():
+    """
+    Elimina los CSV de cargas masivas abandonadas y los reportes de errores vencidos.
+    """
+    return {"deleted": purge_expired_uploads()}
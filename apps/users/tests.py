@@ -1,3 +1,246 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from gestionPedidos.testing import QueryBudgetTestCase
+from apps.users.authentication import local_user_cache
+from apps.users.api.serializers import ClientSerializer
+from apps.users.models import Client, User
+from apps.users.tasks import _save_client_batch, process_bulk_clients
+from apps.users.uploads import (create_upload_session,
+                                delete_upload_session,
+                                get_upload_session,
+                                lock_upload_session,
+                                purge_expired_uploads,
+                                error_report_path,
+                                get_import_progress,
+                                publish_import_progress,
+                                stream_to_disk,
+                                upload_path,
+                                save_upload_session,
+                                CSVStreamValidator)
 
-# Create your tests here.
+UPLOADS_DIR = os.path.join(tempfile.gettempdir(), 'query_budget_uploads')
+CSV_CONTENT = b"name;email;phone\n" + b"".join(
+    f"Bulk {index};bulk_{index}@example.com;123\n".encode() for index in range(50)
+)
+
+
+@override_settings(BULK_UPLOADS_DIR=UPLOADS_DIR)
+class UserEndpointQueryBudgetTests(QueryBudgetTestCase):
+    url_module = 'apps.users.api.urls'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(UPLOADS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def _uploaded_session(self):
+        session = create_upload_session(self.admin.id)
+        validator = stream_to_disk([CSV_CONTENT], upload_path(session['upload_id']), CSVStreamValidator())
+        session['offset'] = validator.size
+        session['validator'] = validator.state()
+        save_upload_session(session)
+        return session
+
+    def test_obtain_token(self):
+        self.assertQueryBudget('post', '/api/users/token/', 1, 0,
+                               data={'username': 'budget_waitress', 'password': 'Budget-pass-123'}, format='json')
+
+    def test_refresh_token(self):
+        self.assertQueryBudget('post', '/api/users/token/refresh/', 1, 0,
+                               data={'refresh': str(RefreshToken.for_user(self.waitress))}, format='json')
+
+    def test_register_user(self):
+        data = {'username': 'new_waitress', 'password': 'Budget-pass-456', 'confirm_password': 'Budget-pass-456',
+                'email': 'new@example.com', 'role': 'WAITRESS', 'restaurant': self.restaurant.id}
+        self.assertQueryBudget('post', '/api/users/register/', 5, 0, user=self.admin, status_code=201,
+                               data=data, format='json')
+
+    def test_change_password(self):
+        self.assertQueryBudget('post', '/api/users/change-password/', 3, 0, user=self.waitress,
+                               data={'current_password': 'Budget-pass-123', 'new_password': 'Budget-pass-456'},
+                               format='json')
+
+    def test_list_users(self):
+        self.assertQueryBudget('get', '/api/users/list/', 3, 0, user=self.admin)
+
+    def test_update_user(self):
+        self.assertQueryBudget('put', f'/api/users/{self.waitress.id}', 3, 0, user=self.admin,
+                               data={'first_name': 'Ana'}, format='json')
+
+    def test_delete_user(self):
+        self.assertQueryBudget('delete', f'/api/users/{self.waitress.id}', 3, 0, user=self.admin, status_code=204)
+
+    def test_create_client(self):
+        self.assertQueryBudget('post', '/api/users/clients/', 3, 0, user=self.waitress, status_code=201,
+                               data={'name': 'New', 'email': 'new_client@example.com', 'phone': '1'}, format='json')
+
+    def test_list_clients(self):
+        self.assertQueryBudget('get', '/api/users/clients/list/', 4, 0, user=self.waitress)
+
+    def test_list_clients_count_modes(self):
+        exact = self.assertQueryBudget('get', '/api/users/clients/list/', 4, 0, user=self.waitress)
+        self.assertEqual(exact.data['count'], Client.objects.filter(status=True).count())
+        estimate = self.assertQueryBudget('get', '/api/users/clients/list/?count=estimate', 4, 0, user=self.waitress)
+        self.assertEqual(estimate.data['count'], exact.data['count'])
+        self.assertNotIn('count_estimated', estimate.data)
+
+    def test_list_clients_by_counters(self):
+        self.assertQueryBudget('get', '/api/users/clients/list/?min_orders=0&ordering=-total_spent', 4, 0,
+                               user=self.waitress)
+
+    def test_client_detail(self):
+        self.assertQueryBudget('get', f'/api/users/clients/{self.clients[0].id}/', 2, 0, user=self.waitress)
+
+    def test_update_client(self):
+        self.assertQueryBudget('put', f'/api/users/clients/{self.clients[0].id}/', 3, 0, user=self.waitress,
+                               data={'phone': '999'}, format='json')
+
+    def test_delete_client(self):
+        self.assertQueryBudget('delete', f'/api/users/clients/{self.clients[0].id}/', 3, 0, user=self.waitress,
+                               status_code=204)
+
+    def test_client_changes(self):
+        self.assertQueryBudget('get', '/api/users/clients/changes/', 2, 0, user=self.admin)
+
+    def test_client_changes_requires_admin(self):
+        self.assertQueryBudget('get', '/api/users/clients/changes/', 1, 0, user=self.waitress, status_code=403)
+
+    def test_bulk_upload(self):
+        file = SimpleUploadedFile('clients.csv', CSV_CONTENT, content_type='text/csv')
+        with mock.patch('apps.users.api.views.process_bulk_clients.apply_async') as apply_async:
+            apply_async.return_value.id = 'budget-upload'
+            self.assertQueryBudget('post', '/api/users/clients/bulk-upload/', 1, 0, user=self.admin,
+                                   data={'file': file}, format='multipart')
+
+    def test_bulk_upload_status(self):
+        publish_import_progress('budget-upload', {'state': 'SUCCESS', 'user_id': self.admin.id})
+        self.assertQueryBudget('get', '/api/users/clients/bulk-upload/status/?task_id=budget-upload', 1, 0,
+                               user=self.admin)
+
+    def test_bulk_upload_errors(self):
+        publish_import_progress('budget-upload', {'state': 'SUCCESS', 'user_id': self.admin.id, 'error_report': True})
+        with open(error_report_path('budget-upload'), 'w') as report:
+            report.write("line;email;error\n")
+        self.assertQueryBudget('get', '/api/users/clients/bulk-upload/errors/?task_id=budget-upload', 1, 0,
+                               user=self.admin)
+
+    def test_create_upload_session(self):
+        self.assertQueryBudget('post', '/api/users/clients/bulk-upload/sessions/', 1, 0, user=self.admin,
+                               status_code=201, data={}, format='json')
+
+    def test_upload_session_offset(self):
+        session = self._uploaded_session()
+        self.assertQueryBudget('get', f"/api/users/clients/bulk-upload/sessions/{session['upload_id']}/", 1, 0,
+                               user=self.admin)
+
+    def test_upload_chunk(self):
+        session = create_upload_session(self.admin.id)
+        self.assertQueryBudget('put', f"/api/users/clients/bulk-upload/sessions/{session['upload_id']}/", 1, 0,
+                               user=self.admin, data=CSV_CONTENT, content_type='text/csv', HTTP_UPLOAD_OFFSET='0')
+
+    def test_complete_upload(self):
+        session = self._uploaded_session()
+        with mock.patch('apps.users.api.views.process_bulk_clients.apply_async') as apply_async:
+            apply_async.return_value.id = session['upload_id']
+            self.assertQueryBudget('post', f"/api/users/clients/bulk-upload/sessions/{session['upload_id']}/complete/",
+                                   1, 0, user=self.admin)
+
+    def test_complete_upload_waits_for_chunk(self):
+        session = self._uploaded_session()
+        lock_upload_session(session['upload_id'])
+        self.assertQueryBudget('post', f"/api/users/clients/bulk-upload/sessions/{session['upload_id']}/complete/",
+                               1, 0, user=self.admin, status_code=409)
+        self.assertIsNotNone(get_upload_session(session['upload_id']))
+
+    def test_bulk_upload_removes_file_when_queueing_fails(self):
+        file = SimpleUploadedFile('clients.csv', CSV_CONTENT, content_type='text/csv')
+        self.authenticate(self.admin)
+        with mock.patch('apps.users.api.views.process_bulk_clients.apply_async', side_effect=ConnectionError), \
+                mock.patch('apps.users.api.views.new_upload_id', return_value='failed-upload'):
+            with self.assertRaises(ConnectionError):
+                self.client.post('/api/users/clients/bulk-upload/', {'file': file}, format='multipart')
+        self.assertFalse(os.path.exists(upload_path('failed-upload')))
+
+    def test_purge_expired_uploads(self):
+        active = self._uploaded_session()
+        abandoned = create_upload_session(self.admin.id)
+        delete_upload_session(abandoned['upload_id'])
+        publish_import_progress('kept-report', {'state': 'SUCCESS', 'user_id': self.admin.id, 'error_report': True})
+        paths = [upload_path(active['upload_id']), upload_path(abandoned['upload_id']),
+                 error_report_path('kept-report'), error_report_path('expired-report')]
+        expired = time.time() - settings.BULK_UPLOAD_SESSION_TTL - 1
+        for path in paths:
+            open(path, 'a').close()
+            os.utime(path, (expired, expired))
+
+        self.assertEqual(purge_expired_uploads(), 2)
+        self.assertEqual([os.path.exists(path) for path in paths], [True, False, True, False])
+
+    @override_settings(REQUEST_INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'LOG': False})
+    def test_server_timing_includes_serialization(self):
+        response = self.assertQueryBudget('get', '/api/users/list/', 3, 0, user=self.waitress)
+        timings = dict(part.split(';')[:2] for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'cache', 'serialize', 'render', 'total'})
+
+    def test_cached_user_fields(self):
+        self.assertQueryBudget('get', '/api/users/list/', 3, 0, user=self.waitress)
+        cached = cache.get(f'auth_user:{self.waitress.id}')
+        self.assertEqual(set(cached), {'id', 'role', 'restaurant_id', 'is_active'})
+
+        User.objects.filter(pk=self.waitress.id).update(role='OWNER')
+        self.assertIsNone(cache.get(f'auth_user:{self.waitress.id}'))
+        self.assertIsNone(local_user_cache.get(str(self.waitress.id)))
+
+    def test_cached_user_invalidated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.waitress.id).update(role='OWNER')
+            # Una solicitud concurrente lee la fila anterior al commit y la vuelve a guardar.
+            cache.set(f'auth_user:{self.waitress.id}', {'id': self.waitress.id, 'role': 'WAITRESS'})
+            local_user_cache.set(str(self.waitress.id), {'id': self.waitress.id, 'role': 'WAITRESS'})
+        self.assertIsNone(cache.get(f'auth_user:{self.waitress.id}'))
+        self.assertIsNone(local_user_cache.get(str(self.waitress.id)))
+
+    def test_bulk_clients_report_rows_lost_to_a_race(self):
+        filter_clients = Client.objects.filter
+        calls = []
+
+        def stale_first_check(*args, **kwargs):
+            calls.append(kwargs)
+            return Client.objects.none() if len(calls) == 1 else filter_clients(*args, **kwargs)
+
+        batch = [(2, {'name': 'Raced', 'email': self.clients[0].email, 'phone': ''}),
+                 (3, {'name': 'Fresh', 'email': 'fresh_client@example.com', 'phone': ''})]
+        with mock.patch.object(Client.objects, 'filter', side_effect=stale_first_check):
+            saved, errors = _save_client_batch(batch, update_existing=False)
+        self.assertEqual(saved, 1)
+        self.assertEqual(errors, [(2, self.clients[0].email, "Email already exists.")])
+        self.assertTrue(Client.objects.filter(email='fresh_client@example.com').exists())
+
+    def test_bulk_clients_failure_fails_the_task(self):
+        file_path = upload_path('failing-import')
+        with open(file_path, 'wb') as csvfile:
+            csvfile.write(CSV_CONTENT)
+        with mock.patch('apps.users.tasks._save_client_batch', side_effect=RuntimeError("database down")):
+            result = process_bulk_clients.apply(args=(file_path, self.admin.id), task_id='failing-import')
+        self.assertTrue(result.failed())
+        self.assertIsInstance(result.result, RuntimeError)
+        self.assertEqual(get_import_progress('failing-import')['state'], 'FAILURE')
+        self.assertTrue(os.path.exists(file_path))
+
+    def test_client_update_keeps_counters(self):
+        client = Client.objects.get(pk=self.clients[0].id)
+        order_count = client.order_count
+        Client.objects.filter(pk=client.pk).update(order_count=order_count + 1)
+        serializer = ClientSerializer(client, data={'phone': '555'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        client.refresh_from_db()
+        self.assertEqual((client.phone, client.order_count), ('555', order_count + 1))
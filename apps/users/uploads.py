@@ -0,0 +1,199 @@
+import codecs
+import csv
+import os
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+
+REQUIRED_COLUMNS = ('name', 'email')
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class UploadValidationError(ValueError):
+    pass
+
+
+def upload_dir():
+    path = getattr(settings, "BULK_UPLOADS_DIR", os.path.join(settings.BASE_DIR, "uploads"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def new_upload_id():
+    return uuid.uuid4().hex
+
+
+UPLOAD_PREFIX = "bulk_clients_"
+ERROR_REPORT_SUFFIX = "_errors.csv"
+
+
+def upload_path(upload_id):
+    return os.path.join(upload_dir(), f"{UPLOAD_PREFIX}{upload_id}.csv")
+
+
+def error_report_path(task_id):
+    return os.path.join(upload_dir(), f"{UPLOAD_PREFIX}{task_id}{ERROR_REPORT_SUFFIX}")
+
+
+class CSVStreamValidator:
+    """
+    Valida la codificación y el encabezado del CSV y cuenta las filas a medida que llegan los bytes,
+    sin mantener el archivo en memoria. Su estado se puede serializar para cargas reanudables.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.newlines = state.get('newlines', 0)
+        self.size = state.get('size', 0)
+        self.header_ok = state.get('header_ok', False)
+        self.ends_with_newline = state.get('ends_with_newline', True)
+        self._head = bytes.fromhex(state.get('head', ''))
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._decoder.setstate((bytes.fromhex(state.get('pending', '')), 0))
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        try:
+            self._decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise UploadValidationError("The file must be UTF-8 encoded.")
+        if not self.header_ok:
+            self._head += chunk
+            if b'\n' in self._head:
+                self._check_header(self._head.split(b'\n', 1)[0])
+                self._head = b''
+            elif len(self._head) > MAX_HEADER_BYTES:
+                raise UploadValidationError("The header line is too long.")
+        self.newlines += chunk.count(b'\n')
+        self.size += len(chunk)
+        self.ends_with_newline = chunk.endswith(b'\n')
+
+    def finish(self):
+        try:
+            self._decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise UploadValidationError("The file must be UTF-8 encoded.")
+        if self.size == 0:
+            raise UploadValidationError("The file is empty.")
+        if not self.header_ok:
+            self._check_header(self._head)
+        return self.rows
+
+    @property
+    def rows(self):
+        lines = self.newlines + (0 if self.ends_with_newline else 1)
+        return max(lines - 1, 0)
+
+    def state(self):
+        return {
+            'newlines': self.newlines,
+            'size': self.size,
+            'header_ok': self.header_ok,
+            'ends_with_newline': self.ends_with_newline,
+            'head': self._head.hex(),
+            'pending': self._decoder.getstate()[0].hex(),
+        }
+
+    def _check_header(self, line):
+        header = next(csv.reader([line.decode('utf-8-sig').strip()], delimiter=';'), [])
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise UploadValidationError(f"Missing required columns: {', '.join(missing)}.")
+        self.header_ok = True
+
+
+def stream_to_disk(chunks, file_path, validator=None, mode="wb"):
+    """
+    Escribe los chunks en disco validándolos al vuelo. Retorna el validador.
+    """
+    validator = validator or CSVStreamValidator()
+    with open(file_path, mode) as destination:
+        for chunk in chunks:
+            validator.feed(chunk)
+            destination.write(chunk)
+    return validator
+
+
+def _session_key(upload_id):
+    return f"bulk_upload:{upload_id}"
+
+
+def create_upload_session(user_id, update_existing=False):
+    upload_id = new_upload_id()
+    open(upload_path(upload_id), "wb").close()
+    session = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'update_existing': update_existing,
+        'offset': 0,
+        'validator': CSVStreamValidator().state(),
+    }
+    save_upload_session(session)
+    return session
+
+
+def get_upload_session(upload_id):
+    return cache.get(_session_key(upload_id))
+
+
+def save_upload_session(session):
+    ttl = getattr(settings, "BULK_UPLOAD_SESSION_TTL", 60 * 60 * 24)
+    cache.set(_session_key(session['upload_id']), session, ttl)
+
+
+def delete_upload_session(upload_id):
+    cache.delete(_session_key(upload_id))
+
+
+def lock_upload_session(upload_id):
+    return cache.add(f"{_session_key(upload_id)}:lock", 1, 60 * 5)
+
+
+def unlock_upload_session(upload_id):
+    cache.delete(f"{_session_key(upload_id)}:lock")
+
+
+def purge_expired_uploads():
+    """
+    Elimina los archivos que no se modifican hace más de BULK_UPLOAD_SESSION_TTL:
+    - CSV de carga sin sesión activa: sesiones reanudables abandonadas e importaciones que no llegaron a procesarse.
+    - Reportes de errores cuyo progreso ya expiró y que por lo tanto ya no se pueden descargar.
+    Retorna la cantidad de archivos eliminados.
+    """
+    ttl = getattr(settings, "BULK_UPLOAD_SESSION_TTL", 60 * 60 * 24)
+    cutoff = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(upload_dir()):
+        name = entry.name
+        if not name.startswith(UPLOAD_PREFIX) or not name.endswith('.csv'):
+            continue
+        if name.endswith(ERROR_REPORT_SUFFIX):
+            is_active = get_import_progress
+            key = name[len(UPLOAD_PREFIX):-len(ERROR_REPORT_SUFFIX)]
+        else:
+            is_active = get_upload_session
+            key = name[len(UPLOAD_PREFIX):-len('.csv')]
+        try:
+            if entry.stat().st_mtime >= cutoff or is_active(key):
+                continue
+            os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+
+def _progress_key(task_id):
+    return f"bulk_clients:progress:{task_id}"
+
+
+def publish_import_progress(task_id, progress):
+    ttl = getattr(settings, "BULK_UPLOAD_SESSION_TTL", 60 * 60 * 24)
+    cache.set(_progress_key(task_id), progress, ttl)
+
+
+def get_import_progress(task_id):
+    return cache.get(_progress_key(task_id))
@@ -0,0 +1,10 @@
+#!/bin/sh
+set -e
+
+# Las métricas de la ejecución anterior del contenedor son de procesos que ya no existen.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
@@ -8,3 +8,5 @@ app = Celery('gestionPedidos')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
+
+import gestionPedidos.metrics  # noqa: E402,F401  conecta las señales de Celery
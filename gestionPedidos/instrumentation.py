@@ -0,0 +1,233 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from gestionPedidos.metrics import record_cache_read
+
+try:
+    from django_redis.cache import RedisCache
+except ImportError:
+    RedisCache = None
+
+
+logger = logging.getLogger('gestionPedidos.requests')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """
+    Acumula los tiempos de una solicitud muestreada. Los tiempos se guardan en milisegundos.
+    """
+    __slots__ = ('started', 'db_queries', 'db_ms', 'cache_hits', 'cache_misses', 'cache_calls', 'cache_ms',
+                 'serialize_ms', 'serializing', 'render_ms')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_calls = 0
+        self.cache_ms = 0.0
+        self.serialize_ms = 0.0
+        self.serializing = False
+        self.render_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_ms += (time.perf_counter() - started) * 1000
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        return ", ".join([
+            f'db;dur={self.db_ms:.1f};desc="{self.db_queries} queries"',
+            f'cache;dur={self.cache_ms:.1f};desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'serialize;dur={self.serialize_ms:.1f}',
+            f'render;dur={self.render_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def _timed_data(data):
+    fget = data.fget
+
+    def timed_data(serializer):
+        metrics = _current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return fget(serializer)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return fget(serializer)
+        finally:
+            metrics.serializing = False
+            metrics.serialize_ms += (time.perf_counter() - started) * 1000
+    timed_data.instrumented = True
+    return property(timed_data)
+
+
+def instrument_serializers():
+    """
+    Mide el acceso a .data de los serializadores de DRF y de ValuesSerializer (el momento en que se
+    serializa) en las solicitudes muestreadas. Los serializadores anidados se cuentan una sola vez y el
+    tiempo incluye las consultas que la serialización dispare. Se instala una sola vez por proceso.
+    """
+    from rest_framework.serializers import BaseSerializer, ListSerializer, Serializer
+    from gestionPedidos.serializers import ValuesSerializer
+
+    for serializer_class in (BaseSerializer, Serializer, ListSerializer, ValuesSerializer):
+        data = vars(serializer_class)['data']
+        if not getattr(data.fget, 'instrumented', False):
+            serializer_class.data = _timed_data(data)
+
+
+class InstrumentedCacheMixin:
+    """
+    Registra aciertos y fallos de la caché en las métricas de Prometheus y, en la solicitud muestreada actual,
+    también el tiempo de cada operación.
+    """
+
+    def get(self, key, default=None, version=None):
+        metrics = _current_metrics.get()
+        started = time.perf_counter()
+        value = super().get(key, _MISSING, version=version)
+        hit = value is not _MISSING
+        record_cache_read(int(hit), int(not hit))
+        if metrics is not None:
+            metrics.cache_ms += (time.perf_counter() - started) * 1000
+            metrics.cache_hits += hit
+            metrics.cache_misses += not hit
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        metrics = _current_metrics.get()
+        keys = list(keys)
+        started = time.perf_counter()
+        values = super().get_many(keys, version=version)
+        record_cache_read(len(values), len(keys) - len(values))
+        if metrics is not None:
+            metrics.cache_ms += (time.perf_counter() - started) * 1000
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    def _timed(self, method, *args, **kwargs):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.cache_calls += 1
+            metrics.cache_ms += (time.perf_counter() - started) * 1000
+
+    def set(self, *args, **kwargs):
+        return self._timed(super().set, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._timed(super().add, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._timed(super().set_many, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed(super().delete, *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._timed(super().incr, *args, **kwargs)
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+if RedisCache is not None:
+    class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+        pass
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Mide una fracción de las solicitudes (REQUEST_INSTRUMENTATION['SAMPLE_RATE']): consultas SQL y su tiempo,
+    aciertos/fallos y tiempo de caché (con un backend Instrumented*Cache), tiempo de serialización
+    (instrument_serializers), tiempo de render de la respuesta y tiempo total. Los agrega como header Server-Timing
+    y los escribe como log estructurado en 'gestionPedidos.requests'. Las solicitudes no muestreadas solo
+    pagan una llamada a random().
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'REQUEST_INSTRUMENTATION', {})
+        self.sample_rate = config.get('SAMPLE_RATE', 0.0)
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.log = config.get('LOG', True)
+        if self.sample_rate:
+            instrument_serializers()
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+
+        total_ms = metrics.total_ms
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(total_ms)
+        if self.log:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'db_queries': metrics.db_queries,
+                'db_ms': round(metrics.db_ms, 2),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'cache_calls': metrics.cache_calls,
+                'cache_ms': round(metrics.cache_ms, 2),
+                'serialize_ms': round(metrics.serialize_ms, 2),
+                'render_ms': round(metrics.render_ms, 2),
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            render = response.render
+
+            def timed_render():
+                del response.render
+                started = time.perf_counter()
+                try:
+                    return render()
+                finally:
+                    metrics.render_ms += (time.perf_counter() - started) * 1000
+            response.render = timed_render
+        return response
@@ -0,0 +1,163 @@
+import csv
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from celery.contrib.testing.worker import start_worker
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.orders.tasks import generate_sales_report, relay_order_events
+from apps.users.models import Client
+from apps.users.tasks import process_bulk_clients
+from apps.users.uploads import error_report_path, upload_dir
+from gestionPedidos.celery import app
+from gestionPedidos.utils import percentile
+
+
+BENCHMARK_EMAIL_DOMAIN = 'queue-benchmark.invalid'
+
+# (tarea, intervalo entre llegadas en ms, llegadas en ráfaga al inicio)
+WORKLOAD = (
+    (relay_order_events, 20, 0),
+    (generate_sales_report, 500, 0),
+    (process_bulk_clients, 0, 8),
+)
+
+
+def _format_ms(value):
+    return f"{'-':>10}" if value is None else f"{value:>10.1f}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Encola una carga mixta de tareas reales (relay en tiempo real, reportes e importaciones) con apply_async "
+        "y las rutas de CELERY_TASK_ROUTES sobre un broker en memoria, y compara la espera en cola de cada tarea "
+        "con un solo worker que consume todas las colas frente a un worker por perfil de CELERY_WORKER_PROFILES. "
+        "Las tareas corren contra la base de datos configurada: usar una base de desarrollo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10, help="Segundos durante los que llegan tareas.")
+        parser.add_argument('--import-rows', type=int, default=5000, help="Filas de cada CSV de importación.")
+        parser.add_argument('--timeout', type=float, default=300,
+                            help="Segundos máximos de espera para que terminen las tareas de un escenario.")
+
+    def handle(self, *args, **options):
+        profiles = getattr(settings, 'CELERY_WORKER_PROFILES', {})
+        if not profiles:
+            raise CommandError("CELERY_WORKER_PROFILES is not configured.")
+        consumed = {queue_name for profile in profiles.values() for queue_name in profile['queues']}
+        for task, _, _ in WORKLOAD:
+            queue_name = app.amqp.router.route({}, task.name)['queue'].name
+            if queue_name not in consumed:
+                raise CommandError(f"No worker profile consumes queue '{queue_name}' ({task.name}).")
+
+        # La app lee la configuración con el namespace CELERY: las claves con prefijo tienen prioridad.
+        app.conf.update(CELERY_BROKER_URL='memory://', CELERY_RESULT_BACKEND='cache+memory://',
+                        CELERY_TASK_ALWAYS_EAGER=False)
+        arrivals = self._arrivals(options['duration'])
+        shared = {
+            'queues': sorted(consumed),
+            'concurrency': sum(profile['concurrency'] for profile in profiles.values()),
+            'prefetch_multiplier': 1,
+        }
+        scenarios = (
+            (f"one worker ({shared['concurrency']} threads)", {'shared': shared}),
+            ("worker per profile", profiles),
+        )
+        self.stdout.write(f"{'scenario':<28}{'task':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for label, pools in scenarios:
+            waits = self._run(pools, arrivals, options)
+            for task, _, _ in WORKLOAD:
+                values = waits[task.name]
+                columns = ''.join(_format_ms(percentile(values, pct)) for pct in (50, 95, 99))
+                self.stdout.write(f"{label:<28}{task.name.rsplit('.', 1)[-1]:<24}{len(values):>6}{columns}")
+
+    def _arrivals(self, duration):
+        arrivals = []
+        for task, interval_ms, burst in WORKLOAD:
+            arrivals.extend((0.0, task) for _ in range(burst))
+            if interval_ms:
+                offset = interval_ms / 1000
+                while offset < duration:
+                    arrivals.append((offset, task))
+                    offset += interval_ms / 1000
+        return sorted(arrivals, key=lambda arrival: arrival[0])
+
+    def _signature(self, task, import_rows, csv_paths):
+        if task is generate_sales_report:
+            today = timezone.localdate()
+            return task.s(today.month, today.year, None)
+        if task is process_bulk_clients:
+            file_path = os.path.join(upload_dir(), f"queue-benchmark-{uuid.uuid4().hex}.csv")
+            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile, delimiter=';')
+                writer.writerow(['name', 'email', 'phone'])
+                prefix = os.path.basename(file_path)[:-4]
+                writer.writerows(
+                    (f"Benchmark {index}", f"{prefix}-{index}@{BENCHMARK_EMAIL_DOMAIN}", '')
+                    for index in range(import_rows)
+                )
+            csv_paths.append(file_path)
+            return task.s(file_path, None)
+        return task.s()
+
+    def _run(self, pools, arrivals, options):
+        """
+        Levanta un worker embebido por pool (pool de hilos, con las colas y el prefetch del perfil), publica las
+        llegadas con apply_async y retorna la espera en cola (ms) por tarea, medida desde el header published_at.
+        """
+        names = {task.name for task, _, _ in WORKLOAD}
+        waits = {name: [] for name in names}
+        finished = threading.Condition()
+        done = []
+
+        def on_prerun(task=None, **kwargs):
+            published_at = getattr(task.request, 'published_at', None)
+            if task.name in names and published_at:
+                with finished:
+                    waits[task.name].append(max(time.time() - published_at, 0) * 1000)
+
+        def on_postrun(task=None, task_id=None, **kwargs):
+            if task.name in names:
+                with finished:
+                    done.append(task_id)
+                    finished.notify_all()
+
+        task_prerun.connect(on_prerun, weak=False)
+        task_postrun.connect(on_postrun, weak=False)
+        csv_paths = []
+        try:
+            signatures = [
+                (offset, self._signature(task, options['import_rows'], csv_paths)) for offset, task in arrivals
+            ]
+            with ExitStack() as workers:
+                for name, profile in pools.items():
+                    workers.enter_context(start_worker(
+                        app, pool='threads', concurrency=profile['concurrency'],
+                        queues=profile['queues'], prefetch_multiplier=profile.get('prefetch_multiplier', 1),
+                        perform_ping_check=False, shutdown_timeout=options['timeout'],
+                    ))
+                started = time.perf_counter()
+                for offset, signature in signatures:
+                    delay = started + offset - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    signature.apply_async()
+                with finished:
+                    if not finished.wait_for(lambda: len(done) >= len(signatures), options['timeout']):
+                        raise CommandError(f"Only {len(done)} of {len(signatures)} tasks finished in time.")
+        finally:
+            task_prerun.disconnect(on_prerun)
+            task_postrun.disconnect(on_postrun)
+            for file_path in csv_paths:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            Client.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').delete()
+            for task_id in done:
+                if os.path.exists(error_report_path(task_id)):
+                    os.remove(error_report_path(task_id))
+        return waits
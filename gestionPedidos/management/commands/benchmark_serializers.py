@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from gestionPedidos.renderers import FastJSONRenderer
+from apps.orders.models import Order
+from apps.orders.api.serializers import ListOrderSerializer, ListOrderValuesSerializer
+from apps.restaurants.models import ProductItem
+from apps.restaurants.api.serializers import ProductItemSerializer, ProductItemValuesSerializer
+from apps.users.models import User, Client
+from apps.users.api.serializers import (UserSerializer,
+                                        UserValuesSerializer,
+                                        ClientSerializer,
+                                        ClientValuesSerializer)
+
+
+BENCHMARKS = (
+    ('orders', Order, ListOrderSerializer, ListOrderValuesSerializer),
+    ('product_items', ProductItem, ProductItemSerializer, ProductItemValuesSerializer),
+    ('clients', Client, ClientSerializer, ClientValuesSerializer),
+    ('users', User, UserSerializer, UserValuesSerializer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el ModelSerializer + JSONRenderer de DRF con la ruta rápida (values() + FastJSONRenderer) "
+        "para cada listado y tamaño de página, verificando que la salida sea idéntica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,200,1000', help="Tamaños de página separados por coma.")
+        parser.add_argument('--repeat', type=int, default=20, help="Repeticiones por medición.")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        repeat = options['repeat']
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+
+        self.stdout.write(f"{'endpoint':<15}{'page':>6}{'drf ms':>10}{'fast ms':>10}{'speedup':>9}")
+        for name, model, serializer_class, values_serializer_class in BENCHMARKS:
+            queryset = model.objects.order_by('pk')
+            for size in sizes:
+                def drf():
+                    data = serializer_class(list(queryset[:size]), many=True).data
+                    return drf_renderer.render(data)
+
+                def fast():
+                    rows = list(values_serializer_class.values(queryset)[:size])
+                    return fast_renderer.render(values_serializer_class(rows).data)
+
+                if drf() != fast():
+                    raise CommandError(f"Output mismatch for {name} with page size {size}.")
+                drf_ms = self._measure(drf, repeat)
+                fast_ms = self._measure(fast, repeat)
+                speedup = drf_ms / fast_ms if fast_ms else 0
+                self.stdout.write(f"{name:<15}{size:>6}{drf_ms:>10.2f}{fast_ms:>10.2f}{speedup:>8.1f}x")
+
+    def _measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
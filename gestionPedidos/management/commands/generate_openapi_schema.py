@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from gestionPedidos.schema import generate_schema, schema_file_path, schema_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera el esquema OpenAPI de la versión desplegada (DEPLOY_VERSION) y lo guarda en OPENAPI_SCHEMA_DIR "
+        "y en la caché, para que /docs/ y /redoc/ no lo regeneren en cada solicitud."
+    )
+
+    def handle(self, *args, **options):
+        etag, content = generate_schema()
+        self.stdout.write(
+            f"OpenAPI schema {schema_version()} written to {schema_file_path()} ({len(content)} bytes, ETag {etag})."
+        )
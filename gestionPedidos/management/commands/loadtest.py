@@ -0,0 +1,310 @@
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from gestionPedidos.utils import percentile
+from apps.orders.analytics import rebuild_rollups
+from apps.orders.counters import rebuild_client_counters
+from apps.orders.dashboard import reconcile_dashboard
+from apps.orders.models import Order, OrderItem
+from apps.restaurants.models import Restaurant, ProductItem
+from apps.users.models import User, Client
+
+
+PREFIX = 'loadtest'
+
+# (escenario, peso)
+SCENARIOS = (
+    ('create_order', 30),
+    ('edit_order', 15),
+    ('list_orders', 15),
+    ('list_clients', 5),
+    ('menu', 35),
+)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del flujo de pedidos: meseras creando y editando órdenes, dueños listando órdenes "
+        "y tráfico público al menú. Siembra datos reproducibles (--seed), levanta un servidor local o usa "
+        "--base-url, reporta req/s y p50/p95/p99 por endpoint y compara contra un baseline guardado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="Crea (o completa) los datos de prueba antes de correr.")
+        parser.add_argument('--restaurants', type=int, default=3)
+        parser.add_argument('--products', type=int, default=40, help="Productos por restaurante.")
+        parser.add_argument('--waitresses', type=int, default=3, help="Meseras por restaurante.")
+        parser.add_argument('--orders', type=int, default=500, help="Órdenes históricas por restaurante.")
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument('--base-url', help="URL de un servidor ya levantado; por defecto se inicia uno local.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Usuarios virtuales (hilos).")
+        parser.add_argument('--duration', type=float, default=30, help="Segundos de carga.")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'loadtest_baseline.json'),
+                            help="JSON del baseline; CI lo genera en la rama principal (ver README).")
+        parser.add_argument('--save-baseline', action='store_true', help="Guarda el resultado como nuevo baseline.")
+        parser.add_argument('--max-regression', type=float, default=20,
+                            help="Porcentaje máximo de caída de req/s o aumento de p95 frente al baseline.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self._seed(options)
+        fixtures = self._load_fixtures()
+
+        server = None
+        base_url = options['base_url']
+        if not base_url:
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=True)
+            server.set_app(get_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+
+        try:
+            results = self._run(base_url.rstrip('/'), fixtures, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        self._report(results)
+        regressions = self._compare(results, options)
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as baseline_file:
+                json.dump(results, baseline_file, indent=2)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+        elif regressions:
+            raise CommandError("Performance regression: " + "; ".join(regressions))
+
+    def _seed(self, options):
+        rng = random.Random(options['random_seed'])
+        password = make_password(PREFIX)
+        restaurant_ids = []
+        with transaction.atomic():
+            clients = []
+            for index in range(200):
+                client, _ = Client.objects.get_or_create(
+                    email=f"{PREFIX}_client_{index}@example.com",
+                    defaults={'name': f"Load Client {index}", 'phone': '000'}
+                )
+                clients.append(client)
+
+            for r_index in range(options['restaurants']):
+                owner, _ = User.objects.get_or_create(
+                    username=f"{PREFIX}_owner_{r_index}",
+                    defaults={'role': User.Role.OWNER, 'password': password}
+                )
+                restaurant, _ = Restaurant.objects.get_or_create(
+                    name=f"Loadtest Restaurant {r_index}", defaults={'owner': owner}
+                )
+                restaurant_ids.append(restaurant.id)
+                waitresses = []
+                for w_index in range(options['waitresses']):
+                    waitress, _ = User.objects.get_or_create(
+                        username=f"{PREFIX}_waitress_{r_index}_{w_index}",
+                        defaults={'role': User.Role.WAITRESS, 'restaurant': restaurant, 'password': password}
+                    )
+                    waitresses.append(waitress)
+
+                existing = ProductItem.objects.filter(restaurant=restaurant).count()
+                ProductItem.objects.bulk_create([
+                    ProductItem(restaurant=restaurant, name=f"Product {index}", description="Load test product",
+                                price=Decimal(rng.randint(100, 5000)) / 100)
+                    for index in range(existing, options['products'])
+                ])
+                products = list(ProductItem.objects.filter(restaurant=restaurant))
+
+                existing = Order.objects.filter(restaurant=restaurant).count()
+                self._seed_orders(rng, restaurant, waitresses, clients, products, options['orders'] - existing)
+
+        # bulk_create no registra eventos ni actualiza contadores: se recalculan desde las órdenes sembradas.
+        rebuild_client_counters()
+        for restaurant_id in restaurant_ids:
+            rebuild_rollups(restaurant_id=restaurant_id)
+        reconcile_dashboard(restaurant_ids=restaurant_ids)
+        self.stdout.write("Seed data ready.")
+
+    def _seed_orders(self, rng, restaurant, waitresses, clients, products, count):
+        if count <= 0:
+            return
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(restaurant=restaurant, waitress=rng.choice(waitresses), client=rng.choice(clients),
+                  status_order=rng.choice(['pending', 'preparing', 'closed']))
+            for _ in range(count)
+        ])
+        items = []
+        for order in orders:
+            total = Decimal('0')
+            for product in rng.sample(products, min(len(products), rng.randint(1, 4))):
+                quantity = rng.randint(1, 3)
+                items.append(OrderItem(order=order, product_item=product, quantity=quantity,
+                                       price_unit=product.price, subtotal=product.price * quantity))
+                total += product.price * quantity
+            order.total = total
+            order.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 28))
+        OrderItem.objects.bulk_create(items)
+        Order.objects.bulk_update(orders, ['total', 'created_at'])
+
+    def _load_fixtures(self):
+        restaurants = list(Restaurant.objects.filter(name__startswith="Loadtest Restaurant").select_related('owner'))
+        if not restaurants:
+            raise CommandError("No load test data found; run with --seed first.")
+        fixtures = []
+        for restaurant in restaurants:
+            waitresses = list(User.objects.filter(restaurant=restaurant, role=User.Role.WAITRESS,
+                                                  username__startswith=PREFIX))
+            fixtures.append({
+                'restaurant_id': restaurant.id,
+                'owner_token': str(RefreshToken.for_user(restaurant.owner).access_token),
+                'waitress_tokens': [str(RefreshToken.for_user(waitress).access_token) for waitress in waitresses],
+                'product_ids': list(ProductItem.objects.filter(restaurant=restaurant, status=True)
+                                    .values_list('id', flat=True)),
+            })
+        return fixtures
+
+    def _run(self, base_url, fixtures, options):
+        samples = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+        names = [name for name, _ in SCENARIOS]
+        weights = [weight for _, weight in SCENARIOS]
+
+        def virtual_user(index):
+            rng = random.Random(options['random_seed'] + index)
+            created = []
+            while time.perf_counter() < deadline:
+                fixture = rng.choice(fixtures)
+                scenario = rng.choices(names, weights)[0]
+                if scenario == 'edit_order' and not created:
+                    scenario = 'create_order'
+                label, method, path, token, body = self._build_request(scenario, fixture, rng, created)
+                started = time.perf_counter()
+                status_code, payload = self._send(base_url + path, method, token, body)
+                elapsed = (time.perf_counter() - started) * 1000
+                if scenario == 'create_order' and status_code == 201:
+                    created.append((payload['id'], fixture))
+                with lock:
+                    samples.append((label, elapsed, status_code))
+
+        threads = [threading.Thread(target=virtual_user, args=(index,)) for index in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        endpoints = {}
+        for label in sorted({label for label, _, _ in samples}):
+            latencies = [latency for sample_label, latency, _ in samples if sample_label == label]
+            errors = sum(1 for sample_label, _, code in samples if sample_label == label and not 200 <= code < 300)
+            endpoints[label] = self._summary(latencies, errors, elapsed)
+        return {
+            'config': {key: options[key] for key in ('concurrency', 'duration', 'random_seed')},
+            'endpoints': endpoints,
+            'total': self._summary([latency for _, latency, _ in samples],
+                                   sum(1 for _, _, code in samples if not 200 <= code < 300), elapsed),
+        }
+
+    def _build_request(self, scenario, fixture, rng, created):
+        restaurant_id = fixture['restaurant_id']
+        if scenario == 'create_order':
+            items = [{'product_item': product_id, 'quantity': rng.randint(1, 3)}
+                     for product_id in rng.sample(fixture['product_ids'], min(3, len(fixture['product_ids'])))]
+            return ('POST /api/order/create', 'POST', '/api/order/create',
+                    rng.choice(fixture['waitress_tokens']), {'items': items})
+        if scenario == 'edit_order':
+            order_id, order_fixture = rng.choice(created)
+            items = [{'product_item': rng.choice(order_fixture['product_ids']), 'quantity': rng.randint(1, 3)}]
+            body = {'status_order': rng.choice(['pending', 'preparing', 'closed']), 'items': items}
+            return ('PUT /api/order/<id>', 'PUT', f'/api/order/{order_id}',
+                    rng.choice(order_fixture['waitress_tokens']), body)
+        # cache_page usa la URL completa como clave: el parámetro '_' evita medir respuestas cacheadas.
+        cache_buster = f"_={rng.getrandbits(64):x}"
+        if scenario == 'list_orders':
+            page = rng.randint(1, 3)
+            return ('GET /api/order/list/<id>', 'GET',
+                    f'/api/order/list/{restaurant_id}?page={page}&{cache_buster}', fixture['owner_token'], None)
+        if scenario == 'list_clients':
+            ordering = rng.choice(['-total_spent', '-order_count', '-last_order_at'])
+            return ('GET /api/users/clients/list/', 'GET',
+                    f'/api/users/clients/list/?ordering={ordering}&{cache_buster}', fixture['owner_token'], None)
+        return ('GET /api/restaurant/menu/<id>', 'GET', f'/api/restaurant/menu/{restaurant_id}', None, None)
+
+    def _send(self, url, method, token, body):
+        headers = {'Accept': 'application/json'}
+        data = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            data = json.dumps(body).encode('utf-8')
+        try:
+            with urlopen(Request(url, data=data, headers=headers, method=method), timeout=30) as response:
+                content = response.read()
+                return response.status, json.loads(content) if content else None
+        except HTTPError as error:
+            error.read()
+            return error.code, None
+        except (URLError, OSError):
+            return 0, None
+
+    def _summary(self, latencies, errors, elapsed):
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(percentile(latencies, 50) or 0, 2),
+            'p95_ms': round(percentile(latencies, 95) or 0, 2),
+            'p99_ms': round(percentile(latencies, 99) or 0, 2),
+        }
+
+    def _report(self, results):
+        self.stdout.write(f"{'endpoint':<34}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        rows = list(results['endpoints'].items()) + [('TOTAL', results['total'])]
+        for label, stats in rows:
+            self.stdout.write(
+                f"{label:<34}{stats['requests']:>7}{stats['errors']:>8}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            )
+
+    def _compare(self, results, options):
+        try:
+            with open(options['baseline'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except FileNotFoundError:
+            self.stdout.write("No baseline found; run with --save-baseline to create one.")
+            return []
+
+        limit = options['max_regression']
+        regressions = []
+        self.stdout.write(f"\n{'endpoint':<34}{'req/s vs base':>15}{'p95 vs base':>15}")
+        current = dict(results['endpoints'], TOTAL=results['total'])
+        previous = dict(baseline.get('endpoints', {}), TOTAL=baseline.get('total', {}))
+        for label, stats in current.items():
+            base = previous.get(label)
+            if not base or not base.get('rps') or not base.get('p95_ms'):
+                continue
+            rps_change = (stats['rps'] - base['rps']) / base['rps'] * 100
+            p95_change = (stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+            self.stdout.write(f"{label:<34}{rps_change:>+14.1f}%{p95_change:>+14.1f}%")
+            if rps_change < -limit or p95_change > limit:
+                regressions.append(f"{label} req/s {rps_change:+.1f}%, p95 {p95_change:+.1f}%")
+        return regressions
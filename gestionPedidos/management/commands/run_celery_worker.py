@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from gestionPedidos.celery import app
+
+
+WORKER_OPTIONS = ('concurrency', 'prefetch_multiplier', 'soft_time_limit', 'time_limit', 'max_tasks_per_child')
+
+
+def worker_argv(name, profile):
+    argv = ['worker', '-n', f'{name}@%h', '-Q', ','.join(profile['queues'])]
+    for option in WORKER_OPTIONS:
+        if option in profile:
+            argv.append(f"--{option.replace('_', '-')}={profile[option]}")
+    return argv
+
+
+class Command(BaseCommand):
+    help = (
+        "Inicia un worker de Celery con las colas y límites de un perfil de CELERY_WORKER_PROFILES, "
+        "para que docker-compose y el benchmark de colas usen la misma configuración."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', help="Nombre del perfil (realtime, reports, imports).")
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        profiles = getattr(settings, 'CELERY_WORKER_PROFILES', {})
+        if options['profile'] not in profiles:
+            raise CommandError(f"Unknown worker profile '{options['profile']}'; choose one of {', '.join(profiles)}.")
+        argv = worker_argv(options['profile'], profiles[options['profile']])
+        app.worker_main(argv + [f"--loglevel={options['loglevel']}"])
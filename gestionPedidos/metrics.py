@@ -0,0 +1,166 @@
+import atexit
+import glob
+import os
+import time
+from celery.signals import before_task_publish, task_prerun, task_postrun, task_failure, worker_process_shutdown
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+TASK_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', "Latencia de las solicitudes HTTP por vista, método y código de estado.",
+    ['view', 'method', 'status'],
+)
+http_requests_in_progress = Gauge(
+    'http_requests_in_progress', "Solicitudes HTTP en curso.", multiprocess_mode='livesum',
+)
+db_connections_created = Counter(
+    'django_db_connections_created_total', "Conexiones a la base de datos abiertas.", ['alias'],
+)
+db_connections_open = Gauge(
+    'django_db_connections_open', "Conexiones abiertas (persistentes según CONN_MAX_AGE) al terminar cada solicitud.",
+    ['alias'], multiprocess_mode='livesum',
+)
+cache_requests = Counter(
+    'django_cache_requests_total', "Lecturas de caché por resultado (hit/miss).", ['result'],
+)
+celery_task_duration = Histogram(
+    'celery_task_duration_seconds', "Duración de las tareas de Celery por estado final.", ['task', 'state'],
+    buckets=TASK_BUCKETS,
+)
+celery_task_queue_wait = Histogram(
+    'celery_task_queue_wait_seconds', "Tiempo entre la publicación de una tarea y el inicio de su ejecución.",
+    ['task', 'queue'], buckets=TASK_BUCKETS,
+)
+celery_task_failures = Counter(
+    'celery_task_failures_total', "Tareas de Celery que terminaron con excepción.", ['task', 'exception'],
+)
+
+_task_started = {}
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Registra la latencia de cada solicitud por vista (view_name o ruta), método y código de estado,
+    y el uso de conexiones a la base de datos del proceso.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        http_requests_in_progress.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            http_requests_in_progress.dec()
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else '<unresolved>'
+        http_request_duration.labels(view, request.method, response.status_code).observe(
+            time.perf_counter() - started
+        )
+        for connection in connections.all(initialized_only=True):
+            db_connections_open.labels(connection.alias).set(int(connection.connection is not None))
+        return response
+
+
+def record_cache_read(hits, misses):
+    if hits:
+        cache_requests.labels('hit').inc(hits)
+    if misses:
+        cache_requests.labels('miss').inc(misses)
+
+
+class ServicesCollector:
+    """
+    Agrega los archivos de métricas de todos los servicios. Cada contenedor escribe en su propio
+    subdirectorio (PROMETHEUS_MULTIPROC_DIR) y lo vacía al arrancar; este colector lee todos los
+    subdirectorios del directorio padre.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def collect(self):
+        files = glob.glob(os.path.join(self.path, '*', '*.db'))
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+
+def metrics_view(request):
+    """
+    Exposición de métricas en formato de texto de Prometheus. Con PROMETHEUS_MULTIPROC_DIR agrega los valores
+    de todos los procesos (web y workers de Celery) de todos los servicios. Exige METRICS_TOKEN como token
+    Bearer; si no está configurado, el endpoint responde 403.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return HttpResponseForbidden("Metrics token is not configured.")
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden("Invalid metrics token.")
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        registry.register(ServicesCollector(os.path.dirname(os.path.normpath(MULTIPROC_DIR))))
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+@receiver(connection_created)
+def _on_connection_created(sender, connection, **kwargs):
+    db_connections_created.labels(connection.alias).inc()
+
+
+@before_task_publish.connect
+def _on_task_publish(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def _on_task_prerun(sender=None, task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at:
+        queue = (task.request.delivery_info or {}).get('routing_key') or 'unknown'
+        celery_task_queue_wait.labels(task.name, queue).observe(max(time.time() - published_at, 0))
+
+
+@task_postrun.connect
+def _on_task_postrun(sender=None, task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        celery_task_duration.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@task_failure.connect
+def _on_task_failure(sender=None, exception=None, **kwargs):
+    celery_task_failures.labels(sender.name, type(exception).__name__).inc()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    _mark_dead()
+
+
+def _mark_dead():
+    if MULTIPROC_DIR:
+        mark_process_dead(os.getpid(), MULTIPROC_DIR)
+
+
+atexit.register(_mark_dead)
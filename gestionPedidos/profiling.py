@@ -0,0 +1,277 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+from django.utils import timezone
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from apps.users.authentication import CachedJWTAuthentication
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+def _profiling_settings():
+    return getattr(settings, 'PROFILING', {})
+
+
+def profiles_dir():
+    return _profiling_settings().get('DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def profile_path(profile_id):
+    return os.path.join(profiles_dir(), f"{profile_id}.zip")
+
+
+class StackSampler:
+    """
+    Perfilador por muestreo: un hilo lee la pila del hilo de la solicitud cada `interval` segundos y
+    cuenta las pilas en formato "folded" (func;func;func N), listo para flamegraph.pl o speedscope.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+class SQLCollector:
+    """
+    execute_wrapper que guarda el SQL, los parámetros y la duración de cada consulta.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+class ProfilingMiddleware:
+    """
+    Perfila una sola solicitud cuando un usuario ADMIN la marca con el header 'X-Profile: sample|cprofile'
+    o el parámetro '?_profile=sample|cprofile'. El perfil (pilas folded o estadísticas de cProfile) y la
+    lista de consultas SQL se guardan como un zip en PROFILING['DIR'] y su id se retorna en el header
+    'X-Profile-Id'. Las solicitudes sin la marca no pagan más que la lectura del header y del query string.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get(PROFILE_HEADER)
+        if mode is None and PROFILE_QUERY_PARAM in request.META.get('QUERY_STRING', ''):
+            mode = parse_qs(request.META['QUERY_STRING']).get(PROFILE_QUERY_PARAM, [None])[0]
+        if mode not in PROFILE_MODES:
+            return self.get_response(request)
+
+        user = self._admin_user(request)
+        if user is None:
+            return self.get_response(request)
+        return self._profile(request, mode, user)
+
+    def _admin_user(self, request):
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+        if result is None or result[0].role != 'ADMIN':
+            return None
+        return result[0]
+
+    def _profile(self, request, mode, user):
+        config = _profiling_settings()
+        collector = SQLCollector()
+        profiler = None
+        sampler = None
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+        else:
+            sampler = StackSampler(config.get('SAMPLE_INTERVAL', 0.005))
+
+        started = time.perf_counter()
+        with connections['default'].execute_wrapper(collector):
+            if profiler is not None:
+                profiler.enable()
+            else:
+                sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                else:
+                    sampler.stop()
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        profile_id = uuid.uuid4()
+        summary = {
+            'id': str(profile_id),
+            'mode': mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user_id': user.pk,
+            'duration_ms': duration_ms,
+            'query_count': len(collector.queries),
+            'query_ms': round(sum(query['duration_ms'] for query in collector.queries), 3),
+            'created_at': timezone.now().isoformat(),
+        }
+        write_profile(profile_id, summary, collector.queries, profiler=profiler, sampler=sampler)
+        response['X-Profile-Id'] = str(profile_id)
+        return response
+
+
+def write_profile(profile_id, summary, queries, profiler=None, sampler=None):
+    """
+    Guarda el zip del perfil: summary.json, queries.json y profile.folded (muestreo) o
+    profile.prof y profile.txt (cProfile). Conserva solo los últimos PROFILING['MAX_PROFILES'].
+    """
+    directory = profiles_dir()
+    os.makedirs(directory, exist_ok=True)
+    with zipfile.ZipFile(profile_path(profile_id), 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('summary.json', json.dumps(summary, indent=2))
+        archive.writestr('queries.json', json.dumps(queries, indent=2))
+        if sampler is not None:
+            archive.writestr('profile.folded', sampler.folded())
+        if profiler is not None:
+            stats_path = os.path.join(directory, f"{profile_id}.prof")
+            profiler.dump_stats(stats_path)
+            archive.write(stats_path, 'profile.prof')
+            os.remove(stats_path)
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(100)
+            archive.writestr('profile.txt', text.getvalue())
+    _prune_profiles(directory)
+
+
+def _prune_profiles(directory):
+    max_profiles = _profiling_settings().get('MAX_PROFILES', 50)
+    files = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.zip')),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in files[:-max_profiles]:
+        os.remove(entry.path)
+
+
+def list_profiles():
+    """
+    Resúmenes de los perfiles guardados, del más reciente al más antiguo.
+    """
+    directory = profiles_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith('.zip'):
+            continue
+        try:
+            with zipfile.ZipFile(entry.path) as archive:
+                profiles.append(json.loads(archive.read('summary.json')))
+        except (zipfile.BadZipFile, KeyError, OSError):
+            continue
+    return sorted(profiles, key=lambda profile: profile['created_at'], reverse=True)
+
+
+class ProfileListAPIView(APIView):
+    """
+    Lista los perfiles de solicitudes capturados con el header 'X-Profile' (solo ADMIN).
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Profiling"],
+        operation_summary="Listar perfiles de solicitudes",
+        operation_description=(
+            "Lista los perfiles capturados, del más reciente al más antiguo. Un ADMIN perfila cualquier solicitud "
+            "enviando el header 'X-Profile: sample' (muestreo de pilas) o 'X-Profile: cprofile' (determinista), "
+            "o el query param '_profile'; el id del perfil se retorna en el header 'X-Profile-Id'."
+        ),
+        responses={200: openapi.Response(description="Profile summaries.")}
+    )
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'ADMIN':
+            return Response({"error": "You do not have permission to access this resource"},
+                            status=status.HTTP_403_FORBIDDEN)
+        return Response(list_profiles(), status=status.HTTP_200_OK)
+
+
+class ProfileDownloadAPIView(APIView):
+    """
+    Descarga el zip de un perfil: summary.json, queries.json y profile.folded o profile.prof/profile.txt (solo ADMIN).
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Profiling"],
+        operation_summary="Descargar perfil de una solicitud",
+        operation_description=(
+            "Descarga el perfil indicado como zip. 'profile.folded' se abre con flamegraph.pl o speedscope; "
+            "'profile.prof' con pstats o snakeviz; 'queries.json' lista el SQL ejecutado con su duración."
+        ),
+        responses={200: openapi.Response(description="Profile zip downloaded.")}
+    )
+    def get(self, request, profile_id, *args, **kwargs):
+        if request.user.role != 'ADMIN':
+            return Response({"error": "You do not have permission to access this resource"},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        file_path = profile_path(profile_id)
+        if not os.path.exists(file_path):
+            return Response({"error": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = FileResponse(open(file_path, 'rb'), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile_id}.zip"'
+        return response
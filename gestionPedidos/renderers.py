@@ -0,0 +1,48 @@
+import json
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON basado en orjson. Para datos con solo cadenas, enteros, booleanos y None genera los mismos
+    bytes que el JSONRenderer de DRF en modo compacto; con floats no (formato distinto, NaN/Infinity como null),
+    por eso solo lo usan las vistas de FAST_RENDERER_CLASSES. Si orjson no está instalado o se pide
+    indentación, delega en el renderer de DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = json_dumps(data)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+# Listados construidos con ValuesSerializer, que ya entrega decimales y fechas como cadenas.
+FAST_RENDERER_CLASSES = (FastJSONRenderer, BrowsableAPIRenderer)
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+def json_dumps(data):
+    """
+    Serializa a bytes JSON compactos con orjson (o json si no está instalado), usando el encoder de DRF
+    para los tipos no nativos.
+    """
+    if orjson is None:
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+
+api_info = openapi.Info(
+    title="Sistema de Gestión de Pedidos API",
+    default_version='v1',
+    description="API REST para un sistema de gestión de pedidos de restaurantes",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="luis98caicedo@gmail.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    api_info,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+_schema = None
+_schema_lock = threading.Lock()
+
+
+def schema_version():
+    return getattr(settings, 'DEPLOY_VERSION', '') or 'dev'
+
+
+def schema_cache_key():
+    return f"openapi_schema:{schema_version()}"
+
+
+def schema_file_path():
+    directory = getattr(settings, 'OPENAPI_SCHEMA_DIR', os.path.join(settings.BASE_DIR, 'openapi'))
+    return os.path.join(directory, f"schema-{schema_version()}.json")
+
+
+def _etag(content):
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def generate_schema():
+    """
+    Genera el esquema OpenAPI de todas las vistas, lo guarda en el archivo de la versión desplegada y en la
+    caché, y lo retorna como (etag, contenido JSON).
+    """
+    global _schema
+    generator = schema_view.generator_class(api_info)
+    content = OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+    file_path = schema_file_path()
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as schema_file:
+        schema_file.write(content)
+    _schema = (_etag(content), content)
+    cache.set(schema_cache_key(), _schema, None)
+    return _schema
+
+
+def get_schema():
+    """
+    Esquema de la versión desplegada (DEPLOY_VERSION): memoria del proceso, caché, archivo y, solo si
+    ninguno lo tiene, generación. Un deploy con otra versión usa otra llave y otro archivo.
+    """
+    global _schema
+    if _schema is not None:
+        return _schema
+    with _schema_lock:
+        if _schema is not None:
+            return _schema
+        schema = cache.get(schema_cache_key())
+        if schema is None:
+            try:
+                with open(schema_file_path(), 'rb') as schema_file:
+                    content = schema_file.read()
+            except FileNotFoundError:
+                return generate_schema()
+            schema = (_etag(content), content)
+            cache.set(schema_cache_key(), schema, None)
+        _schema = schema
+        return _schema
+
+
+class CachedSchemaView(schema_view):
+    """
+    Vista de drf_yasg que sirve el esquema JSON ya generado con ETag, respondiendo 304 cuando el cliente
+    ya lo tiene. Las páginas de Swagger UI y ReDoc no recorren las vistas, así que se siguen renderizando
+    con drf_yasg; el formato YAML también.
+    """
+
+    def get(self, request, version='', format=None):
+        if not isinstance(request.accepted_renderer, (OpenAPIRenderer, SwaggerJSONRenderer)):
+            return super().get(request, version, format)
+
+        etag, content = get_schema()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
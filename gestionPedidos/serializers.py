@@ -0,0 +1,98 @@
+from decimal import Decimal
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+
+class ValuesSerializer:
+    """
+    Serializador de solo lectura para listados. Construye la respuesta a partir de filas values()
+    sin pasar por los campos de DRF, produciendo la misma salida que el ModelSerializer equivalente.
+
+    - fields: nombres de salida, en orden.
+    - sources: nombre de salida -> columna de values() cuando difieren (p. ej. 'restaurant' -> 'restaurant_id').
+    - decimal_fields: nombre de salida -> decimal_places.
+    - datetime_fields: nombres de salida con fechas en formato ISO 8601.
+
+    Admite fieldsets parciales: con select_fields() se leen 'fields'/'exclude' del request y solo se
+    consultan (values()) y serializan las columnas pedidas.
+    """
+    fields = ()
+    sources = {}
+    decimal_fields = {}
+    datetime_fields = ()
+
+    def __init__(self, instance, fields=None):
+        self.instance = instance
+        self.selected_fields = tuple(fields) if fields else self.fields
+
+    @classmethod
+    def select_fields(cls, request):
+        """
+        Campos pedidos con los query params 'fields' y/o 'exclude' (separados por coma),
+        en el orden de la clase. Lanza ValidationError si se pide un campo desconocido.
+        """
+        requested = _split_fields(request.query_params.get('fields'))
+        excluded = _split_fields(request.query_params.get('exclude'))
+        unknown = [field for field in requested + excluded if field not in cls.fields]
+        if unknown:
+            raise ValidationError({"fields": [f"Unknown field(s): {', '.join(unknown)}."]})
+        selected = tuple(
+            field for field in cls.fields
+            if (not requested or field in requested) and field not in excluded
+        )
+        if not selected:
+            raise ValidationError({"fields": ["At least one field must be selected."]})
+        return selected
+
+    @classmethod
+    def columns(cls, fields=None):
+        return [cls.sources.get(field, field) for field in fields or cls.fields]
+
+    @classmethod
+    def values(cls, queryset, fields=None):
+        return queryset.values(*cls.columns(fields))
+
+    def get_formatters(self):
+        formatters = {}
+        for field, places in self.decimal_fields.items():
+            formatters[field] = _decimal_formatter(places)
+        for field in self.datetime_fields:
+            formatters[field] = format_datetime
+        return formatters
+
+    def to_representation(self, rows):
+        formatters = self.get_formatters()
+        plan = [(field, self.sources.get(field, field), formatters.get(field)) for field in self.selected_fields]
+        data = []
+        for row in rows:
+            item = {}
+            for field, source, formatter in plan:
+                value = row[source]
+                item[field] = formatter(value) if formatter is not None and value is not None else value
+            data.append(item)
+        return data
+
+    @property
+    def data(self):
+        return self.to_representation(self.instance)
+
+
+def _split_fields(value):
+    return [field.strip() for field in (value or '').split(',') if field.strip()]
+
+
+def _decimal_formatter(places):
+    quantum = Decimal(1).scaleb(-places)
+
+    def format_decimal(value):
+        return '{:f}'.format(Decimal(value).quantize(quantum))
+    return format_decimal
+
+
+def format_datetime(value):
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'drf_yasg',
+    'gestionPedidos',
     'apps.users',
     'apps.restaurants',
     'apps.orders',
@@ -32,6 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gestionPedidos.instrumentation.RequestInstrumentationMiddleware',
+    'gestionPedidos.metrics.PrometheusMetricsMiddleware',
+    'gestionPedidos.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +69,7 @@ WSGI_APPLICATION = 'gestionPedidos.wsgi.application'
 #REDIS CACHE
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'gestionPedidos.instrumentation.InstrumentedRedisCache',
         'LOCATION': 'redis://redis:6379/1', 
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -75,6 +79,28 @@ CACHES = {
 
 CACHE_TTL = 60 * 3
 
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.getenv('REQUEST_INSTRUMENTATION_SAMPLE_RATE', '0.01')),
+    'SERVER_TIMING': True,
+    'LOG': True,
+}
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'gestionPedidos.requests': {'handlers': ['requests'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -119,7 +145,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 #DJANGO-RESTFRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -127,6 +153,9 @@ REST_FRAMEWORK = {
 }
 
 
+DEPLOY_VERSION = os.getenv('DEPLOY_VERSION', '')
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
@@ -143,12 +172,81 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7)            
 }
 
+AUTH_USER_CACHE = {
+    'LOCAL_TTL': 5,
+    'REDIS_TTL': 60 * 5,
+    'MAX_SIZE': 10000,
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'apps.orders.tasks.relay_order_events': {'queue': 'realtime'},
+    'apps.orders.tasks.generate_sales_report': {'queue': 'reports'},
+    'apps.orders.tasks.purge_order_events': {'queue': 'reports'},
+    'apps.orders.tasks.reconcile_order_dashboard': {'queue': 'realtime'},
+    'apps.users.tasks.process_bulk_clients': {'queue': 'imports'},
+}
+
+# Perfiles de worker por cola; docker-compose levanta cada worker con 'manage.py run_celery_worker <perfil>',
+# que toma de aquí sus opciones, y el comando benchmark_queues levanta workers embebidos con ellos para medir
+# la espera en cola de las tareas reales.
+CELERY_WORKER_PROFILES = {
+    'realtime': {'queues': ['realtime', 'default'], 'concurrency': 4, 'prefetch_multiplier': 4,
+                 'soft_time_limit': 20, 'time_limit': 30},
+    'reports': {'queues': ['reports'], 'concurrency': 2, 'prefetch_multiplier': 1,
+                'soft_time_limit': 60 * 10, 'time_limit': 60 * 15},
+    'imports': {'queues': ['imports'], 'concurrency': 1, 'prefetch_multiplier': 1,
+                'soft_time_limit': 60 * 60, 'time_limit': 60 * 70, 'max_tasks_per_child': 20},
+}
+CELERY_BEAT_SCHEDULE = {
+    'relay-order-events': {
+        'task': 'apps.orders.tasks.relay_order_events',
+        'schedule': 5.0,
+    },
+    'purge-order-events': {
+        'task': 'apps.orders.tasks.purge_order_events',
+        'schedule': 60 * 60 * 24,
+    },
+    'reconcile-order-dashboard': {
+        'task': 'apps.orders.tasks.reconcile_order_dashboard',
+        'schedule': 60 * 5,
+    },
+    'purge-bulk-uploads': {
+        'task': 'apps.users.tasks.purge_bulk_uploads',
+        'schedule': 60 * 60,
+    },
+}
+
+ORDER_EVENT_BATCH_SIZE = 500
+ORDER_EVENT_SUBSCRIBERS = [
+    'apps.orders.analytics.apply_order_rollups',
+    'apps.orders.events.publish_to_stream',
+]
+ORDER_EVENT_STREAM = 'orders:events'
+ORDER_EVENT_STREAM_MAXLEN = 100000
+ORDER_EVENT_RETENTION_DAYS = 7
+
+# Cota (segundos) de la duración de una transacción de escritura; los feeds de cambios no entregan filas
+# más recientes que esto para no saltar las que aún no hacen commit.
+CHANGE_FEED_SAFETY_LAG = 30
+
+BULK_CLIENTS_BATCH_SIZE = 5000
+BULK_CLIENTS_PROGRESS_INTERVAL = 1
+BULK_UPLOADS_DIR = BASE_DIR / 'uploads'
+BULK_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+BULK_UPLOAD_SESSION_TTL = 60 * 60 * 24
+
+PROFILING = {
+    'DIR': BASE_DIR / 'profiles',
+    'SAMPLE_INTERVAL': 0.005,
+    'MAX_PROFILES': 50,
+}
 
 REPORTS_DIR = BASE_DIR / 'reports' 
 
@@ -0,0 +1,213 @@
+import os
+import traceback
+import unittest
+from collections import Counter
+from decimal import Decimal
+from importlib import import_module
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.orders.counters import rebuild_client_counters
+from apps.orders.models import Order, OrderItem, ReportRequest
+from apps.restaurants.models import Restaurant, ProductItem
+from apps.users.authentication import local_user_cache
+from apps.users.models import User, Client
+
+
+PRODUCTS_PER_RESTAURANT = 30
+ORDERS_PER_RESTAURANT = 40
+ITEMS_PER_ORDER = 3
+CLIENTS = 50
+EXTRA_USERS = 20
+
+
+class QueryRecorder:
+    """
+    Registra las consultas SQL ejecutadas en una conexión junto con las líneas del proyecto que las originaron.
+    """
+
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, _project_stack()))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duplicates(self):
+        """
+        Consultas repetidas con el mismo SQL (sin parámetros): la huella típica de un N+1.
+        """
+        return sum(count - 1 for count in Counter(sql for sql, _ in self.queries).values())
+
+    def report(self):
+        counts = Counter(sql for sql, _ in self.queries)
+        stacks = {}
+        for sql, stack in self.queries:
+            stacks.setdefault(sql, stack)
+        lines = []
+        for sql, count in counts.most_common():
+            lines.append(f"  {count}x {sql[:500]}")
+            lines.extend(f"      at {location}" for location in stacks[sql])
+        return "\n".join(lines)
+
+
+def _project_stack():
+    base_dir = str(settings.BASE_DIR)
+    locations = []
+    for frame in traceback.extract_stack()[:-2]:
+        filename = frame.filename
+        if not filename.startswith(base_dir) or 'site-packages' in filename or filename == __file__:
+            continue
+        if os.path.basename(filename) in ('tests.py', 'manage.py'):
+            continue
+        locations.append(f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}")
+    return locations[-4:]
+
+
+def build_fixtures(target):
+    """
+    Crea un conjunto de datos de tamaño realista y lo asigna como atributos de target.
+    """
+    target.admin = User.objects.create_user(username='budget_admin', password='Budget-pass-123', role='ADMIN')
+    target.owner = User.objects.create_user(username='budget_owner', password='Budget-pass-123', role='OWNER')
+    target.other_owner = User.objects.create_user(username='budget_owner2', password='Budget-pass-123', role='OWNER')
+    target.restaurant = Restaurant.objects.create(owner=target.owner, name='Budget Restaurant')
+    target.second_restaurant = Restaurant.objects.create(owner=target.owner, name='Budget Restaurant 2')
+    target.other_restaurant = Restaurant.objects.create(owner=target.other_owner, name='Budget Other Restaurant')
+    target.waitress = User.objects.create_user(
+        username='budget_waitress', password='Budget-pass-123', role='WAITRESS', restaurant=target.restaurant
+    )
+    User.objects.bulk_create([
+        User(username=f'budget_user_{index}', role='WAITRESS', restaurant=target.restaurant)
+        for index in range(EXTRA_USERS)
+    ])
+
+    for restaurant in (target.restaurant, target.second_restaurant, target.other_restaurant):
+        ProductItem.objects.bulk_create([
+            ProductItem(restaurant=restaurant, name=f'Product {index}', description='Budget product',
+                        price=Decimal(index + 1))
+            for index in range(PRODUCTS_PER_RESTAURANT)
+        ])
+    target.products = list(ProductItem.objects.filter(restaurant=target.restaurant).order_by('id'))
+
+    target.clients = Client.objects.bulk_create([
+        Client(name=f'Client {index}', email=f'budget_client_{index}@example.com', phone='000')
+        for index in range(CLIENTS)
+    ])
+
+    orders = Order.objects.bulk_create([
+        Order(restaurant=target.restaurant, waitress=target.waitress, client=target.clients[index % CLIENTS])
+        for index in range(ORDERS_PER_RESTAURANT)
+    ])
+    items = []
+    for index, order in enumerate(orders):
+        for offset in range(ITEMS_PER_ORDER):
+            product = target.products[(index + offset) % len(target.products)]
+            items.append(OrderItem(order=order, product_item=product, quantity=2,
+                                   price_unit=product.price, subtotal=product.price * 2))
+    OrderItem.objects.bulk_create(items)
+    target.orders = orders
+    rebuild_client_counters()
+
+    ReportRequest.objects.bulk_create([
+        ReportRequest(user=target.admin, task_id=f'budget-task-{index}') for index in range(5)
+    ])
+
+
+# Caché en memoria para las pruebas: setUp la limpia, y con la configuración del repositorio eso vaciaría Redis.
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'gestionPedidos.instrumentation.InstrumentedLocMemCache',
+        'LOCATION': 'query-budget-tests',
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base para las pruebas de presupuesto de consultas por endpoint. Cada prueba llama un endpoint con
+    assertQueryBudget; al terminar la clase se verifica que todos los métodos de todas las vistas de
+    url_module hayan sido probados.
+    """
+    url_module = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._covered = set()
+        cls._ran = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        ran_all = cls._ran == len(unittest.TestLoader().getTestCaseNames(cls))
+        missing = cls.uncovered_endpoints() if ran_all else []
+        super().tearDownClass()
+        if missing:
+            raise AssertionError(f"Endpoints without a query budget in {cls.url_module}: {', '.join(missing)}")
+
+    @classmethod
+    def setUpTestData(cls):
+        build_fixtures(cls)
+
+    @classmethod
+    def uncovered_endpoints(cls):
+        if not cls.url_module:
+            return []
+        missing = []
+        for pattern in import_module(cls.url_module).urlpatterns:
+            view_class = pattern.callback.view_class
+            for method in view_class.http_method_names:
+                if method == 'options' or not hasattr(view_class, method):
+                    continue
+                if (view_class, method) not in cls._covered:
+                    missing.append(f"{method.upper()} {pattern.pattern}")
+        return missing
+
+    def setUp(self):
+        type(self)._ran += 1
+        cache.clear()
+        local_user_cache.clear()
+
+    def authenticate(self, user):
+        if user is None:
+            self.client.credentials()
+        else:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def assertQueryBudget(self, method, url, max_queries, max_duplicates=0, user=None, status_code=200, **kwargs):
+        """
+        Llama el endpoint y falla si supera max_queries consultas o max_duplicates consultas repetidas,
+        mostrando el SQL y las líneas del proyecto que lo ejecutaron.
+        """
+        self.authenticate(user)
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self._covered.add((response.resolver_match.func.view_class, method))
+
+        self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+        if recorder.count > max_queries or recorder.duplicates > max_duplicates:
+            self.fail(
+                f"{method.upper()} {url}: {recorder.count} queries (budget {max_queries}), "
+                f"{recorder.duplicates} duplicated (budget {max_duplicates}).\n{recorder.report()}"
+            )
+        return response
@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from django.test import override_settings
+from gestionPedidos.profiling import profile_path
+from gestionPedidos.testing import QueryBudgetTestCase
+
+PROFILES_DIR = os.path.join(tempfile.gettempdir(), 'query_budget_profiles')
+
+
+@override_settings(PROFILING={'DIR': PROFILES_DIR})
+class ProfilingEndpointQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def _profile(self, user, mode='sample'):
+        self.authenticate(user)
+        return self.client.get('/api/users/list/', HTTP_X_PROFILE=mode)
+
+    def test_profile_requires_admin(self):
+        self.assertNotIn('X-Profile-Id', self._profile(self.waitress))
+        self.assertIn('X-Profile-Id', self._profile(self.admin, 'cprofile'))
+
+    def test_list_profiles(self):
+        profile_id = self._profile(self.admin)['X-Profile-Id']
+        response = self.assertQueryBudget('get', '/api/profiles/', 1, 0, user=self.admin)
+        self.assertEqual(response.data[0]['id'], profile_id)
+
+    def test_list_profiles_requires_admin(self):
+        self.assertQueryBudget('get', '/api/profiles/', 1, 0, user=self.waitress, status_code=403)
+
+    def test_download_profile(self):
+        profile_id = self._profile(self.admin)['X-Profile-Id']
+        self.assertQueryBudget('get', f'/api/profiles/{profile_id}/', 1, 0, user=self.admin)
+        with zipfile.ZipFile(profile_path(profile_id)) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['profile.folded', 'queries.json', 'summary.json'])
@@ -1,28 +1,18 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from gestionPedidos.metrics import metrics_view
+from gestionPedidos.profiling import ProfileListAPIView, ProfileDownloadAPIView
+from gestionPedidos.schema import CachedSchemaView
 
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Sistema de Gestión de Pedidos API",
-      default_version='v1',
-      description="API REST para un sistema de gestión de pedidos de restaurantes",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="luis98caicedo@gmail.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('metrics', metrics_view, name='metrics'),
+    path('docs/', CachedSchemaView.with_ui('swagger'), name='schema-swagger-ui'),
+    path('redoc/', CachedSchemaView.with_ui('redoc'), name='schema-redoc'),
     path('api/users/', include('apps.users.api.urls')),
     path('api/restaurant/', include('apps.restaurants.api.urls')),
     path('api/order/', include('apps.orders.api.urls')),
+    path('api/profiles/', ProfileListAPIView.as_view(), name='profile-list'),
+    path('api/profiles/<uuid:profile_id>/', ProfileDownloadAPIView.as_view(), name='profile-download'),
 ]
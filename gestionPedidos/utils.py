@@ -1,7 +1,181 @@
+import binascii
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import DurationField, Q, Value
+from django.db.models.functions import Now
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Paginación por número de página con tres modos de conteo, seleccionables por endpoint
+    (count_mode) o por el query param 'count':
+    - exact: COUNT(*) exacto (comportamiento por defecto).
+    - none: no cuenta; detecta si hay página siguiente trayendo limit + 1 filas.
+    - estimate: usa la estimación del planificador de Postgres cuando supera estimate_threshold.
+    """
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 50
+    count_mode = 'exact'
+    count_mode_query_param = 'count'
+    count_modes = ('exact', 'none', 'estimate')
+    estimate_threshold = 10000
+
+    def __init__(self, count_mode=None):
+        if count_mode:
+            self.count_mode = count_mode
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_mode_query_param, self.count_mode)
+        return mode if mode in self.count_modes else self.count_mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.mode = self.get_count_mode(request)
+        if self.mode == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+
+        self.has_next = len(rows) > page_size
+        self.count = None
+        self.count_estimated = False
+        if self.mode == 'estimate':
+            if self.has_next:
+                self.count, self.count_estimated = self.estimate_count(queryset, offset + page_size + 1)
+            else:
+                self.count = offset + len(rows)
+        return rows[:page_size]
+
+    def estimate_count(self, queryset, minimum):
+        """
+        Retorna (conteo, es_estimado). Usa las filas estimadas del plan de Postgres y solo
+        cae en COUNT(*) exacto cuando la estimación está por debajo del umbral.
+        """
+        estimate = None
+        if connections[queryset.db].vendor == 'postgresql':
+            try:
+                plan = json.loads(queryset.order_by().explain(format='json'))
+                estimate = int(plan[0]['Plan']['Plan Rows'])
+            except (DatabaseError, ValueError, KeyError, IndexError, TypeError):
+                estimate = None
+        if estimate is None or estimate < self.estimate_threshold:
+            return queryset.count(), False
+        return max(estimate, minimum), True
+
+    def get_next_link(self):
+        if self.mode == 'exact':
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.mode == 'exact':
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'exact':
+            return super().get_paginated_response(data)
+        response = OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count_estimated:
+            response['count_estimated'] = True
+        return Response(response)
+
+
+class ChangeFeedPagination:
+    """
+    Paginación por watermark (updated_at, id) para feeds de cambios. El cliente envía el 'cursor' recibido
+    en la respuesta anterior y obtiene solo las filas modificadas después de él, en orden, usando el índice
+    (updated_at, id). updated_at se fija al guardar y no al hacer commit, así que una transacción abierta
+    puede hacer visible después una fila con updated_at anterior al cursor. Por eso se omiten las filas
+    con updated_at más reciente que CHANGE_FEED_SAFETY_LAG segundos según el reloj de la base de datos:
+    el valor es una cota de la duración de las transacciones de escritura (más el desfase de reloj
+    entre los servidores de aplicación); una transacción más larga puede quedar fuera del feed.
+    """
+    default_limit = 500
+    max_limit = 5000
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, updated_at, pk):
+        return urlsafe_b64encode(f"{updated_at.isoformat()}|{pk}".encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            updated_at, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            updated_at = datetime.fromisoformat(updated_at)
+            return updated_at, int(pk)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise ValidationError({"cursor": ["Invalid cursor."]})
+
+    def paginate(self, queryset, request, serializer_class):
+        limit = self.get_limit(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        safety_lag = timedelta(seconds=getattr(settings, 'CHANGE_FEED_SAFETY_LAG', 30))
+        queryset = queryset.filter(updated_at__lte=Now() - Value(safety_lag, output_field=DurationField()))
+        if cursor:
+            updated_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+        rows = list(serializer_class.values(queryset.order_by('updated_at', 'id'))[:limit + 1])
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            cursor = self.encode_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+        return Response(OrderedDict([
+            ('next_cursor', cursor),
+            ('has_more', has_more),
+            ('results', serializer_class(rows).data),
+        ]))
+
+
+def percentile(values, pct):
+    """
+    Percentil pct (0-100) de una lista de valores con el método nearest-rank; None si está vacía.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]